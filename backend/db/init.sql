@@ -1,3 +1,6 @@
+-- 新規DBボリュームの初期化用（初回起動時のみ実行される）
+-- 既存DBへのスキーマ変更・インデックス追加は pipeline/migrations に番号付きで追加する
+
 -- articlesテーブル
 CREATE TABLE IF NOT EXISTS articles (
   id SERIAL PRIMARY KEY,
@@ -13,6 +16,56 @@ ALTER TABLE articles ADD COLUMN IF NOT EXISTS thumbnail_url TEXT;
 ALTER TABLE articles ADD COLUMN IF NOT EXISTS published TIMESTAMP;
 ALTER TABLE articles ADD COLUMN IF NOT EXISTS content TEXT; -- 記事本文を保存するカラムを追加
 
+-- 記事の同一性判定に使う正規化URLキー（pipelineのentity.article.normalize_urlと同じ規則）
+-- 前後の空白とフラグメントを除去し、スキーム・ホストを小文字化、末尾の「/」を除去する
+CREATE OR REPLACE FUNCTION article_url_key(u TEXT)
+RETURNS TEXT AS $$
+  SELECT rtrim(
+    CASE
+      WHEN split_part(btrim(u), '#', 1) ~ '^[A-Za-z][A-Za-z0-9+.-]*://'
+      THEN lower(substring(split_part(btrim(u), '#', 1) FROM '^[A-Za-z][A-Za-z0-9+.-]*://[^/?]*'))
+           || substring(split_part(btrim(u), '#', 1) FROM '^[A-Za-z][A-Za-z0-9+.-]*://[^/?]*(.*)$')
+      ELSE split_part(btrim(u), '#', 1)
+    END,
+    '/')
+$$ LANGUAGE SQL IMMUTABLE STRICT;
+
+-- 正規化URLキーの一意インデックス（保存済みURL判定・一括登録のON CONFLICT用）
+-- 既存データに重複がある場合は一意でないインデックスで代替する
+DO $$
+BEGIN
+  CREATE UNIQUE INDEX IF NOT EXISTS idx_articles_url_key ON articles (article_url_key(url));
+EXCEPTION WHEN unique_violation THEN
+  RAISE NOTICE 'duplicate article urls exist; creating non-unique idx_articles_url_key';
+  CREATE INDEX IF NOT EXISTS idx_articles_url_key ON articles (article_url_key(url));
+END $$;
+
+-- feed_cacheテーブル：RSSフィードの条件付きGET用バリデータ（pipelineが利用）
+CREATE TABLE IF NOT EXISTS feed_cache (
+  feed_url TEXT PRIMARY KEY,
+  etag TEXT,
+  last_modified TEXT,
+  content_hash VARCHAR(64),
+  last_fetched_at TIMESTAMP,
+  -- 最後にパースした対象期間（公開日、両端を含む）。要求された期間がこの範囲内のときだけ304・本文不変で省略する
+  crawled_from DATE,
+  crawled_to DATE,
+  updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+-- llm_cacheテーブル：LLM結果のキャッシュ（キー = 入力・プロンプトバージョン・モデルのハッシュ、pipelineが利用）
+CREATE TABLE IF NOT EXISTS llm_cache (
+  cache_key CHAR(64) PRIMARY KEY,
+  kind VARCHAR(50) NOT NULL,
+  model VARCHAR(100) NOT NULL,
+  prompt_version VARCHAR(20) NOT NULL,
+  value JSONB NOT NULL,
+  created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+  last_hit_at TIMESTAMP,
+  hit_count INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS idx_llm_cache_created_at ON llm_cache (created_at);
+
 -- topicsテーブル
 CREATE TABLE IF NOT EXISTS topics (
   id SERIAL PRIMARY KEY,
@@ -24,16 +77,58 @@ CREATE TABLE IF NOT EXISTS topics (
   template_html TEXT
 );
 
--- jobsテーブル
-CREATE TABLE jobs (
+-- template_htmlを生成したときのキャッシュキー（pipelineのexportが利用。更新日時・記事集合・テンプレートのハッシュ）
+ALTER TABLE topics ADD COLUMN IF NOT EXISTS template_html_key VARCHAR(64);
+
+-- jobsテーブル（pipelineのワーカーが FOR UPDATE SKIP LOCKED で取り出すジョブキュー）
+-- status: pending / running / success / failure / cancelled
+CREATE TABLE IF NOT EXISTS jobs (
   id SERIAL PRIMARY KEY,
   type VARCHAR(50) NOT NULL,
   status VARCHAR(20) NOT NULL DEFAULT 'pending',
   progress INT DEFAULT 0,
+  params JSONB NOT NULL DEFAULT '{}'::jsonb,
+  result JSONB,
+  error TEXT,
+  attempts INT NOT NULL DEFAULT 0,
+  max_attempts INT NOT NULL DEFAULT 3,
+  run_after TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+  worker_id VARCHAR(100),
+  heartbeat_at TIMESTAMP,
+  cancel_requested BOOLEAN NOT NULL DEFAULT FALSE,
+  started_at TIMESTAMP,
+  finished_at TIMESTAMP,
   created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
   updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
 );
 
+-- 既存DB向け：旧jobsテーブルに不足カラムを追加
+ALTER TABLE jobs ADD COLUMN IF NOT EXISTS params JSONB NOT NULL DEFAULT '{}'::jsonb;
+ALTER TABLE jobs ADD COLUMN IF NOT EXISTS result JSONB;
+ALTER TABLE jobs ADD COLUMN IF NOT EXISTS error TEXT;
+ALTER TABLE jobs ADD COLUMN IF NOT EXISTS attempts INT NOT NULL DEFAULT 0;
+ALTER TABLE jobs ADD COLUMN IF NOT EXISTS max_attempts INT NOT NULL DEFAULT 3;
+ALTER TABLE jobs ADD COLUMN IF NOT EXISTS run_after TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP;
+ALTER TABLE jobs ADD COLUMN IF NOT EXISTS worker_id VARCHAR(100);
+ALTER TABLE jobs ADD COLUMN IF NOT EXISTS heartbeat_at TIMESTAMP;
+ALTER TABLE jobs ADD COLUMN IF NOT EXISTS cancel_requested BOOLEAN NOT NULL DEFAULT FALSE;
+ALTER TABLE jobs ADD COLUMN IF NOT EXISTS started_at TIMESTAMP;
+ALTER TABLE jobs ADD COLUMN IF NOT EXISTS finished_at TIMESTAMP;
+
+-- 取り出し対象（pending）だけの部分インデックス
+CREATE INDEX IF NOT EXISTS idx_jobs_pending ON jobs (run_after, id) WHERE status = 'pending';
+-- ハートビート切れの検出用
+CREATE INDEX IF NOT EXISTS idx_jobs_running ON jobs (heartbeat_at) WHERE status = 'running';
+
+-- job_eventsテーブル：ジョブの進捗イベントログ（/jobs/{id}/events で追跡）
+CREATE TABLE IF NOT EXISTS job_events (
+  id BIGSERIAL PRIMARY KEY,
+  job_id INTEGER NOT NULL REFERENCES jobs(id) ON DELETE CASCADE,
+  event JSONB NOT NULL,
+  created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+CREATE INDEX IF NOT EXISTS idx_job_events_job_id ON job_events (job_id, id);
+
 -- topics articlesテーブル：リレーション
 CREATE TABLE IF NOT EXISTS topics_articles (
   id SERIAL PRIMARY KEY,
@@ -72,10 +167,27 @@ END;
 $$ LANGUAGE plpgsql;
 
 -- topicsテーブルの更新日時を自動更新
+-- 出力キャッシュ（template_html / template_html_key）の保存だけでは更新日時を変えない（キャッシュキーに含むため）
+CREATE OR REPLACE FUNCTION update_topics_timestamp()
+RETURNS TRIGGER AS $$
+BEGIN
+  IF (NEW.title, NEW.month, NEW.monthly_summary) IS DISTINCT FROM (OLD.title, OLD.month, OLD.monthly_summary) THEN
+    NEW.updated_at = CURRENT_TIMESTAMP;
+  END IF;
+  -- キーを伴わずにtemplate_htmlが書き換えられた場合（api側での保存など）はキャッシュとして扱わない
+  IF NEW.template_html IS DISTINCT FROM OLD.template_html
+     AND NEW.template_html_key IS NOT DISTINCT FROM OLD.template_html_key THEN
+    NEW.template_html_key = NULL;
+  END IF;
+  RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS update_topics_timestamp ON topics;
 CREATE TRIGGER update_topics_timestamp
 BEFORE UPDATE ON topics
 FOR EACH ROW
-EXECUTE FUNCTION update_timestamp();
+EXECUTE FUNCTION update_topics_timestamp();
 
 -- jobsテーブルの更新日時を自動更新
 DROP TRIGGER IF EXISTS update_jobs_timestamp ON jobs;
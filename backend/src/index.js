@@ -72,11 +72,12 @@ app.delete('/api/articles', async (req, res) => {
 
 // ジョブ管理APIのエンドポイントを追加
 app.post('/api/jobs/start', async (req, res) => {
-    const { type } = req.body;
+    const { type, params } = req.body;
     try {
+        // pipelineのワーカーがjobsテーブルから取り出して実行する
         const result = await db.query(
-            'INSERT INTO jobs (type, status) VALUES ($1, $2) RETURNING id',
-            [type, 'pending']
+            'INSERT INTO jobs (type, status, params) VALUES ($1, $2, $3) RETURNING id',
+            [type, 'pending', JSON.stringify(params || {})]
         );
         res.json({ jobId: result.rows[0].id });
     } catch (err) {
@@ -100,9 +101,13 @@ app.get('/api/jobs/:jobId/status', async (req, res) => {
 app.delete('/api/jobs/:jobId', async (req, res) => {
     const { jobId } = req.params;
     try {
+        // pendingは即時キャンセル、runningはワーカーが次の進捗報告時に中断する
         const result = await db.query(
-            'UPDATE jobs SET status = $1 WHERE id = $2 RETURNING *',
-            ['failure', jobId]
+            `UPDATE jobs SET cancel_requested = TRUE,
+                status = CASE WHEN status = 'pending' THEN 'cancelled' ELSE status END,
+                finished_at = CASE WHEN status = 'pending' THEN NOW() ELSE finished_at END
+             WHERE id = $1 RETURNING *`,
+            [jobId]
         );
         if (result.rows.length === 0) {
             return res.status(404).json({ error: 'Job not found' });
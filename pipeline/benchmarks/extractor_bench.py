@@ -0,0 +1,145 @@
+# 本文抽出方式（service.content_extractor）の比較ベンチマーク
+#
+# 設定済みフィード（rss_feeds.yaml）から保存した実際の記事HTML（benchmarks/fixtures/*.html）ごとに、
+# 各抽出方式のパース時間と抽出文字数を比較し、ソース別にも集計する。
+# fixturesは --save で保存する（ファイル名は「ソース名_フィード_連番.html」、取得元URLは sources.json に記録する）。
+# 実際のページの構造で比べるため、手書きのHTML（テスト用は tests/fixtures）は対象にしない。
+#
+#   python -m benchmarks.extractor_bench                  # 保存済みのfixturesで比較
+#   python -m benchmarks.extractor_bench --save 1         # 設定済みフィードの各フィードから1記事を保存してから比較
+
+import argparse
+import json
+import os
+import re
+import statistics
+import sys
+import time
+from typing import Dict, List
+
+import feedparser
+import httpx
+
+from service.content_extractor import EXTRACTORS, parse_article_page
+from service.http_fetcher import DEFAULT_USER_AGENT
+
+FIXTURES_DIR = os.path.join(os.path.dirname(__file__), "fixtures")
+# 保存したページの取得元（ファイル名 → {"source", "feed_url", "url"}）
+MANIFEST = "sources.json"
+
+
+def _load_manifest(directory: str) -> Dict[str, dict]:
+    path = os.path.join(directory, MANIFEST)
+    if not os.path.exists(path):
+        return {}
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def save_fixtures(per_feed: int, directory: str = FIXTURES_DIR) -> List[str]:
+    # 設定済みフィード（rss_feeds.yaml）の各フィードから先頭per_feed記事のHTMLを保存し、取得元をsources.jsonに記録する
+    from repository.rss_feeds_loader import get_rss_feeds
+    os.makedirs(directory, exist_ok=True)
+    manifest = _load_manifest(directory)
+    saved = []
+    with httpx.Client(timeout=10, follow_redirects=True, headers={"User-Agent": DEFAULT_USER_AGENT}) as client:
+        for source, feeds in get_rss_feeds().items():
+            for feed in feeds:
+                feed_url = feed["url"]
+                try:
+                    entries = feedparser.parse(client.get(feed_url).content).entries[:per_feed]
+                except Exception as e:
+                    print(f"[WARN] {feed_url}: {e}")
+                    continue
+                for i, entry in enumerate(entries):
+                    try:
+                        resp = client.get(entry.link)
+                        resp.raise_for_status()
+                    except Exception as e:
+                        print(f"[WARN] {entry.get('link')}: {e}")
+                        continue
+                    slug = re.sub(r"[^0-9A-Za-z]+", "_", f"{source}_{feed_url.rsplit('/', 1)[-1]}").strip("_").lower()
+                    filename = f"{slug}_{i}.html"
+                    with open(os.path.join(directory, filename), "wb") as f:
+                        f.write(resp.content)
+                    manifest[filename] = {"source": source, "feed_url": feed_url, "url": entry.link}
+                    saved.append(filename)
+    with open(os.path.join(directory, MANIFEST), "w", encoding="utf-8") as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2, sort_keys=True)
+    return saved
+
+
+def run_benchmark(directory: str = FIXTURES_DIR, repeat: int = 5) -> Dict[str, dict]:
+    """
+    各fixtureを抽出方式ごとにrepeat回パースし、方式ごとの合計（中央値ms・抽出文字数）とソース別・ファイル別の結果を返す
+
+    :raises FileNotFoundError: 保存済みのページがない場合（先に --save で保存する）
+    """
+    manifest = _load_manifest(directory)
+    files = sorted(f for f in manifest if os.path.exists(os.path.join(directory, f)))
+    if not files:
+        raise FileNotFoundError(
+            f"no saved pages in {directory}; run 'python -m benchmarks.extractor_bench --save 1' first"
+        )
+    totals = {name: {"ms": 0.0, "chars": 0} for name in EXTRACTORS}
+    per_source: Dict[str, dict] = {}
+    per_file = {}
+    for filename in files:
+        source = manifest[filename]["source"]
+        by_source = per_source.setdefault(source, {name: {"ms": 0.0, "chars": 0} for name in EXTRACTORS})
+        with open(os.path.join(directory, filename), "rb") as f:
+            html = f.read()
+        row = {"bytes": len(html)}
+        for name in EXTRACTORS:
+            timings = []
+            for _ in range(max(1, repeat)):
+                started = time.perf_counter()
+                page = parse_article_page(html, filename, extractor=name)
+                timings.append((time.perf_counter() - started) * 1000)
+            ms = statistics.median(timings)
+            row[name] = {"ms": round(ms, 2), "chars": len(page.content)}
+            for total in (totals[name], by_source[name]):
+                total["ms"] += ms
+                total["chars"] += len(page.content)
+        per_file[filename] = row
+
+    def rounded(sums: dict) -> dict:
+        return {k: {"ms": round(v["ms"], 2), "chars": v["chars"]} for k, v in sums.items()}
+
+    return {
+        "files": per_file,
+        "sources": {source: rounded(sums) for source, sums in sorted(per_source.items())},
+        "totals": rounded(totals),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="本文抽出方式のパース時間・抽出文字数を比較する")
+    parser.add_argument("--fixtures", default=FIXTURES_DIR, help="HTMLを置くディレクトリ")
+    parser.add_argument("--repeat", type=int, default=5, help="1ファイルあたりの計測回数（中央値を使う）")
+    parser.add_argument("--save", type=int, default=0, help="比較前に各フィードから保存する記事数（1以上で全ソースを保存）")
+    args = parser.parse_args()
+    if args.save:
+        print(f"saved {len(save_fixtures(args.save, args.fixtures))} pages")
+    try:
+        result = run_benchmark(args.fixtures, args.repeat)
+    except FileNotFoundError as e:
+        sys.exit(str(e))
+    from repository.rss_feeds_loader import get_rss_feeds
+    missing = sorted(set(get_rss_feeds()) - set(result["sources"]))
+    if missing:
+        print(f"[WARN] no saved pages for: {', '.join(missing)} (run with --save 1)")
+    header = "".join(f"{name + ' ms':>12}{name + ' chars':>14}" for name in EXTRACTORS)
+    print(f"{'file':<40}{'bytes':>10}{header}")
+    for filename, row in result["files"].items():
+        cols = "".join(f"{row[name]['ms']:>12.2f}{row[name]['chars']:>14}" for name in EXTRACTORS)
+        print(f"{filename[:40]:<40}{row['bytes']:>10}{cols}")
+    for source, sums in result["sources"].items():
+        cols = "".join(f"{t['ms']:>12.2f}{t['chars']:>14}" for t in sums.values())
+        print(f"{'total ' + source:<40}{'':>10}{cols}")
+    cols = "".join(f"{t['ms']:>12.2f}{t['chars']:>14}" for t in result["totals"].values())
+    print(f"{'total':<40}{'':>10}{cols}")
+
+
+if __name__ == "__main__":
+    main()
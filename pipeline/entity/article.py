@@ -1,8 +1,23 @@
+import re
 from dataclasses import dataclass
 from datetime import datetime
-from typing import List
+from typing import List, Optional
 from dataclasses import field
 
+_SCHEME_HOST_RE = re.compile(r"^[A-Za-z][A-Za-z0-9+.-]*://[^/?]*")
+
+def normalize_url(url: str) -> str:
+    """
+    記事の同一性判定に使うURLキーを返す（DB関数article_url_key()と同じ規則）
+
+    前後の空白とフラグメントを除去し、スキーム・ホストを小文字化、末尾の「/」を除去する
+    """
+    u = (url or "").strip(" ").split("#", 1)[0]
+    m = _SCHEME_HOST_RE.match(u)
+    if m:
+        u = m.group(0).lower() + u[m.end():]
+    return u.rstrip("/")
+
 @dataclass
 class Article:
     """
@@ -16,6 +31,7 @@ class Article:
     :param labels: ラベルリスト
     :param thumbnail_url: サムネイル画像URL
     :param content: 記事本文
+    :param simhash: 近似重複判定用の指紋（service.near_duplicate.article_fingerprint）
     """
     title: str
     url: str
@@ -24,4 +40,10 @@ class Article:
     summary: str = ""
     labels: List[str] = field(default_factory=list)
     thumbnail_url: str = ""
-    content: str = ""
\ No newline at end of file
+    content: str = ""
+    simhash: Optional[int] = None
+
+    @property
+    def url_key(self) -> str:
+        """重複判定用の正規化URL"""
+        return normalize_url(self.url)
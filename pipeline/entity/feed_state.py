@@ -0,0 +1,24 @@
+from dataclasses import dataclass
+from datetime import date, datetime
+from typing import Optional
+
+@dataclass
+class FeedState:
+    """
+    RSSフィードの条件付きGET用バリデータ
+
+    :param feed_url: フィードURL
+    :param etag: 前回レスポンスのETag
+    :param last_modified: 前回レスポンスのLast-Modified
+    :param content_hash: 前回取得したフィード本文のSHA-256
+    :param last_fetched_at: 最終取得日時
+    :param crawled_from: 前回パースした対象期間の開始日（この期間内の再取得だけ304・本文ハッシュ不変で省略できる）
+    :param crawled_to: 前回パースした対象期間の終了日（その日を含む）
+    """
+    feed_url: str
+    etag: Optional[str] = None
+    last_modified: Optional[str] = None
+    content_hash: Optional[str] = None
+    last_fetched_at: Optional[datetime] = None
+    crawled_from: Optional[date] = None
+    crawled_to: Optional[date] = None
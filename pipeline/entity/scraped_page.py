@@ -0,0 +1,22 @@
+from dataclasses import dataclass
+
+@dataclass
+class ScrapedPage:
+    """
+    記事ページを1回取得・1回パースして得られる抽出結果
+
+    :param url: 取得したURL
+    :param content: 記事本文テキスト
+    :param thumbnail_url: OGP画像URL（og:image、なければtwitter:image）
+    :param title: ページタイトル（og:title、なければ<title>）
+    :param description: 概要（og:description、なければmeta description）
+    :param site_name: サイト名（og:site_name）
+    :param published_time: 公開日時文字列（article:published_time）
+    """
+    url: str
+    content: str = ""
+    thumbnail_url: str = ""
+    title: str = ""
+    description: str = ""
+    site_name: str = ""
+    published_time: str = ""
@@ -1,4 +1,5 @@
 from fastapi import APIRouter, Query
+import os
 from typing import Optional
 from datetime import date
 import uuid
@@ -18,28 +19,63 @@ async def global_exception_handler(request: FastAPIRequest, exc: Exception):
         content={"status": "error", "error": str(exc)},
     )
 
-from usecase.crawl_articles import crawl_articles
+from usecase.crawl_articles import crawl_articles_async
 from repository.db import (
-    insert_job, update_job_status, get_job_by_id, get_job_history,
-    get_db_conn, get_articles_by_topics_id, update_monthly_summary
+    get_job_by_id, get_job_history, cancel_job, retry_job, get_job_events,
+    get_db_conn, get_db_pool_stats, get_articles_by_topics_id, update_monthly_summary
 )
 from usecase.summarize_articles import summarize_articles
 from usecase.tag_articles import tag_articles
+from service.llm_cache import get_llm_cache_stats
+from usecase.jobs import enqueue_job
+from interface.streaming import resolve_format, format_event, streaming_response, run_with_events
+import asyncio
 
 from fastapi import Request
 from fastapi import Body
 
-# ジョブ管理（DB実装）
+# ジョブ管理（DB実装：jobsテーブルをキューとしてワーカープロセスが実行）
+def _job_view(job: dict) -> dict:
+    return {
+        "job_id": job["id"],
+        "status": job["status"],
+        "type": job["type"],
+        "progress": job["progress"],
+        "params": job["params"],
+        "attempts": job["attempts"],
+        "max_attempts": job["max_attempts"],
+        "cancel_requested": job["cancel_requested"],
+        "worker_id": job["worker_id"],
+        "created_at": job["created_at"],
+        "started_at": job["started_at"],
+        "heartbeat_at": job["heartbeat_at"],
+        "finished_at": job["finished_at"],
+        "result": job["result"],
+        "error": job["error"]
+    }
+
 @router.post("/jobs/start")
 def start_job(body: dict = Body(...)):
     """
-    バッチ/AI処理のジョブを開始し、ジョブIDを返す
+    ジョブ（crawl / summarize / tag / thumbnails / monthly_summary）を登録し、即座にジョブIDを返す
+
+    body: {"type": "summarize", "params": {"limit": 50}, "max_attempts": 3}
+    summarize / tag / thumbnails は params に {"drain": true, "time_budget_sec": 600} を指定すると、
+    未処理記事がなくなるか時間予算を過ぎるまで limit 件ずつ確保しながら処理する（複数ワーカーで同時に実行できる）
     """
     job_type = body.get("type", "summarize")
-    # 実際のバッチ処理は非同期で実装する想定
-    # ここでは即時完了とする
-    job_id = insert_job(job_type, status="success")
-    return {"job_id": job_id, "status": "success", "type": job_type}
+    try:
+        job_id = enqueue_job(job_type, body.get("params") or {}, body.get("max_attempts", 3))
+    except ValueError as e:
+        return JSONResponse(content={"status": "error", "error": str(e)}, status_code=400)
+    return {"job_id": job_id, "status": "pending", "type": job_type}
+
+@router.get("/jobs")
+def list_jobs(limit: int = Query(20, ge=1, le=200)):
+    """
+    ジョブ履歴を新しい順に返す
+    """
+    return {"jobs": [_job_view(job) for job in get_job_history(limit)]}
 
 @router.get("/jobs/{job_id}/status")
 def get_job_status(job_id: int):
@@ -49,53 +85,210 @@ def get_job_status(job_id: int):
     job = get_job_by_id(job_id)
     if not job:
         return {"status": "not_found"}
-    return {
-        "job_id": job["id"],
-        "status": job["status"],
-        "type": job["type"],
-        "started_at": job["started_at"],
-        "finished_at": job["finished_at"],
-        "result": job["result"]
-    }
+    return _job_view(job)
+
+@router.post("/jobs/{job_id}/cancel")
+def cancel_job_endpoint(job_id: int):
+    """
+    ジョブをキャンセルする（pendingは即時、runningはワーカーが次の進捗報告時に中断）
+    """
+    job = cancel_job(job_id)
+    if not job:
+        return JSONResponse(content={"status": "error", "error": "キャンセル可能なジョブがありません"}, status_code=409)
+    return _job_view(job)
+
+@router.post("/jobs/{job_id}/retry")
+def retry_job_endpoint(job_id: int):
+    """
+    失敗・キャンセルしたジョブを再投入する
+    """
+    job = retry_job(job_id)
+    if not job:
+        return JSONResponse(content={"status": "error", "error": "再投入できるのはfailure/cancelledのジョブのみです"}, status_code=409)
+    return _job_view(job)
+
+# 追跡を打ち切るジョブの状態（pendingはリトライ待ちを含むため追跡を続ける）
+_JOB_FINISHED_STATUSES = ("success", "failure", "cancelled")
+
+@router.get("/jobs/{job_id}/events")
+async def job_events(
+    job_id: int,
+    request: Request,
+    after: int = Query(0, description="このイベントIDより後から返す（SSEの再接続時はLast-Event-IDを優先）"),
+    follow: bool = Query(True, description="ジョブ終了までイベントを流し続ける（falseなら現時点までをJSONで返す）"),
+    format: Optional[str] = Query(None, description="ストリーム形式（ndjson / sse、省略時はAcceptヘッダで判定）")
+):
+    """
+    ジョブの進捗イベント（job_events）を返す。follow=trueでは終了までNDJSON/SSEで追跡する
+    """
+    job = await asyncio.to_thread(get_job_by_id, job_id)
+    if not job:
+        return JSONResponse(content={"status": "error", "error": "ジョブが見つかりません"}, status_code=404)
+    last_event_id = request.headers.get("last-event-id")
+    after_id = int(last_event_id) if last_event_id and last_event_id.isdigit() else after
+    if not follow:
+        rows = await asyncio.to_thread(get_job_events, job_id, after_id)
+        return {"job_id": job_id, "status": job["status"], "events": [{"id": row["id"], **row["event"]} for row in rows]}
+    fmt = resolve_format(request, format)
+
+    async def tail():
+        nonlocal after_id
+        while True:
+            rows = await asyncio.to_thread(get_job_events, job_id, after_id)
+            for row in rows:
+                after_id = row["id"]
+                yield format_event({"id": row["id"], **row["event"]}, fmt, event_id=row["id"])
+            if rows:
+                continue
+            current = await asyncio.to_thread(get_job_by_id, job_id)
+            if not current or current["status"] in _JOB_FINISHED_STATUSES:
+                # 終了判定後に書き込まれたイベントがないか最後に1回確認する
+                for row in await asyncio.to_thread(get_job_events, job_id, after_id):
+                    yield format_event({"id": row["id"], **row["event"]}, fmt, event_id=row["id"])
+                status = current["status"] if current else "not_found"
+                yield format_event({"event": "end", "job_id": job_id, "status": status}, fmt)
+                return
+            if await request.is_disconnected():
+                return
+            await asyncio.sleep(1.0)
+
+    return streaming_response(tail(), fmt)
 
 @router.get("/health")
 def health_check():
     try:
         with get_db_conn() as conn:
             with conn.cursor() as cur:
-                cur.execute("SELECT 1;")
+                cur.execute("SELECT 1 AS ok;")
                 result = cur.fetchone()
-        return {"status": "ok", "db": result[0]}
+        return {"status": "ok", "db": result["ok"], "db_pool": get_db_pool_stats()}
     except Exception as e:
-        return {"status": "ng", "error": str(e)}
+        return {"status": "ng", "error": str(e), "db_pool": get_db_pool_stats()}
+
+@router.get("/ready")
+def readiness_check():
+    """
+    処理を受け付けられるかを返す（/healthはプロセスとDBの死活、/readyはスキーマとLLMの準備）
+
+    マイグレーション完了前、および既定プロバイダがollamaの場合はモデルのpull完了まで503を返す
+    """
+    from service.summarizer import LLM_PROVIDER
+    from service.ollama_llm_service import get_ollama_model_status
+    from repository.migrations import get_migration_status
+    ollama = get_ollama_model_status()
+    migrations = get_migration_status()
+    if LLM_PROVIDER == "ollama":
+        ready = ollama["state"] == "ready"
+    else:
+        ready = bool(os.environ.get("OPENAI_API_KEY"))
+    # MIGRATE_ON_START=falseで別途適用する運用ではpendingのまま（準備完了とみなす）
+    ready = ready and migrations["state"] in ("done", "pending")
+    content = {"ready": ready, "llm_provider": LLM_PROVIDER, "ollama": ollama, "migrations": migrations}
+    return JSONResponse(content=content, status_code=200 if ready else 503)
+
+@router.get("/stats/db_pool")
+def db_pool_stats():
+    """
+    DBコネクションプールの利用状況（使用中・待ち・待ち時間）を返す
+    """
+    return get_db_pool_stats()
+
+@router.get("/stats/llm_cache")
+def llm_cache_stats():
+    """
+    LLM結果キャッシュのヒット・ミス数（プロセス起動以降）を返す
+    """
+    return get_llm_cache_stats()
+
+# --- 記事検索API ---
+from usecase.search_articles import search_articles
+
+@router.get("/search")
+def search(
+    q: str = Query(..., description="検索語（空白区切りでAND検索。大文字小文字・全角半角は区別しない）"),
+    sources: Optional[list[str]] = Query(None, alias="source", description="ソースで絞り込む（複数可）"),
+    date_from: Optional[date] = Query(None, alias="from", description="公開日の下限（YYYY-MM-DD、その日を含む）"),
+    date_to: Optional[date] = Query(None, alias="to", description="公開日の上限（YYYY-MM-DD、その日を含む）"),
+    sort: str = Query("relevance", description="並び順（relevance: 関連度順 / date: 新しい順）"),
+    cursor: Optional[str] = Query(None, description="前ページのnext_cursor"),
+    limit: Optional[int] = Query(None, ge=1, le=100, description="1ページの件数"),
+):
+    """
+    記事をタイトル・ラベル・要約・本文から検索する（近似重複記事は代表記事だけを返す）
+    """
+    try:
+        return search_articles(q, sources, date_from, date_to, sort, cursor, limit)
+    except ValueError as e:
+        return JSONResponse(content={"status": "error", "error": str(e)}, status_code=400)
 
 @router.post("/crawl")
-def crawl(
+async def crawl(
     request: Request,
     start_date: date = Query(..., description="収集開始日（YYYY-MM-DD）"),
     end_date: Optional[date] = Query(None, description="収集終了日（YYYY-MM-DD、省略時はstart_dateと同じ）"),
-    sources: Optional[list[str]] = Query(None, description="収集対象ソース（複数可）")
+    sources: Optional[list[str]] = Query(None, description="収集対象ソース（複数可）"),
+    use_feed_cache: bool = Query(True, description="前回から変化がなく、前回取得した期間に含まれるフィードをスキップする")
 ):
     print(f"[DEBUG] /crawl start_date={start_date} end_date={end_date} sources={sources}")
     if end_date is None:
         end_date = start_date
-    result = crawl_articles(start_date, end_date, sources)
+    result = await crawl_articles_async(start_date, end_date, sources, use_feed_cache)
     return {"status": "ok", **result}
 
+@router.post("/crawl/stream")
+async def crawl_stream(
+    request: Request,
+    start_date: date = Query(..., description="収集開始日（YYYY-MM-DD）"),
+    end_date: Optional[date] = Query(None, description="収集終了日（YYYY-MM-DD、省略時はstart_dateと同じ）"),
+    sources: Optional[list[str]] = Query(None, description="収集対象ソース（複数可）"),
+    use_feed_cache: bool = Query(True, description="前回から変化がなく、前回取得した期間に含まれるフィードをスキップする"),
+    format: Optional[str] = Query(None, description="ストリーム形式（ndjson / sse、省略時はAcceptヘッダで判定）")
+):
+    """
+    /crawl のストリーミング版。フィード・記事単位のイベントを逐次返し、最後にdoneイベントで集計を返す
+    """
+    if end_date is None:
+        end_date = start_date
+    fmt = resolve_format(request, format)
+    run = lambda on_event: crawl_articles_async(start_date, end_date, sources, use_feed_cache, on_event=on_event)
+    return streaming_response(run_with_events(run, fmt), fmt)
+
 @router.post("/summarize")
 def summarize(body: dict = Body(...)):
     try:
         limit = body.get("limit", 20)
-        result = summarize_articles(limit=limit)
+        concurrency = body.get("concurrency")
+        llm_batch = body.get("llm_batch")
+        # drain: trueなら未処理がなくなるかtime_budget_secを過ぎるまでlimit件ずつ処理し続ける
+        result = summarize_articles(
+            limit=limit, concurrency=concurrency, llm_batch=llm_batch,
+            drain=bool(body.get("drain", False)), time_budget_sec=body.get("time_budget_sec")
+        )
         return {"status": "ok", **result}
     except Exception as e:
         return {"status": "error", "error": str(e)}
 
+@router.post("/summarize/stream")
+async def summarize_stream(request: Request, body: dict = Body(...), format: Optional[str] = Query(None)):
+    """
+    /summarize のストリーミング版。記事ごとのsummarized/errorイベントを要約完了順に返す
+    """
+    fmt = resolve_format(request, format)
+    run = lambda on_event: asyncio.to_thread(
+        summarize_articles,
+        limit=body.get("limit", 20), concurrency=body.get("concurrency"), llm_batch=body.get("llm_batch"),
+        drain=bool(body.get("drain", False)), time_budget_sec=body.get("time_budget_sec"),
+        on_event=on_event
+    )
+    return streaming_response(run_with_events(run, fmt), fmt)
+
 @router.post("/tag")
 def tag(body: dict = Body(...)):
     try:
         limit = body.get("limit", 20)
-        result = tag_articles(limit=limit)
+        result = tag_articles(
+            limit=limit, drain=bool(body.get("drain", False)), time_budget_sec=body.get("time_budget_sec")
+        )
         return {"status": "ok", **result}
     except Exception as e:
         return {"status": "error", "error": str(e)}
@@ -158,39 +351,47 @@ def categorize_article(body: dict = Body(...)):
 
 # --- topics月次まとめ生成API ---
 from service.ollama_llm_service import OllamaLLMService
+from usecase.generate_monthly_summary import (
+    generate_monthly_summary as generate_topics_monthly_summary, SOURCE_MODES as MONTHLY_SOURCE_MODES
+)
 
 @router.post("/topics/{topics_id}/summary")
-def generate_monthly_summary(topics_id: int):
+def generate_monthly_summary(
+    topics_id: int,
+    llm_provider: str = Query("ollama", description="利用するLLMプロバイダ（ollama / openai）"),
+    source_mode: str = Query("stored", description="記事テキストの選び方（stored: 保存済み要約・本文を優先 / fetch: 全記事をURLから取得）")
+):
     """
     指定TOPICSの記事リストから月次まとめをLLMで生成し、DBに保存して返す
     """
+    if source_mode not in MONTHLY_SOURCE_MODES:
+        return JSONResponse(content={"status": "error", "error": f"source_modeは{MONTHLY_SOURCE_MODES}のいずれかです"}, status_code=400)
     try:
-        articles = get_articles_by_topics_id(topics_id)
-        if not articles:
-            return JSONResponse(content={"status": "error", "error": "記事が見つかりません"}, status_code=404)
-        # 記事本文や要約を連結してLLMに渡す
-        article_texts = []
-        for art in articles:
-            text = art.get("summary") or f"{art.get('title')}（{art.get('source')}）"
-            article_texts.append(text)
-        llm = OllamaLLMService()
-        summary = llm.generate_monthly_summary(article_texts)
-        update_monthly_summary(topics_id, summary)
+        # 保存済みの要約・本文を優先し、どちらもない記事だけURLから並行取得する
+        summary = generate_topics_monthly_summary(topics_id, llm_provider=llm_provider, source_mode=source_mode)
         return JSONResponse(content={"monthly_summary": summary})
+    except ValueError as e:
+        return JSONResponse(content={"status": "error", "error": str(e)}, status_code=404)
     except Exception as e:
         return JSONResponse(content={"status": "error", "error": str(e)}, status_code=500)
 
 # --- topicsテンプレート出力API ---
-from usecase.topics_export import export_topics_html
+from fastapi import Response
+from usecase.topics_export import export_topics_html_cached
 
-@router.post("/topics/{topics_id}/export")
-def export_topics(topics_id: int):
+@router.api_route("/topics/{topics_id}/export", methods=["GET", "POST"])
+def export_topics(topics_id: int, request: Request):
     """
-    指定TOPICSのテンプレHTMLを生成して返す
+    指定TOPICSのテンプレHTMLを返す（内容が変わっていなければ保存済みHTMLを返し、If-None-Match一致なら304）
     """
     try:
-        html = export_topics_html(topics_id)
-        return JSONResponse(content={"html": html})
+        html, key = export_topics_html_cached(topics_id)
+        etag = f'"{key}"'
+        if etag in request.headers.get("if-none-match", ""):
+            return Response(status_code=304, headers={"ETag": etag})
+        return JSONResponse(content={"html": html}, headers={"ETag": etag})
+    except ValueError as e:
+        return JSONResponse(content={"status": "error", "error": str(e)}, status_code=404)
     except Exception as e:
         return JSONResponse(content={"status": "error", "error": str(e)}, status_code=500)
 
@@ -0,0 +1,75 @@
+# 進捗イベントのストリーミング応答（NDJSON / Server-Sent Events）
+
+import asyncio
+import json
+from typing import AsyncIterator, Awaitable, Callable, Optional
+
+from fastapi import Request
+from fastapi.responses import StreamingResponse
+
+from service.events import EventSink
+
+STREAM_FORMATS = ("ndjson", "sse")
+
+_MEDIA_TYPES = {"ndjson": "application/x-ndjson", "sse": "text/event-stream"}
+_END = object()
+
+
+def resolve_format(request: Request, fmt: Optional[str]) -> str:
+    # 明示指定がなければAcceptヘッダでSSEかNDJSONかを決める
+    if fmt in STREAM_FORMATS:
+        return fmt
+    return "sse" if "text/event-stream" in request.headers.get("accept", "") else "ndjson"
+
+
+def format_event(event: dict, fmt: str, event_id: Optional[int] = None) -> str:
+    data = json.dumps(event, ensure_ascii=False, default=str)
+    if fmt == "sse":
+        lines = []
+        if event_id is not None:
+            lines.append(f"id: {event_id}")
+        lines.append(f"event: {event.get('event', 'message')}")
+        lines.append(f"data: {data}")
+        return "\n".join(lines) + "\n\n"
+    return data + "\n"
+
+
+def streaming_response(chunks: AsyncIterator[str], fmt: str) -> StreamingResponse:
+    # プロキシのバッファリングを止め、イベントを即時にクライアントへ届ける
+    return StreamingResponse(
+        chunks,
+        media_type=_MEDIA_TYPES[fmt],
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+async def run_with_events(run: Callable[[EventSink], Awaitable[dict]], fmt: str) -> AsyncIterator[str]:
+    """
+    run(on_event) を実行しながら、通知されたイベントを順に書式化して返す
+
+    on_eventはイベントループ上からもワーカースレッドからも呼べる。
+    最後に結果を載せた done（失敗時は error）イベントを返して終わる。
+    クライアントが切断しても処理自体は最後まで続ける（非ストリーミング版と同じ結果を保存する）
+    """
+    loop = asyncio.get_running_loop()
+    queue: asyncio.Queue = asyncio.Queue()
+
+    def on_event(event: dict) -> None:
+        loop.call_soon_threadsafe(queue.put_nowait, event)
+
+    task = asyncio.ensure_future(run(on_event))
+    task.add_done_callback(lambda _: loop.call_soon_threadsafe(queue.put_nowait, _END))
+    while True:
+        event = await queue.get()
+        if event is _END:
+            break
+        yield format_event(event, fmt)
+    # 結果通知の前に、完了コールバックより後に積まれたイベントがあれば流す
+    while not queue.empty():
+        event = queue.get_nowait()
+        if event is not _END:
+            yield format_event(event, fmt)
+    if task.exception() is not None:
+        yield format_event({"event": "error", "error": str(task.exception())}, fmt)
+    else:
+        yield format_event({"event": "done", "result": task.result()}, fmt)
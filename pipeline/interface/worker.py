@@ -0,0 +1,195 @@
+# jobsテーブルからジョブを取り出して実行するワーカー
+#
+# 単体起動: python -m interface.worker --workers 4
+# JOB_WORKERS>0 のときは main.py の lifespan もマイグレーション完了後に JOB_WORKERS 個のワーカープロセスを起動する
+
+import argparse
+import multiprocessing
+import os
+import signal
+import socket
+import threading
+import time
+import traceback
+from typing import List, Optional
+
+from repository.db import (
+    claim_job, heartbeat_job, complete_job, fail_job, mark_job_cancelled, requeue_stale_jobs, close_db_pool,
+    insert_job_events
+)
+from repository.migrations import run_migrations
+from usecase.jobs import JOB_HANDLERS, JobCancelled, JobContext
+
+# APIプロセス内で起動するワーカー数（既定0: ワーカーは単体起動する）
+JOB_WORKERS = int(os.environ.get("JOB_WORKERS", 0))
+# 単体起動時の既定ワーカー数
+JOB_WORKERS_STANDALONE = int(os.environ.get("JOB_WORKERS_STANDALONE", 2))
+JOB_POLL_INTERVAL_SEC = float(os.environ.get("JOB_POLL_INTERVAL_SEC", 2))
+JOB_HEARTBEAT_SEC = float(os.environ.get("JOB_HEARTBEAT_SEC", 10))
+# この秒数ハートビートがないrunningジョブは停止したワーカーのものとみなしてpendingへ戻す
+JOB_STALE_SEC = float(os.environ.get("JOB_STALE_SEC", 120))
+JOB_RETRY_DELAY_SEC = float(os.environ.get("JOB_RETRY_DELAY_SEC", 30))
+# 進捗イベントをjob_eventsへ書き込む間隔（秒）
+JOB_EVENT_FLUSH_SEC = float(os.environ.get("JOB_EVENT_FLUSH_SEC", 1))
+
+
+def _flush_events(ctx: JobContext) -> None:
+    try:
+        insert_job_events(ctx.job_id, ctx.drain_events())
+    except Exception as e:
+        print(f"[WARN] job {ctx.job_id} event flush failed: {e}")
+
+
+def _heartbeat_loop(ctx: JobContext, worker_id: str, done: threading.Event) -> None:
+    # 実行スレッドとは別に進捗イベントの書き込みとハートビートを定期実行し、キャンセル要求を実行側へ伝える
+    last_beat = time.monotonic()
+    while not done.wait(min(JOB_EVENT_FLUSH_SEC, JOB_HEARTBEAT_SEC)):
+        _flush_events(ctx)
+        if time.monotonic() - last_beat < JOB_HEARTBEAT_SEC:
+            continue
+        last_beat = time.monotonic()
+        try:
+            if heartbeat_job(ctx.job_id, worker_id, ctx.progress):
+                ctx.cancel()
+        except Exception as e:
+            print(f"[WARN] job {ctx.job_id} heartbeat failed: {e}")
+
+
+def run_job(job: dict, worker_id: str) -> str:
+    """
+    取り出し済みのジョブ1件を実行し、終了時のstatusを返す
+    """
+    ctx = JobContext(job["id"], job.get("params"))
+    handler = JOB_HANDLERS.get(job["type"])
+    if handler is None:
+        # 登録外の種別（別バージョンのワーカーで投入されたものなど）
+        return fail_job(job["id"], worker_id, f"unknown job type: {job['type']}", JOB_RETRY_DELAY_SEC)
+    done = threading.Event()
+    heartbeat = threading.Thread(target=_heartbeat_loop, args=(ctx, worker_id, done), daemon=True)
+    heartbeat.start()
+    ctx.emit({"event": "job_started", "ts": round(time.time(), 3), "worker_id": worker_id, "attempt": job["attempts"]})
+    result, outcome, error = None, "success", None
+    try:
+        result = handler(ctx)
+    except JobCancelled:
+        outcome = "cancelled"
+    except Exception as e:
+        print(f"[ERROR] job {job['id']} ({job['type']}) failed: {e}")
+        traceback.print_exc()
+        outcome, error = "error", str(e)
+    finally:
+        done.set()
+        heartbeat.join()
+    # 最後のイベントを書き込んでから状態を確定する（追跡側は終了状態を見て打ち切るため）
+    ctx.emit({"event": "job_finished", "ts": round(time.time(), 3), "outcome": outcome, "error": error})
+    _flush_events(ctx)
+    if outcome == "success":
+        complete_job(job["id"], worker_id, result)
+        return "success"
+    if outcome == "cancelled":
+        mark_job_cancelled(job["id"], worker_id)
+        return "cancelled"
+    return fail_job(job["id"], worker_id, error, JOB_RETRY_DELAY_SEC)
+
+
+def run_worker(worker_id: Optional[str] = None, stop_event=None, job_types: Optional[List[str]] = None) -> None:
+    """
+    stop_eventがセットされるまでジョブを取り出して実行し続ける
+
+    :param worker_id: jobs.worker_idに記録する識別子（既定: ホスト名:PID）
+    :param stop_event: 停止指示（threading.Event / multiprocessing.Event）
+    :param job_types: 扱うジョブ種別を限定する場合に指定
+    """
+    worker_id = worker_id or f"{socket.gethostname()}:{os.getpid()}"
+    stop_event = stop_event or threading.Event()
+    print(f"[INFO] job worker {worker_id} started")
+    try:
+        while not stop_event.is_set():
+            try:
+                requeue_stale_jobs(JOB_STALE_SEC)
+                job = claim_job(worker_id, job_types)
+            except Exception as e:
+                print(f"[WARN] job worker {worker_id} poll failed: {e}")
+                job = None
+            if job is None:
+                stop_event.wait(JOB_POLL_INTERVAL_SEC)
+                continue
+            print(f"[INFO] job {job['id']} ({job['type']}) claimed by {worker_id} (attempt {job['attempts']})")
+            status = run_job(job, worker_id)
+            print(f"[INFO] job {job['id']} ({job['type']}) -> {status}")
+    finally:
+        close_db_pool()
+        print(f"[INFO] job worker {worker_id} stopped")
+
+
+def _worker_main(index: int, stop_event) -> None:
+    # 子プロセスでは停止をstop_eventで受け取る（Ctrl+Cは親がまとめて扱う）
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    run_worker(f"{socket.gethostname()}:{os.getpid()}:{index}", stop_event)
+
+
+class WorkerPool:
+    """
+    ワーカープロセス群の起動・停止
+
+    使い方:
+        pool = WorkerPool(4).start()
+        ...
+        pool.stop()
+    """
+
+    def __init__(self, workers: Optional[int] = None):
+        self.workers = JOB_WORKERS if workers is None else workers
+        # fork後のスレッド・DB接続の持ち越しを避けるためspawnで起動する
+        self._mp = multiprocessing.get_context("spawn")
+        self._stop_event = self._mp.Event()
+        self._processes: List[multiprocessing.Process] = []
+
+    def start(self) -> "WorkerPool":
+        # 起動前に停止済みなら何もしない（マイグレーション待ちの間にAPIが終了した場合）
+        if self._stop_event.is_set():
+            return self
+        for i in range(self.workers):
+            proc = self._mp.Process(target=_worker_main, args=(i, self._stop_event), name=f"job-worker-{i}", daemon=True)
+            proc.start()
+            self._processes.append(proc)
+        return self
+
+    def request_stop(self) -> None:
+        self._stop_event.set()
+
+    def stop(self, timeout: float = 30.0) -> None:
+        # 実行中のジョブは最後まで実行させ、期限を過ぎたものは強制終了（ハートビート切れで再投入される）
+        self.request_stop()
+        for proc in self._processes:
+            proc.join(timeout)
+            if proc.is_alive():
+                proc.terminate()
+        self._processes = []
+
+    def join(self) -> None:
+        for proc in self._processes:
+            proc.join()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="jobsテーブルのジョブを実行するワーカー")
+    parser.add_argument("--workers", type=int, default=JOB_WORKERS_STANDALONE, help="起動するワーカープロセス数")
+    parser.add_argument("--no-migrate", action="store_true", help="起動前にマイグレーションを適用しない")
+    args = parser.parse_args()
+    if not args.no_migrate:
+        # 旧スキーマのままジョブを取り出さないよう、先に適用を済ませる（APIと同時起動でもロックで1回だけ適用される）
+        run_migrations()
+        close_db_pool()
+    pool = WorkerPool(max(1, args.workers)).start()
+
+    def _stop(signum, frame):
+        pool.request_stop()
+
+    signal.signal(signal.SIGTERM, _stop)
+    signal.signal(signal.SIGINT, _stop)
+    pool.join()
+
+
+if __name__ == "__main__":
+    main()
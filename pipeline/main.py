@@ -1,17 +1,52 @@
+import os
+import threading
+from contextlib import asynccontextmanager
+from typing import Optional
 from fastapi import FastAPI
 from interface.api import router
+from repository.db import init_db_pool, close_db_pool
+from repository.migrations import start_migrations, get_migration_status
+from interface.worker import WorkerPool, JOB_WORKERS
+from service.ollama_llm_service import start_ollama_model_pull
+from service.parse_pool import shutdown_parse_pool
 
-# ollamaモデルpull自動化
-try:
-    from service.ollama_llm_service import ensure_ollama_model
-    ensure_ollama_model()
-except Exception as e:
-    print(f"[WARN] ollama model auto-pull failed: {e}")
+def _start_workers_after_migrations(pool: WorkerPool, migrations: Optional[threading.Thread] = None) -> None:
+    # 旧スキーマのままジョブを取り出さないよう、マイグレーション完了を待ってからワーカーを起動する
+    if migrations:
+        migrations.join()
+        if get_migration_status()["state"] == "failed":
+            print("[ERROR] job workers not started: migrations failed")
+            return
+    pool.start()
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # DBコネクションプールをプロセスで1つだけ作成し、終了時に閉じる
+    init_db_pool()
+    # pipeline所有のスキーマ・インデックスを適用（バックグラウンドで実行し、完了は/readyで確認する）
+    migrations = None
+    if os.environ.get("MIGRATE_ON_START", "true").lower() in ("1", "true", "yes", "on"):
+        migrations = start_migrations()
+    # ollamaモデルpull自動化（月次まとめの既定がollamaのため常に実行。バックグラウンドで進め、完了は/readyで確認する）
+    start_ollama_model_pull()
+    # ジョブワーカーはpython -m interface.worker で別途起動する。JOB_WORKERS>0のときだけAPIプロセス内でも起動する
+    workers = None
+    if JOB_WORKERS > 0:
+        workers = WorkerPool(JOB_WORKERS)
+        threading.Thread(
+            target=_start_workers_after_migrations, args=(workers, migrations), name="job-workers-start", daemon=True
+        ).start()
+    yield
+    if workers:
+        workers.stop()
+    shutdown_parse_pool()
+    close_db_pool()
 
 app = FastAPI(
     title="RSS pipeline API",
     description="指定期間のRSS記事を収集しDBへ保存するAPI",
-    version="0.1.0"
+    version="0.1.0",
+    lifespan=lifespan
 )
 
 app.include_router(router)
\ No newline at end of file
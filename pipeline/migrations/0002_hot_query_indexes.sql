@@ -0,0 +1,20 @@
+-- migrate:no-transaction
+-- pipelineの頻出クエリ用インデックス（記事数が増えても全件走査にならないようにする）
+-- 大きなarticlesへの書き込みを止めないようCONCURRENTLYで作成する（トランザクション外で1文ずつ実行）
+-- 各インデックスの述語はrepository/db.pyのクエリのWHERE句と同じ式にしている（部分インデックスの適用条件）
+
+-- 要約待ち（get_articles_without_summary）
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_articles_summary_backlog
+  ON articles (id) WHERE summary IS NULL OR summary = '';
+
+-- タグ付け待ち（get_articles_without_labels）
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_articles_labels_backlog
+  ON articles (id) WHERE (labels IS NULL OR labels = '[]'::jsonb) AND summary IS NOT NULL AND summary <> '';
+
+-- サムネイル待ち（get_articles_without_thumbnail）
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_articles_thumbnail_backlog
+  ON articles (id) WHERE thumbnail_url IS NULL OR thumbnail_url = '';
+
+-- 最新記事一覧（get_latest_articles の ORDER BY と同じ並び）
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_articles_published_created
+  ON articles (published DESC NULLS LAST, created_at DESC);
@@ -0,0 +1,11 @@
+-- 未処理記事（要約・タグ付け・サムネイル待ち）の処理権（リース）
+-- 複数のpipelineが同時に未処理分を処理しても同じ記事を重複して扱わないよう、工程ごとに記事を確保する。
+-- LLM呼び出し中はDB接続・行ロックを保持しないため、行ロックではなく期限付きの行で確保する
+-- （処理中に落ちたプロセスの確保分は lease_until を過ぎると他のプロセスが引き継ぐ）
+CREATE TABLE IF NOT EXISTS article_leases (
+  stage VARCHAR(32) NOT NULL,
+  article_id INTEGER NOT NULL REFERENCES articles(id) ON DELETE CASCADE,
+  worker_id TEXT NOT NULL,
+  lease_until TIMESTAMP NOT NULL,
+  PRIMARY KEY (stage, article_id)
+);
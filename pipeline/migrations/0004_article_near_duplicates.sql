@@ -0,0 +1,26 @@
+-- migrate:no-transaction
+-- 近似重複記事のクラスタ（service/near_duplicate.py）
+-- simhash: タイトル・本文の文字n-gramから作る64ビットの指紋（符号付きで保存）
+-- canonical_id: 同じ記事と判定した代表記事のID（代表記事自身と重複のない記事はNULL）。
+--   要約・タグ付けは代表記事だけに行い、結果を重複記事へ複写する
+ALTER TABLE articles ADD COLUMN IF NOT EXISTS simhash BIGINT;
+
+ALTER TABLE articles ADD COLUMN IF NOT EXISTS canonical_id INTEGER REFERENCES articles(id) ON DELETE SET NULL;
+
+-- 候補検索用: 指紋を16ビットずつ4つに分けた値（バンド）の式インデックス
+-- 距離3以下の指紋はいずれかのバンドが一致するため、4つのインデックスのBitmapOrで候補を引ける
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_articles_simhash_band0
+  ON articles ((simhash & 65535)) WHERE simhash IS NOT NULL;
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_articles_simhash_band1
+  ON articles (((simhash >> 16) & 65535)) WHERE simhash IS NOT NULL;
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_articles_simhash_band2
+  ON articles (((simhash >> 32) & 65535)) WHERE simhash IS NOT NULL;
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_articles_simhash_band3
+  ON articles (((simhash >> 48) & 65535)) WHERE simhash IS NOT NULL;
+
+-- 代表記事の要約を重複記事へ複写する際の検索用
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_articles_canonical_id
+  ON articles (canonical_id) WHERE canonical_id IS NOT NULL;
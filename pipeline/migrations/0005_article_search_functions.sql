@@ -0,0 +1,35 @@
+-- 記事検索用の文字バイグラム索引（service/search.py、GET /search）
+-- 日本語は単語区切りがないため、正規化したテキストの連続2文字（バイグラム）を索引語にする。
+-- pg_trgmの3文字単位では「量子」「半導」のような2文字の語で索引が使えないため、text[]のGIN索引で持つ。
+-- 正規化はservice/search.pyのnormalize_search_textと同じ規則にする（全角英数記号→半角、小文字化、空白・記号の除去）
+
+CREATE OR REPLACE FUNCTION search_normalize(t TEXT) RETURNS TEXT AS $$
+  SELECT lower(regexp_replace(
+    translate(coalesce(t, ''),
+      '！＂＃＄％＆＇（）＊＋，－．／０１２３４５６７８９：；＜＝＞？＠ＡＢＣＤＥＦＧＨＩＪＫＬＭＮＯＰＱＲＳＴＵＶＷＸＹＺ［＼］＾＿｀ａｂｃｄｅｆｇｈｉｊｋｌｍｎｏｐｑｒｓｔｕｖｗｘｙｚ｛｜｝～',
+      '!"#$%&''()*+,-./0123456789:;<=>?@ABCDEFGHIJKLMNOPQRSTUVWXYZ[\]^_`abcdefghijklmnopqrstuvwxyz{|}~'),
+    '[[:space:]!-/:-@[-`{-~　、。・「」『』【】〈〉《》〔〕…‥]+', '', 'g'))
+$$ LANGUAGE SQL IMMUTABLE PARALLEL SAFE;
+
+-- 検索対象のテキスト（タイトル・ラベル・要約・本文の先頭1000文字）。
+-- 欄の区切りに空白を挟み、検索語（空白を含まない）が欄をまたいで一致しないようにする
+CREATE OR REPLACE FUNCTION article_search_doc(title TEXT, summary TEXT, labels JSONB, content TEXT) RETURNS TEXT AS $$
+  SELECT search_normalize(coalesce(title, '')) || ' ' || search_normalize(coalesce(labels::text, '')) || ' '
+      || search_normalize(coalesce(summary, '')) || ' ' || search_normalize(left(coalesce(content, ''), 1000))
+$$ LANGUAGE SQL IMMUTABLE PARALLEL SAFE;
+
+-- テキストに含まれるバイグラム（重複なし、空白を含むものは除く）。
+-- 1文字ずつ展開して隣と連結する（substr(t, i, 2) はUTF-8では先頭から数え直すため文字数の2乗に比例する）。
+-- 1件あたり数ミリ秒かかるためCOSTを高くし、一致件数を少なく見積もった場合も全件に適用する逐次走査を選ばせない
+CREATE OR REPLACE FUNCTION search_bigrams(t TEXT) RETURNS TEXT[] AS $$
+  SELECT coalesce(array_agg(DISTINCT g), '{}')
+  FROM (SELECT c || lead(c) OVER (ORDER BY i) AS g
+        FROM unnest(string_to_array(t, NULL)) WITH ORDINALITY AS u(c, i)) s
+  WHERE position(' ' IN g) = 0
+$$ LANGUAGE SQL IMMUTABLE PARALLEL SAFE COST 10000;
+
+-- 正規化済みテキストを生成列に保存し、検索時の絞り込みの確認（LIKE）と採点で候補ごとに正規化をやり直さない。
+-- 欄は「タイトル ラベル 要約 本文先頭」の順に空白1つで区切られる（各欄の正規化後は空白を含まないため分割して取り出せる）。
+-- 追加時にテーブルを書き換えるため、記事数の多いDBでは書き込みの少ない時間帯に適用する
+ALTER TABLE articles ADD COLUMN IF NOT EXISTS search_doc TEXT
+  GENERATED ALWAYS AS (article_search_doc(title, summary, labels, content)) STORED;
@@ -0,0 +1,10 @@
+-- migrate:no-transaction
+-- 記事検索用の索引（関数・生成列は0005_article_search_functions.sql）
+
+-- 検索語のバイグラムをすべて含む記事を @> で引く（生成列 search_doc の式。repository/db.pyの_search_sqlと同じ式）
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_articles_search_doc_bigrams
+  ON articles USING gin (search_bigrams(search_doc));
+
+-- 新しい順の検索結果のキーセットページング用（search_article_rowsの ORDER BY と同じ並び）
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_articles_published_id
+  ON articles ((coalesce(published, '-infinity'::timestamp)) DESC, id DESC) WHERE canonical_id IS NULL;
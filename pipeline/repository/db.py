@@ -1,95 +1,687 @@
 import os
+import threading
+from contextlib import contextmanager
 import psycopg
+from psycopg.conninfo import make_conninfo
 from psycopg.rows import dict_row
-from typing import List
+from psycopg_pool import ConnectionPool
+from typing import Dict, Iterator, List, Optional, Set, Tuple
 import json
-from entity.article import Article
+from entity.article import Article, normalize_url
+from entity.feed_state import FeedState
 
-def get_db_conn():
-    return psycopg.connect(
+# プロセス共通のコネクションプール（main.pyのlifespanで初期化、未初期化時は初回利用時に作成）
+_pool: Optional[ConnectionPool] = None
+_pool_lock = threading.Lock()
+
+def _conninfo() -> str:
+    return make_conninfo(
         host=os.environ.get("POSTGRES_HOST"),
         dbname=os.environ.get("POSTGRES_DB"),
         user=os.environ.get("POSTGRES_USER"),
         password=os.environ.get("POSTGRES_PASSWORD"),
-        autocommit=True,
-        row_factory=dict_row
     )
 
-def save_articles(articles: List[Article]) -> dict:
+def init_db_pool() -> ConnectionPool:
+    """
+    コネクションプールを作成する（作成済みならそれを返す）
+
+    環境変数: DB_POOL_MIN_SIZE, DB_POOL_MAX_SIZE, DB_POOL_TIMEOUT（取得待ち秒）,
+             DB_POOL_MAX_LIFETIME（接続の最大寿命秒）, DB_POOL_MAX_IDLE（アイドル接続の保持秒）
+    """
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ConnectionPool(
+                _conninfo(),
+                min_size=int(os.environ.get("DB_POOL_MIN_SIZE", 2)),
+                max_size=int(os.environ.get("DB_POOL_MAX_SIZE", 10)),
+                timeout=float(os.environ.get("DB_POOL_TIMEOUT", 30)),
+                max_lifetime=float(os.environ.get("DB_POOL_MAX_LIFETIME", 3600)),
+                max_idle=float(os.environ.get("DB_POOL_MAX_IDLE", 600)),
+                kwargs={"autocommit": True, "row_factory": dict_row},
+                name="pipeline",
+                # DB未起動でもサービス起動を妨げない（接続はバックグラウンドで確立）
+                open=True,
+            )
+        return _pool
+
+def close_db_pool() -> None:
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.close()
+            _pool = None
+
+@contextmanager
+def get_db_conn() -> Iterator[psycopg.Connection]:
+    # プールから接続を借り、ブロックを抜けたら返却する
+    pool = _pool or init_db_pool()
+    with pool.connection() as conn:
+        yield conn
+
+def get_db_pool_stats() -> dict:
+    # プールの利用状況（使用中・待ち・待ち時間）を返す
+    if _pool is None:
+        return {"initialized": False}
+    stats = _pool.get_stats()
+    size = stats.get("pool_size", 0)
+    available = stats.get("pool_available", 0)
+    requests_num = stats.get("requests_num", 0)
+    wait_ms = stats.get("requests_wait_ms", 0)
+    return {
+        "initialized": True,
+        "min_size": stats.get("pool_min", 0),
+        "max_size": stats.get("pool_max", 0),
+        "size": size,
+        "in_use": size - available,
+        "available": available,
+        "waiting": stats.get("requests_waiting", 0),
+        "requests": requests_num,
+        "requests_queued": stats.get("requests_queued", 0),
+        "requests_errors": stats.get("requests_errors", 0) + stats.get("connections_errors", 0),
+        "wait_ms_total": wait_ms,
+        "wait_ms_avg": round(wait_ms / requests_num, 2) if requests_num else 0,
+    }
+
+SAVE_ARTICLES_BATCH_SIZE = int(os.environ.get("SAVE_ARTICLES_BATCH_SIZE", 1000))
+
+# 工程ごとの未処理記事の条件と取得列（条件はmigrations/0002の部分インデックスの述語を含める）
+# 近似重複記事（canonical_idあり）は代表記事の結果を複写するため、要約・タグ付けの対象にしない
+BACKLOG_STAGES: Dict[str, Tuple[str, str]] = {
+    "summarize": (
+        "(summary IS NULL OR summary = '') AND canonical_id IS NULL",
+        "id, title, url, source, created_at, content",
+    ),
+    "tag": (
+        "(labels IS NULL OR labels = '[]'::jsonb) AND summary IS NOT NULL AND summary <> '' AND canonical_id IS NULL",
+        "id, summary",
+    ),
+    "thumbnails": ("thumbnail_url IS NULL OR thumbnail_url = ''", "id, url"),
+}
+
+def _backlog_sql(stage: str) -> str:
+    where, columns = BACKLOG_STAGES[stage]
+    return f"SELECT {columns} FROM articles WHERE {where} ORDER BY id LIMIT %s"
+
+# 頻出クエリ（repository/query_plans.pyで実行計画を確認する）
+SQL_EXISTING_URL_KEYS = "SELECT article_url_key(url) AS url_key FROM articles WHERE article_url_key(url) = ANY(%s)"
+SQL_ARTICLES_WITHOUT_SUMMARY = _backlog_sql("summarize")
+SQL_ARTICLES_WITHOUT_LABELS = _backlog_sql("tag")
+SQL_ARTICLES_WITHOUT_THUMBNAIL = _backlog_sql("thumbnails")
+SQL_LATEST_ARTICLES = """
+    SELECT id, title, url, source, summary, labels, thumbnail_url, published, content
+    FROM articles
+    ORDER BY published DESC NULLS LAST, created_at DESC
+    LIMIT %s
+"""
+
+# 記事検索（service/search.py）。正規化済みテキストは生成列 search_doc（migrations/0005）、
+# 索引はmigrations/0006の idx_articles_search_doc_bigrams（同じ式にする）
+_SEARCH_COLUMNS = "a.id, a.title, a.url, a.source, a.summary, a.labels, a.thumbnail_url, a.published"
+# 公開日時のない記事は最後に並べる（idx_articles_published_id と同じ式）
+_SEARCH_PUBLISHED = "coalesce(a.published, '-infinity'::timestamp)"
+# 検索語が出現した欄ごとの点数（検索語ごとに合計する）。欄は search_doc を空白で区切った位置（1始まり）
+SEARCH_FIELD_WEIGHTS = (("title", 1, 4), ("labels", 2, 2), ("summary", 3, 2), ("content", 4, 1))
+
+def _search_sql(sort: str, with_grams: bool, with_sources: bool, with_from: bool, with_to: bool, with_after: bool) -> str:
+    """
+    search_article_rowsのSQLを組み立てる（指定のない条件は式に含めず、プランナが索引を選べるようにする）
+
+    関連度順は一致した記事のうち新しい順に %(window)s 件を採点して並べ替える（採点が一致件数に比例しないようにする）
+    """
+    where = ["a.search_doc LIKE ALL(%(patterns)s::text[])", "a.canonical_id IS NULL"]
+    if with_grams:
+        where.insert(0, "search_bigrams(a.search_doc) @> %(grams)s::text[]")
+    if with_sources:
+        where.append("a.source = ANY(%(sources)s::text[])")
+    if with_from:
+        where.append("a.published >= %(date_from)s")
+    if with_to:
+        where.append("a.published < %(date_to)s")
+    after_published = "coalesce(%(after_published)s::timestamp, '-infinity'::timestamp)"
+    if sort == "date":
+        if with_after:
+            where.append(f"({_SEARCH_PUBLISHED}, a.id) < ({after_published}, %(after_id)s)")
+        return f"""
+            SELECT {_SEARCH_COLUMNS}
+            FROM articles a
+            WHERE {' AND '.join(where)}
+            ORDER BY {_SEARCH_PUBLISHED} DESC, a.id DESC
+            LIMIT %(limit)s
+        """
+    score = " + ".join(
+        f"CASE WHEN d.fields[{position}] LIKE p THEN {weight} ELSE 0 END"
+        for _, position, weight in SEARCH_FIELD_WEIGHTS
+    )
+    after = f"WHERE (score, sort_published, id) < (%(after_score)s, {after_published}, %(after_id)s)" if with_after else ""
+    return f"""
+        WITH hits AS (
+            SELECT {_SEARCH_COLUMNS}, {_SEARCH_PUBLISHED} AS sort_published, a.search_doc
+            FROM articles a
+            WHERE {' AND '.join(where)}
+            ORDER BY {_SEARCH_PUBLISHED} DESC, a.id DESC
+            LIMIT %(window)s
+        ), ranked AS (
+            SELECT h.*, (SELECT coalesce(sum({score}), 0)::int FROM unnest(%(patterns)s::text[]) AS p) AS score
+            FROM hits h
+            -- search_doc（TOAST）の展開と欄への分割は記事ごとに1回にする
+            CROSS JOIN LATERAL string_to_array(h.search_doc, ' ') AS d(fields)
+        )
+        SELECT id, title, url, source, summary, labels, thumbnail_url, published, score, sort_published
+        FROM ranked
+        {after}
+        ORDER BY score DESC, sort_published DESC, id DESC
+        LIMIT %(limit)s
+    """
+
+# 検索語あり・新しい順の2ページ目以降と、関連度順の1ページ目（repository/query_plans.pyで実行計画を確認する）
+SQL_SEARCH_ARTICLES_BY_DATE = _search_sql("date", True, False, False, False, True)
+SQL_SEARCH_ARTICLES_BY_RELEVANCE = _search_sql("relevance", True, False, False, False, False)
+
+_ARTICLE_COLUMNS = "title, url, source, summary, labels, thumbnail_url, created_at, published, content, simhash"
+
+def _article_row(art: Article) -> tuple:
     from datetime import datetime
-    inserted, skipped = 0, 0
-    with get_db_conn() as conn:
+    published = art.published
+    if not isinstance(published, datetime):
+        published = datetime.fromisoformat(str(published))
+    return (
+        art.title,
+        art.url,
+        art.source,
+        art.summary,
+        json.dumps(art.labels) if art.labels is not None else "[]",
+        art.thumbnail_url or "",
+        published,
+        published,
+        art.content,
+        art.simhash
+    )
+
+def _insert_batch(conn, rows: List[tuple]) -> List[int]:
+    # COPYでステージングへ流し込み、未登録のURLキーだけを1文でINSERTする（1バッチ1トランザクション）。登録したIDを返す
+    with conn.transaction():
         with conn.cursor() as cur:
-            for art in articles:
-                try:
-                    thumbnail_url = art.thumbnail_url or ""
-                    published = art.published
-                    if not isinstance(published, datetime):
-                        published = datetime.fromisoformat(str(published))
+            cur.execute(
+                """
+                CREATE TEMP TABLE IF NOT EXISTS articles_staging (
+                    ord INT, title TEXT, url TEXT, source TEXT, summary TEXT, labels JSONB,
+                    thumbnail_url TEXT, created_at TIMESTAMP, published TIMESTAMP, content TEXT, simhash BIGINT
+                ) ON COMMIT DELETE ROWS
+                """
+            )
+            with cur.copy(f"COPY articles_staging (ord, {_ARTICLE_COLUMNS}) FROM STDIN") as copy:
+                for i, row in enumerate(rows):
+                    copy.write_row((i, *row))
+            cur.execute(
+                f"""
+                INSERT INTO articles ({_ARTICLE_COLUMNS})
+                SELECT {_ARTICLE_COLUMNS} FROM articles_staging s
+                WHERE NOT EXISTS (
+                    SELECT 1 FROM articles a WHERE article_url_key(a.url) = article_url_key(s.url)
+                )
+                ORDER BY s.ord
+                ON CONFLICT DO NOTHING
+                RETURNING id
+                """
+            )
+            return [row["id"] for row in cur.fetchall()]
+
+def _insert_one_by_one(conn, rows: List[tuple]) -> tuple:
+    # バッチ全体が失敗した場合のフォールバック（不正な行だけを除外する）。(登録したID, スキップ件数)を返す
+    inserted, skipped = [], 0
+    placeholders = ", ".join(["%s"] * len(_ARTICLE_COLUMNS.split(",")))
+    with conn.cursor() as cur:
+        for row in rows:
+            try:
+                with conn.transaction():
                     cur.execute(
-                        """
-                        SELECT 1 FROM articles WHERE title=%s AND url=%s AND source=%s
+                        f"""
+                        INSERT INTO articles ({_ARTICLE_COLUMNS})
+                        SELECT {placeholders}
+                        WHERE NOT EXISTS (
+                            SELECT 1 FROM articles WHERE article_url_key(url) = article_url_key(%s)
+                        )
+                        ON CONFLICT DO NOTHING
+                        RETURNING id
                         """,
-                        (art.title, art.url, art.source)
+                        (*row, row[1])
                     )
-                    if cur.fetchone():
+                    row_id = cur.fetchone()
+                    if row_id:
+                        inserted.append(row_id["id"])
+                    else:
                         skipped += 1
-                        continue
-                    cur.execute(
-                        """
-                        INSERT INTO articles (title, url, source, summary, labels, thumbnail_url, created_at, published, content)
-                        VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)
-                        """,
-                        (
-                            art.title,
-                            art.url,
-                            art.source,
-                            art.summary,
-                            json.dumps(art.labels) if art.labels is not None else "[]",
-                            thumbnail_url,
-                            published,
-                            published,
-                            art.content
-                        )
-                    )
-                    inserted += 1
-                except Exception as e:
-                    print(f"[ERROR] save_articles: {e} (title={getattr(art, 'title', '')})")
-    return {"inserted": inserted, "skipped": skipped}
+            except Exception as e:
+                print(f"[ERROR] save_articles: {e} (title={row[0]})")
+    return inserted, skipped
 
-def get_articles_without_thumbnail(limit: int = 100) -> list:
-    result = []
+def save_articles(articles: List[Article], batch_size: int = None) -> dict:
+    """
+    記事を一括登録する。正規化URLキー（article_url_key）が登録済みの記事はスキップする
+
+    :return: {"inserted": 登録件数, "skipped": 登録済み・同一バッチ内重複でスキップした件数, "ids": 登録した記事ID}
+    """
+    batch_size = batch_size or SAVE_ARTICLES_BATCH_SIZE
+    inserted, skipped = 0, 0
+    ids: List[int] = []
+    rows: List[tuple] = []
+    seen_keys = set()
+    for art in articles:
+        try:
+            key = art.url_key
+            if key in seen_keys:
+                skipped += 1
+                continue
+            seen_keys.add(key)
+            rows.append(_article_row(art))
+        except Exception as e:
+            print(f"[ERROR] save_articles: {e} (title={getattr(art, 'title', '')})")
+    with get_db_conn() as conn:
+        for start in range(0, len(rows), batch_size):
+            batch = rows[start:start + batch_size]
+            try:
+                batch_ids = _insert_batch(conn, batch)
+                ids.extend(batch_ids)
+                inserted += len(batch_ids)
+                skipped += len(batch) - len(batch_ids)
+            except Exception as e:
+                # 失敗した行はinserted/skippedのどちらにも数えない（従来どおり）
+                print(f"[WARN] save_articles: bulk insert failed, retrying row by row: {e}")
+                batch_ids, batch_skipped = _insert_one_by_one(conn, batch)
+                ids.extend(batch_ids)
+                inserted += len(batch_ids)
+                skipped += batch_skipped
+    return {"inserted": inserted, "skipped": skipped, "ids": ids}
+
+def get_existing_urls(urls: List[str]) -> Set[str]:
+    # 保存済みのURLを1回のバッチ問い合わせで返す（正規化URLキーの式インデックスを利用）
+    if not urls:
+        return set()
+    keys = {}
+    for url in urls:
+        keys.setdefault(normalize_url(url), []).append(url)
+    with get_db_conn() as conn:
+        with conn.cursor() as cur:
+            cur.execute(SQL_EXISTING_URL_KEYS, (list(keys.keys()),))
+            existing = set()
+            for row in cur.fetchall():
+                existing.update(keys.get(row["url_key"], []))
+            return existing
+
+# RSSフィードの条件付きGET用バリデータ
+def get_feed_states() -> Dict[str, FeedState]:
     with get_db_conn() as conn:
         with conn.cursor() as cur:
             cur.execute(
-                "SELECT id, url FROM articles WHERE thumbnail_url IS NULL OR thumbnail_url = '' LIMIT %s",
-                (limit,)
+                "SELECT feed_url, etag, last_modified, content_hash, last_fetched_at, crawled_from, crawled_to FROM feed_cache"
+            )
+            return {row["feed_url"]: FeedState(**row) for row in cur.fetchall()}
+
+def save_feed_states(states: List[FeedState]) -> None:
+    if not states:
+        return
+    with get_db_conn() as conn:
+        with conn.cursor() as cur:
+            cur.executemany(
+                """
+                INSERT INTO feed_cache (
+                    feed_url, etag, last_modified, content_hash, last_fetched_at, crawled_from, crawled_to, updated_at
+                )
+                VALUES (%s, %s, %s, %s, %s, %s, %s, NOW())
+                ON CONFLICT (feed_url) DO UPDATE SET
+                    etag = EXCLUDED.etag,
+                    last_modified = EXCLUDED.last_modified,
+                    content_hash = EXCLUDED.content_hash,
+                    last_fetched_at = EXCLUDED.last_fetched_at,
+                    crawled_from = EXCLUDED.crawled_from,
+                    crawled_to = EXCLUDED.crawled_to,
+                    updated_at = NOW()
+                """,
+                [
+                    (st.feed_url, st.etag, st.last_modified, st.content_hash, st.last_fetched_at,
+                     st.crawled_from, st.crawled_to)
+                    for st in states
+                ]
             )
-            result = cur.fetchall()
-    return result
 
-def update_article_thumbnail(article_id: int, thumbnail_url: str) -> None:
+def get_articles_without_summary(limit: int = 20) -> list:
+    with get_db_conn() as conn:
+        with conn.cursor() as cur:
+            cur.execute(SQL_ARTICLES_WITHOUT_SUMMARY, (limit,))
+            return cur.fetchall()
+
+def update_article_summaries(results: List[dict]) -> None:
+    """
+    要約結果をまとめて書き戻す（1トランザクション）
+
+    results: {"id", "summary", "labels", "content", "thumbnail_url"}のリスト。
+             Noneの項目は更新しない。thumbnail_urlは未設定の場合に限り更新する
+    """
+    if not results:
+        return
+    with get_db_conn() as conn:
+        with conn.transaction():
+            with conn.cursor() as cur:
+                cur.executemany(
+                    """
+                    UPDATE articles SET
+                        summary = COALESCE(%(summary)s::text, summary),
+                        labels = COALESCE(%(labels)s::jsonb, labels),
+                        content = COALESCE(%(content)s::text, content),
+                        thumbnail_url = CASE
+                            WHEN (thumbnail_url IS NULL OR thumbnail_url = '') AND %(thumbnail_url)s::text IS NOT NULL
+                            THEN %(thumbnail_url)s ELSE thumbnail_url END
+                    WHERE id = %(id)s
+                    """,
+                    [
+                        {
+                            "id": r["id"],
+                            "summary": r.get("summary"),
+                            "labels": json.dumps(r["labels"], ensure_ascii=False) if r.get("labels") is not None else None,
+                            "content": r.get("content"),
+                            "thumbnail_url": r.get("thumbnail_url"),
+                        }
+                        for r in results
+                    ]
+                )
+                _copy_to_near_duplicates(cur, [r["id"] for r in results if r.get("summary")])
+
+# LLM結果キャッシュ
+def get_llm_cache(cache_key: str, ttl_days: int):
+    # 有効期限内ならヒット数・最終ヒット日時を更新して値を返す（1往復）
     with get_db_conn() as conn:
         with conn.cursor() as cur:
             cur.execute(
-                "UPDATE articles SET thumbnail_url=%s WHERE id=%s",
-                (thumbnail_url, article_id)
+                """
+                UPDATE llm_cache SET hit_count = hit_count + 1, last_hit_at = NOW()
+                WHERE cache_key = %s AND created_at > NOW() - make_interval(days => %s)
+                RETURNING value
+                """,
+                (cache_key, ttl_days)
             )
+            row = cur.fetchone()
+            return row["value"] if row else None
 
-def get_latest_articles(limit: int = 10) -> list:
+def put_llm_cache(cache_key: str, kind: str, model: str, prompt_version: str, value) -> None:
     with get_db_conn() as conn:
         with conn.cursor() as cur:
             cur.execute(
                 """
-                SELECT id, title, url, source, summary, labels, thumbnail_url, published, content
-                FROM articles
-                ORDER BY published DESC NULLS LAST, created_at DESC
-                LIMIT %s
+                INSERT INTO llm_cache (cache_key, kind, model, prompt_version, value)
+                VALUES (%s, %s, %s, %s, %s::jsonb)
+                ON CONFLICT (cache_key) DO UPDATE SET
+                    value = EXCLUDED.value, created_at = NOW(), last_hit_at = NULL, hit_count = 0
                 """,
-                (limit,)
+                (cache_key, kind, model, prompt_version, json.dumps(value, ensure_ascii=False))
+            )
+
+def evict_llm_cache(ttl_days: int, max_entries: int) -> int:
+    # 期限切れを削除し、件数上限を超えた分は最近使われていないものから削除する
+    with get_db_conn() as conn:
+        with conn.cursor() as cur:
+            cur.execute(
+                "DELETE FROM llm_cache WHERE created_at <= NOW() - make_interval(days => %s)",
+                (ttl_days,)
             )
+            deleted = cur.rowcount
+            cur.execute(
+                """
+                DELETE FROM llm_cache WHERE cache_key IN (
+                    SELECT cache_key FROM llm_cache
+                    ORDER BY COALESCE(last_hit_at, created_at) DESC
+                    OFFSET %s
+                )
+                """,
+                (max_entries,)
+            )
+            return deleted + cur.rowcount
+
+def get_articles_without_labels(limit: int = 20) -> list:
+    with get_db_conn() as conn:
+        with conn.cursor() as cur:
+            cur.execute(SQL_ARTICLES_WITHOUT_LABELS, (limit,))
+            return cur.fetchall()
+
+def update_article_labels(results: List[tuple]) -> None:
+    # (id, labels)のリストをまとめて書き戻す（1トランザクション）
+    if not results:
+        return
+    with get_db_conn() as conn:
+        with conn.transaction():
+            with conn.cursor() as cur:
+                cur.executemany(
+                    "UPDATE articles SET labels=%s WHERE id=%s",
+                    [(json.dumps(labels, ensure_ascii=False), article_id) for article_id, labels in results]
+                )
+                _copy_to_near_duplicates(cur, [article_id for article_id, _ in results])
+
+def update_article_contents(results: List[tuple]) -> None:
+    # (id, content)のリストをまとめて書き戻す（1トランザクション）
+    if not results:
+        return
+    with get_db_conn() as conn:
+        with conn.transaction():
+            with conn.cursor() as cur:
+                cur.executemany(
+                    "UPDATE articles SET content=%s WHERE id=%s",
+                    [(content, article_id) for article_id, content in results]
+                )
+
+def get_articles_without_thumbnail(limit: int = 100) -> list:
+    result = []
+    with get_db_conn() as conn:
+        with conn.cursor() as cur:
+            cur.execute(SQL_ARTICLES_WITHOUT_THUMBNAIL, (limit,))
+            result = cur.fetchall()
+    return result
+
+def _copy_to_near_duplicates(cur, canonical_ids: List[int]) -> None:
+    # 代表記事の要約・タグを、そのクラスタの重複記事へ複写する（呼び出し元と同じトランザクション）
+    if canonical_ids:
+        cur.execute(
+            """
+            UPDATE articles d SET summary = c.summary, labels = c.labels
+            FROM articles c
+            WHERE d.canonical_id = c.id AND c.id = ANY(%s) AND c.summary IS NOT NULL AND c.summary <> ''
+            """,
+            (list(canonical_ids),)
+        )
+
+def get_near_duplicate_candidates(article_ids: List[int], window_days: float) -> list:
+    """
+    指定記事ごとに、指紋のバンドが1つ以上一致する先に登録された記事を返す（前後window_days日以内に公開されたもの）
+
+    公開日時のない記事は登録日時で比べる（過去分を後からまとめて取り込んでも、公開日の離れた記事を候補にしない）
+
+    :return: {"article_id", "article_simhash", "id", "simhash", "canonical_id"}のリスト（候補のない記事は含まない）
+    """
+    if not article_ids:
+        return []
+    with get_db_conn() as conn:
+        return conn.execute(
+            """
+            SELECT n.id AS article_id, n.simhash AS article_simhash, c.id, c.simhash, c.canonical_id
+            FROM articles n
+            JOIN articles c ON c.id < n.id AND c.simhash IS NOT NULL
+              AND ((c.simhash & 65535) = (n.simhash & 65535)
+                OR ((c.simhash >> 16) & 65535) = ((n.simhash >> 16) & 65535)
+                OR ((c.simhash >> 32) & 65535) = ((n.simhash >> 32) & 65535)
+                OR ((c.simhash >> 48) & 65535) = ((n.simhash >> 48) & 65535))
+              AND coalesce(c.published, c.created_at)
+                  BETWEEN coalesce(n.published, n.created_at) - make_interval(secs => %(window)s)
+                      AND coalesce(n.published, n.created_at) + make_interval(secs => %(window)s)
+            WHERE n.id = ANY(%(ids)s) AND n.simhash IS NOT NULL
+            ORDER BY n.id, c.id
+            """,
+            {"ids": list(article_ids), "window": window_days * 86400}
+        ).fetchall()
+
+def mark_near_duplicates(pairs: List[tuple], keep_content: bool = True) -> int:
+    """
+    (記事ID, 代表記事ID)のリストを1文で書き込み、更新件数を返す
+
+    代表記事が要約済みなら要約・タグをその場で複写する。keep_content=Falseなら重複記事の本文は保存しない
+    """
+    if not pairs:
+        return 0
+    with get_db_conn() as conn:
+        cur = conn.execute(
+            """
+            UPDATE articles d SET
+                canonical_id = t.canonical_id,
+                summary = CASE WHEN c.summary IS NOT NULL AND c.summary <> '' THEN c.summary ELSE d.summary END,
+                labels = CASE WHEN c.summary IS NOT NULL AND c.summary <> '' THEN c.labels ELSE d.labels END,
+                content = CASE WHEN %s THEN d.content ELSE NULL END
+            FROM unnest(%s::int[], %s::int[]) AS t(id, canonical_id)
+            JOIN articles c ON c.id = t.canonical_id
+            WHERE d.id = t.id
+            """,
+            (keep_content, [article_id for article_id, _ in pairs], [canonical_id for _, canonical_id in pairs])
+        )
+        return cur.rowcount
+
+def count_article_backlog(stage: str) -> int:
+    where, _ = BACKLOG_STAGES[stage]
+    with get_db_conn() as conn:
+        return conn.execute(f"SELECT count(*) AS n FROM articles WHERE {where}").fetchone()["n"]
+
+def claim_article_backlog(stage: str, worker_id: str, after_id: int, limit: int, lease_sec: float) -> Tuple[list, Optional[int]]:
+    """
+    未処理記事をID順にafter_idより後ろからlimit件まで確保し、(確保した記事, 走査した最後のID) を返す
+
+    他のプロセスが確保中の記事は飛ばす。走査した最後のIDを次回のafter_idに渡すと、
+    処理に失敗して未処理のまま残った記事を同じ走査で繰り返し確保せずに末尾まで進める。
+    候補がなければ ([], None)
+    """
+    where, columns = BACKLOG_STAGES[stage]
+    with get_db_conn() as conn:
+        with conn.transaction():
+            # 候補の行ロックはこのトランザクションの間だけ（同時に確保中の行は待たずに飛ばす）
+            candidates = [
+                row["id"] for row in conn.execute(
+                    f"""
+                    SELECT id FROM articles a
+                    WHERE ({where}) AND id > %(after_id)s
+                      AND NOT EXISTS (
+                        SELECT 1 FROM article_leases l
+                        WHERE l.stage = %(stage)s AND l.article_id = a.id AND l.lease_until > NOW()
+                      )
+                    ORDER BY id LIMIT %(limit)s
+                    FOR UPDATE SKIP LOCKED
+                    """,
+                    {"after_id": after_id, "stage": stage, "limit": limit}
+                ).fetchall()
+            ]
+            if not candidates:
+                return [], None
+            # 期限切れのリースは引き継ぐ。有効なリースと競合した記事は確保しない
+            claimed = [
+                row["article_id"] for row in conn.execute(
+                    """
+                    INSERT INTO article_leases (stage, article_id, worker_id, lease_until)
+                    SELECT %s, unnest(%s::int[]), %s, NOW() + make_interval(secs => %s)
+                    ON CONFLICT (stage, article_id) DO UPDATE SET
+                        worker_id = EXCLUDED.worker_id, lease_until = EXCLUDED.lease_until
+                    WHERE article_leases.lease_until <= NOW()
+                    RETURNING article_id
+                    """,
+                    (stage, candidates, worker_id, lease_sec)
+                ).fetchall()
+            ]
+            rows = conn.execute(
+                f"SELECT {columns} FROM articles WHERE id = ANY(%s) ORDER BY id", (claimed,)
+            ).fetchall() if claimed else []
+    return rows, candidates[-1]
+
+def release_article_leases(stage: str, worker_id: str, article_ids: List[int]) -> None:
+    # 処理を終えた記事の確保を解除する（他プロセスに引き継がれた分は消さない）
+    if not article_ids:
+        return
+    with get_db_conn() as conn:
+        conn.execute(
+            "DELETE FROM article_leases WHERE stage = %s AND worker_id = %s AND article_id = ANY(%s)",
+            (stage, worker_id, list(article_ids))
+        )
+
+def update_article_thumbnails(results: List[tuple]) -> int:
+    """
+    (id, thumbnail_url)のリストを1文でまとめて書き戻し、更新件数を返す
+
+    取得中に他の経路（要約時のOGP画像など）で設定された記事は上書きしない
+    """
+    if not results:
+        return 0
+    with get_db_conn() as conn:
+        cur = conn.execute(
+            """
+            UPDATE articles a SET thumbnail_url = t.thumbnail_url
+            FROM unnest(%s::int[], %s::text[]) AS t(id, thumbnail_url)
+            WHERE a.id = t.id AND (a.thumbnail_url IS NULL OR a.thumbnail_url = '')
+            """,
+            ([article_id for article_id, _ in results], [url for _, url in results])
+        )
+        return cur.rowcount
+
+def get_latest_articles(limit: int = 10) -> list:
+    with get_db_conn() as conn:
+        with conn.cursor() as cur:
+            cur.execute(SQL_LATEST_ARTICLES, (limit,))
             return cur.fetchall()
 
+def build_search_query(
+    terms: List[str],
+    grams: List[str],
+    sort: str = "relevance",
+    sources: Optional[List[str]] = None,
+    date_from=None,
+    date_to=None,
+    after: Optional[tuple] = None,
+    limit: int = 20,
+    window: int = 1000,
+) -> Tuple[str, dict]:
+    """
+    search_article_rowsが実行する (SQL, パラメータ) を返す（repository/query_plans.pyの計測にも使う）
+    """
+    params = {
+        "patterns": [f"%{term}%" for term in terms],
+        "grams": list(grams),
+        "sources": list(sources or []),
+        "date_from": date_from,
+        "date_to": date_to,
+        "limit": limit,
+        "window": window,
+    }
+    if after is not None:
+        params["after_score"], params["after_published"], params["after_id"] = after
+    sql = _search_sql(sort, bool(grams), bool(sources), date_from is not None, date_to is not None, after is not None)
+    return sql, params
+
+def search_article_rows(
+    terms: List[str],
+    grams: List[str],
+    sort: str = "relevance",
+    sources: Optional[List[str]] = None,
+    date_from=None,
+    date_to=None,
+    after: Optional[tuple] = None,
+    limit: int = 20,
+    window: int = 1000,
+) -> list:
+    """
+    正規化済みの検索語をすべて含む記事を返す（近似重複記事は代表記事だけ）
+
+    :param grams: 検索語のバイグラム（空なら索引で絞り込まない）
+    :param sort: relevance（関連度順、scoreを含む）/ date（新しい順）
+    :param date_from: 公開日時の下限（含む）
+    :param date_to: 公開日時の上限（含まない）
+    :param after: 前ページ最後の記事のキー (score, published, id)。dateではscoreを使わない
+    """
+    sql, params = build_search_query(terms, grams, sort, sources, date_from, date_to, after, limit, window)
+    with get_db_conn() as conn:
+        return conn.execute(sql, params).fetchall()
+
 def get_topic_by_id(topics_id: int) -> dict:
     with get_db_conn() as conn:
         with conn.cursor() as cur:
@@ -119,24 +711,212 @@ def get_articles_by_topics_id(topics_id: int) -> list:
             )
             return cur.fetchall()
 
-# ジョブ管理用DB関数
-def insert_job(job_type: str, status: str = "pending") -> int:
+def get_topic_export_state(topics_id: int) -> Optional[dict]:
+    """
+    保存済みのtemplate_htmlとそのキー、現在の内容のフィンガープリントを1クエリで返す
+
+    フィンガープリントはTOPICSの更新日時・表示項目と、紐づく記事集合（出力に使う項目）のハッシュ
+    """
     with get_db_conn() as conn:
         with conn.cursor() as cur:
             cur.execute(
-                "INSERT INTO jobs (type, status, started_at) VALUES (%s, %s, NOW()) RETURNING id",
-                (job_type, status)
+                """
+                SELECT t.template_html, t.template_html_key,
+                    md5(concat_ws('|', t.updated_at, t.title, t.month, t.created_at, t.monthly_summary, (
+                        SELECT string_agg(
+                            md5(concat_ws('|', a.id, a.title, a.url, a.source, a.published, a.summary,
+                                          a.labels::text, ta.category_main, ta.category_sub::text)),
+                            ',' ORDER BY a.published DESC NULLS LAST, a.created_at DESC, a.id
+                        )
+                        FROM topics_articles ta
+                        JOIN articles a ON ta.article_id = a.id
+                        WHERE ta.topic_id = t.id
+                    ))) AS fingerprint
+                FROM topics t
+                WHERE t.id = %s
+                """,
+                (topics_id,)
+            )
+            return cur.fetchone()
+
+def save_topic_template_html(topics_id: int, html: str, key: str) -> None:
+    with get_db_conn() as conn:
+        with conn.cursor() as cur:
+            cur.execute(
+                "UPDATE topics SET template_html = %s, template_html_key = %s WHERE id = %s",
+                (html, key, topics_id)
+            )
+
+# ジョブ管理用DB関数（jobsテーブルをキューとして使う）
+def insert_job(job_type: str, status: str = "pending", params: dict = None, max_attempts: int = 3) -> int:
+    with get_db_conn() as conn:
+        with conn.cursor() as cur:
+            cur.execute(
+                "INSERT INTO jobs (type, status, params, max_attempts) VALUES (%s, %s, %s::jsonb, %s) RETURNING id",
+                (job_type, status, json.dumps(params or {}, ensure_ascii=False), max_attempts)
             )
             job_id = cur.fetchone()["id"]
             return job_id
 
-def update_job_status(job_id: int, status: str, result: str = None) -> None:
+def claim_job(worker_id: str, job_types: List[str] = None) -> Optional[dict]:
+    """
+    実行可能なpendingジョブを1件取り出してrunningにする（なければNone）
+
+    FOR UPDATE SKIP LOCKEDで、複数ワーカーが同時に取り出しても同じジョブを掴まない
+    """
+    with get_db_conn() as conn:
+        with conn.cursor() as cur:
+            cur.execute(
+                """
+                UPDATE jobs SET
+                    status = 'running', worker_id = %s, attempts = attempts + 1,
+                    progress = 0, error = NULL, started_at = NOW(), heartbeat_at = NOW(), finished_at = NULL
+                WHERE id = (
+                    SELECT id FROM jobs
+                    WHERE status = 'pending' AND run_after <= NOW() AND NOT cancel_requested
+                      AND (%s::text[] IS NULL OR type = ANY(%s::text[]))
+                    ORDER BY run_after, id
+                    FOR UPDATE SKIP LOCKED
+                    LIMIT 1
+                )
+                RETURNING *
+                """,
+                (worker_id, job_types, job_types)
+            )
+            return cur.fetchone()
+
+def heartbeat_job(job_id: int, worker_id: str, progress: int = None) -> bool:
+    """
+    ハートビートと進捗を記録し、キャンセル要求の有無を返す
+
+    別ワーカーに取り直された（worker_idが変わった）場合もキャンセル扱いにする
+    """
+    with get_db_conn() as conn:
+        with conn.cursor() as cur:
+            cur.execute(
+                """
+                UPDATE jobs SET heartbeat_at = NOW(), progress = COALESCE(%s, progress)
+                WHERE id = %s AND worker_id = %s AND status = 'running'
+                RETURNING cancel_requested
+                """,
+                (progress, job_id, worker_id)
+            )
+            row = cur.fetchone()
+            return True if row is None else row["cancel_requested"]
+
+def complete_job(job_id: int, worker_id: str, result: dict = None) -> None:
+    with get_db_conn() as conn:
+        with conn.cursor() as cur:
+            cur.execute(
+                """
+                UPDATE jobs SET status = 'success', progress = 100, result = %s::jsonb, finished_at = NOW()
+                WHERE id = %s AND worker_id = %s AND status = 'running'
+                """,
+                (json.dumps(result, ensure_ascii=False, default=str), job_id, worker_id)
+            )
+
+def fail_job(job_id: int, worker_id: str, error: str, retry_delay_sec: float) -> str:
+    """
+    ジョブの失敗を記録する。試行回数が残っていれば指数バックオフで再度pendingに戻す
+
+    :return: 更新後のstatus（pending / failure）
+    """
     with get_db_conn() as conn:
         with conn.cursor() as cur:
             cur.execute(
-                "UPDATE jobs SET status=%s, finished_at=NOW(), result=%s WHERE id=%s",
-                (status, result, job_id)
+                """
+                UPDATE jobs SET
+                    status = CASE WHEN attempts < max_attempts AND NOT cancel_requested THEN 'pending' ELSE 'failure' END,
+                    run_after = NOW() + make_interval(secs => %s * power(2, GREATEST(attempts - 1, 0))),
+                    finished_at = CASE WHEN attempts < max_attempts AND NOT cancel_requested THEN NULL ELSE NOW() END,
+                    error = %s
+                WHERE id = %s AND worker_id = %s AND status = 'running'
+                RETURNING status
+                """,
+                (retry_delay_sec, error, job_id, worker_id)
             )
+            row = cur.fetchone()
+            return row["status"] if row else "failure"
+
+def mark_job_cancelled(job_id: int, worker_id: str) -> None:
+    with get_db_conn() as conn:
+        with conn.cursor() as cur:
+            cur.execute(
+                "UPDATE jobs SET status = 'cancelled', finished_at = NOW() WHERE id = %s AND worker_id = %s AND status = 'running'",
+                (job_id, worker_id)
+            )
+
+def cancel_job(job_id: int) -> Optional[dict]:
+    """
+    ジョブのキャンセルを要求する。pendingは即時cancelled、runningはワーカーが次の進捗報告で中断する
+    """
+    with get_db_conn() as conn:
+        with conn.cursor() as cur:
+            cur.execute(
+                """
+                UPDATE jobs SET
+                    cancel_requested = TRUE,
+                    status = CASE WHEN status = 'pending' THEN 'cancelled' ELSE status END,
+                    finished_at = CASE WHEN status = 'pending' THEN NOW() ELSE finished_at END
+                WHERE id = %s AND status IN ('pending', 'running')
+                RETURNING *
+                """,
+                (job_id,)
+            )
+            return cur.fetchone()
+
+def retry_job(job_id: int) -> Optional[dict]:
+    # 終了したジョブ（failure / cancelled）を試行回数をリセットして再投入する
+    with get_db_conn() as conn:
+        with conn.cursor() as cur:
+            cur.execute(
+                """
+                UPDATE jobs SET
+                    status = 'pending', attempts = 0, cancel_requested = FALSE, run_after = NOW(),
+                    progress = 0, error = NULL, result = NULL, worker_id = NULL,
+                    started_at = NULL, finished_at = NULL
+                WHERE id = %s AND status IN ('failure', 'cancelled')
+                RETURNING *
+                """,
+                (job_id,)
+            )
+            return cur.fetchone()
+
+def requeue_stale_jobs(stale_sec: float) -> int:
+    # ハートビートが途絶えたrunningジョブ（ワーカー停止など）をpendingへ戻す。試行回数を使い切っていればfailure
+    with get_db_conn() as conn:
+        with conn.cursor() as cur:
+            cur.execute(
+                """
+                UPDATE jobs SET
+                    status = CASE WHEN attempts < max_attempts AND NOT cancel_requested THEN 'pending' ELSE 'failure' END,
+                    finished_at = CASE WHEN attempts < max_attempts AND NOT cancel_requested THEN NULL ELSE NOW() END,
+                    error = 'heartbeat timeout', run_after = NOW()
+                WHERE status = 'running' AND heartbeat_at < NOW() - make_interval(secs => %s)
+                """,
+                (stale_sec,)
+            )
+            return cur.rowcount
+
+def insert_job_events(job_id: int, events: List[dict]) -> None:
+    if not events:
+        return
+    with get_db_conn() as conn:
+        with conn.cursor() as cur:
+            cur.executemany(
+                "INSERT INTO job_events (job_id, event) VALUES (%s, %s::jsonb)",
+                [(job_id, json.dumps(event, ensure_ascii=False, default=str)) for event in events]
+            )
+
+def get_job_events(job_id: int, after_id: int = 0, limit: int = 500) -> list:
+    # after_idより後のイベントを古い順に返す（追跡側は最後に受け取ったidを次回のafter_idにする）
+    with get_db_conn() as conn:
+        with conn.cursor() as cur:
+            cur.execute(
+                "SELECT id, event, created_at FROM job_events WHERE job_id = %s AND id > %s ORDER BY id LIMIT %s",
+                (job_id, after_id, limit)
+            )
+            return cur.fetchall()
 
 def get_job_by_id(job_id: int) -> dict:
     with get_db_conn() as conn:
@@ -151,7 +931,7 @@ def get_job_history(limit: int = 20) -> list:
     with get_db_conn() as conn:
         with conn.cursor() as cur:
             cur.execute(
-                "SELECT * FROM jobs ORDER BY started_at DESC LIMIT %s",
+                "SELECT * FROM jobs ORDER BY created_at DESC, id DESC LIMIT %s",
                 (limit,)
             )
             return cur.fetchall()
@@ -0,0 +1,254 @@
+# pipelineが所有するスキーマのバージョン管理
+#
+# migrations/NNNN_name.sql を番号順に1回ずつ適用し、schema_migrationsに記録する。
+# 複数のpipelineプロセスが同時に起動しても、アドバイザリロックで1プロセスだけが適用する。
+# ロックは待ち続けず pg_try_advisory_lock を繰り返し試す（待機中の文がスナップショットを持ち続けると、
+# 適用側のCREATE INDEX CONCURRENTLYがその終了を待ってデッドロックになるため）。
+# 先頭行が「-- migrate:no-transaction」のファイルはトランザクション外で1文ずつ実行する
+# （CREATE INDEX CONCURRENTLY用。文は行末の「;」で区切る）
+#
+# 手動実行: python -m repository.migrations [--check-plans [--bench-search 1000000]]
+
+import argparse
+import hashlib
+import os
+import re
+import sys
+import threading
+import time
+from dataclasses import dataclass
+from typing import Dict, List, Optional
+
+from psycopg import sql
+
+from repository.db import get_db_conn
+
+MIGRATIONS_DIR = os.path.join(os.path.dirname(__file__), "../migrations")
+# pg_advisory_lockのキー（pipelineのマイグレーション専用）
+MIGRATION_LOCK_ID = 72_310_019
+NO_TRANSACTION_MARKER = "-- migrate:no-transaction"
+# ロックを再試行する間隔と、諦めるまでの秒数
+MIGRATION_LOCK_POLL_SEC = float(os.environ.get("MIGRATION_LOCK_POLL_SEC", 1))
+MIGRATION_LOCK_TIMEOUT_SEC = float(os.environ.get("MIGRATION_LOCK_TIMEOUT_SEC", 1800))
+
+_FILE_PATTERN = re.compile(r"^(\d{4})_([a-z0-9_]+)\.sql$")
+_CONCURRENT_INDEX = re.compile(
+    r"^CREATE\s+(?:UNIQUE\s+)?INDEX\s+CONCURRENTLY\s+(?:IF\s+NOT\s+EXISTS\s+)?(\w+)", re.I
+)
+
+# 起動時の適用状況（/readyで参照）: pending / running / done / failed
+_status = {"state": "pending", "applied": [], "error": None, "updated_at": None}
+_status_lock = threading.Lock()
+
+
+@dataclass
+class Migration:
+    version: int
+    name: str
+    sql: str
+    checksum: str
+    transactional: bool
+
+
+def load_migrations(directory: Optional[str] = None) -> List[Migration]:
+    """
+    マイグレーションファイルを番号順に読み込む
+
+    :raises ValueError: 番号が重複している場合
+    """
+    directory = directory or MIGRATIONS_DIR
+    migrations: Dict[int, Migration] = {}
+    for filename in sorted(os.listdir(directory)):
+        match = _FILE_PATTERN.match(filename)
+        if not match:
+            continue
+        version = int(match.group(1))
+        if version in migrations:
+            raise ValueError(f"duplicate migration version: {version}")
+        with open(os.path.join(directory, filename), encoding="utf-8") as f:
+            sql = f.read()
+        migrations[version] = Migration(
+            version=version,
+            name=match.group(2),
+            sql=sql,
+            checksum=hashlib.sha256(sql.encode("utf-8")).hexdigest(),
+            transactional=not sql.lstrip().startswith(NO_TRANSACTION_MARKER),
+        )
+    return [migrations[v] for v in sorted(migrations)]
+
+
+def split_statements(sql: str) -> List[str]:
+    # 行末の「;」で文を区切る（関数定義など本文に「;」を含む文はトランザクション内のファイルに置く）
+    statements, current = [], []
+    for line in sql.splitlines():
+        if not current and (not line.strip() or line.strip().startswith("--")):
+            continue
+        current.append(line)
+        if line.rstrip().endswith(";"):
+            statement = "\n".join(current).strip()
+            if statement.rstrip(";").strip():
+                statements.append(statement)
+            current = []
+    if "\n".join(current).strip():
+        statements.append("\n".join(current).strip())
+    return statements
+
+
+def _set_status(state: str, applied: Optional[List[int]] = None, error: Optional[str] = None) -> None:
+    with _status_lock:
+        _status.update(state=state, error=error, updated_at=time.time())
+        if applied is not None:
+            _status["applied"] = applied
+
+
+def get_migration_status() -> dict:
+    with _status_lock:
+        return dict(_status)
+
+
+def run_migrations(directory: Optional[str] = None) -> List[int]:
+    """
+    未適用のマイグレーションを番号順に適用し、適用したバージョンを返す
+
+    適用済みファイルの内容が変わっていた場合は警告のみ（適用済みの変更は新しい番号で行う）
+    """
+    migrations = load_migrations(directory)
+    applied_now: List[int] = []
+    _set_status("running")
+    try:
+        with get_db_conn() as conn:
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS schema_migrations (
+                  version INTEGER PRIMARY KEY,
+                  name TEXT NOT NULL,
+                  checksum CHAR(64) NOT NULL,
+                  applied_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+                )
+                """
+            )
+            acquire_migration_lock(conn)
+            try:
+                # ロック取得後に読み直す（待っている間に他プロセスが適用した分は飛ばす）
+                applied = {
+                    row["version"]: row["checksum"]
+                    for row in conn.execute("SELECT version, checksum FROM schema_migrations").fetchall()
+                }
+                for migration in migrations:
+                    if migration.version in applied:
+                        if applied[migration.version].strip() != migration.checksum:
+                            print(f"[WARN] migration {migration.version:04d}_{migration.name} changed after it was applied")
+                        continue
+                    started = time.monotonic()
+                    if migration.transactional:
+                        with conn.transaction():
+                            conn.execute(migration.sql)
+                            _record(conn, migration)
+                    else:
+                        for statement in split_statements(migration.sql):
+                            drop_invalid_index(conn, statement)
+                            conn.execute(statement)
+                        _record(conn, migration)
+                    applied_now.append(migration.version)
+                    print(f"[INFO] applied migration {migration.version:04d}_{migration.name} ({time.monotonic() - started:.2f}s)")
+            finally:
+                conn.execute("SELECT pg_advisory_unlock(%s)", (MIGRATION_LOCK_ID,))
+    except Exception as e:
+        _set_status("failed", applied_now, str(e))
+        raise
+    _set_status("done", applied_now)
+    return applied_now
+
+
+def acquire_migration_lock(conn, poll_sec: Optional[float] = None, timeout_sec: Optional[float] = None) -> None:
+    """
+    マイグレーション用のアドバイザリロックを取得する（取れるまで間隔を空けて再試行する）
+
+    :raises TimeoutError: timeout_sec以内に取得できなかった場合
+    """
+    poll_sec = MIGRATION_LOCK_POLL_SEC if poll_sec is None else poll_sec
+    timeout_sec = MIGRATION_LOCK_TIMEOUT_SEC if timeout_sec is None else timeout_sec
+    started = time.monotonic()
+    while not conn.execute("SELECT pg_try_advisory_lock(%s) AS locked", (MIGRATION_LOCK_ID,)).fetchone()["locked"]:
+        if time.monotonic() - started >= timeout_sec:
+            raise TimeoutError(f"migration lock not acquired within {timeout_sec:.0f}s")
+        time.sleep(poll_sec)
+
+
+def concurrent_index_name(statement: str) -> Optional[str]:
+    # CREATE INDEX CONCURRENTLY の文なら作成するインデックス名を返す
+    match = _CONCURRENT_INDEX.match(statement.strip())
+    return match.group(1) if match else None
+
+
+def drop_invalid_index(conn, statement: str) -> bool:
+    """
+    CREATE INDEX CONCURRENTLYの前に、中断された作成で残った無効なインデックスを削除する（削除したらTrue）
+
+    無効なインデックスが残っていると IF NOT EXISTS で作成が飛ばされ、以後も使われないままになる
+    """
+    name = concurrent_index_name(statement)
+    if not name:
+        return False
+    row = conn.execute("SELECT indisvalid FROM pg_index WHERE indexrelid = to_regclass(%s)", (name,)).fetchone()
+    if row is None or row["indisvalid"]:
+        return False
+    print(f"[WARN] dropping invalid index {name} left by an interrupted migration")
+    conn.execute(sql.SQL("DROP INDEX CONCURRENTLY IF EXISTS {}").format(sql.Identifier(name)))
+    return True
+
+
+def _record(conn, migration: Migration) -> None:
+    conn.execute(
+        "INSERT INTO schema_migrations (version, name, checksum) VALUES (%s, %s, %s)",
+        (migration.version, migration.name, migration.checksum)
+    )
+
+
+def start_migrations() -> threading.Thread:
+    """
+    run_migrationsをバックグラウンドスレッドで実行する（DB未起動でも起動処理を待たせない。完了は/readyで確認する）
+    """
+    def run():
+        try:
+            run_migrations()
+        except Exception as e:
+            print(f"[ERROR] migrations failed: {e}")
+
+    # スレッド開始前に実行中にしておき、/readyが適用前の状態を準備完了と誤認しないようにする
+    _set_status("running")
+    thread = threading.Thread(target=run, name="migrations", daemon=True)
+    thread.start()
+    return thread
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="pipelineのDBマイグレーションを適用する")
+    parser.add_argument("--check-plans", action="store_true", help="適用後に頻出クエリがインデックスを使うか確認する")
+    parser.add_argument(
+        "--bench-search", type=int, default=0, metavar="ROWS",
+        help="--check-plansで、合成記事ROWS件の一時テーブルに対する記事検索のEXPLAIN ANALYZEも行う",
+    )
+    args = parser.parse_args()
+    applied = run_migrations()
+    print(f"applied: {applied or 'none'}")
+    if args.check_plans:
+        from repository.query_plans import check_query_plans
+        results = check_query_plans()
+        for name, result in results.items():
+            print(f"{'OK ' if result['ok'] else 'NG '} {name}: {', '.join(result['scans'])}")
+        if args.bench_search > 0:
+            from repository.query_plans import benchmark_search
+            timings = benchmark_search(args.bench_search)
+            for name, result in timings.items():
+                print(
+                    f"{'OK ' if result['ok'] else 'NG '} {name}: p50 {result['p50_ms']}ms p95 {result['p95_ms']}ms"
+                    f" ({', '.join(result['scans'])})"
+                )
+            results.update(timings)
+        if not all(result["ok"] for result in results.values()):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,169 @@
+# 頻出クエリの実行計画チェック
+# 逐次走査を無効化した上でEXPLAINし、articlesをSeq Scanする計画しか立たないクエリ（=使えるインデックスがない）を検出する。
+# 小さなテーブルではプランナが逐次走査を選ぶのが正しいため、実際の選択ではなく「インデックスで実行できるか」を確認する
+#
+# 記事検索は、件数を揃えた合成データの一時テーブル（本番と同じインデックス）で EXPLAIN ANALYZE し、
+# 実行時間のp95を確認する（benchmark_search。本番のarticlesには書き込まない）
+
+import math
+import re
+from typing import Dict, List, Tuple, Union
+
+import psycopg
+
+from repository import db
+from repository.db import get_db_conn
+
+# 名前 → (SQL, パラメータ)
+HOT_QUERIES: Dict[str, Tuple[str, Union[tuple, dict]]] = {
+    "existing_url_keys": (db.SQL_EXISTING_URL_KEYS, (["https://example.com/a"],)),
+    "articles_without_summary": (db.SQL_ARTICLES_WITHOUT_SUMMARY, (20,)),
+    "articles_without_labels": (db.SQL_ARTICLES_WITHOUT_LABELS, (20,)),
+    "articles_without_thumbnail": (db.SQL_ARTICLES_WITHOUT_THUMBNAIL, (100,)),
+    "latest_articles": (db.SQL_LATEST_ARTICLES, (10,)),
+    "search_articles": (
+        db.SQL_SEARCH_ARTICLES_BY_DATE,
+        {"patterns": ["%tsmc%"], "grams": ["mc", "sm", "ts"], "after_published": None, "after_id": 1, "limit": 21},
+    ),
+    "search_articles_relevance": (
+        db.SQL_SEARCH_ARTICLES_BY_RELEVANCE,
+        {"patterns": ["%半導体%"], "grams": ["半導", "導体"], "window": 1000, "limit": 21},
+    ),
+}
+
+# インデックスなしで走査されてはならないテーブル
+WATCHED_TABLES = ("articles",)
+
+
+def plan_scans(plan: dict) -> List[str]:
+    """
+    EXPLAIN (FORMAT JSON) の計画ノードを辿り、テーブル走査を「種類:テーブル(インデックス)」の一覧で返す
+    """
+    scans = []
+    node_type = plan.get("Node Type", "")
+    if "Scan" in node_type and plan.get("Relation Name"):
+        index = plan.get("Index Name")
+        scans.append(f"{node_type}:{plan['Relation Name']}" + (f"({index})" if index else ""))
+    for child in plan.get("Plans", []):
+        scans.extend(plan_scans(child))
+    return scans
+
+
+def has_seq_scan(scans: List[str], tables=WATCHED_TABLES) -> bool:
+    return any(scan == f"Seq Scan:{table}" for scan in scans for table in tables)
+
+
+def check_query_plans() -> Dict[str, dict]:
+    """
+    HOT_QUERIESの各クエリがインデックスで実行できるかを確認する
+
+    :return: 名前 → {"ok": bool, "scans": [...]}
+    """
+    results = {}
+    with get_db_conn() as conn:
+        with conn.transaction():
+            # このトランザクション内だけ逐次走査を避けさせる（使えるインデックスがあれば必ずそちらを選ぶ）
+            conn.execute("SET LOCAL enable_seqscan = off")
+            for name, (sql, params) in HOT_QUERIES.items():
+                row = conn.execute("EXPLAIN (FORMAT JSON) " + sql, params).fetchone()
+                plan = row["QUERY PLAN"][0]["Plan"]
+                scans = plan_scans(plan)
+                results[name] = {"ok": not has_seq_scan(scans), "scans": scans}
+    return results
+
+
+# 記事検索の実行時間の目標（ミリ秒、p95）
+SEARCH_P95_TARGET_MS = 50.0
+# 合成記事の語彙（本文中にときどき現れる語。助詞を含め、語の前後のバイグラムも再現する）
+BENCH_VOCABULARY = [
+    "半導体", "TSMC", "EUV", "露光", "量子", "コンピュータ", "生成AI", "決算", "発表", "増産", "工場", "熊本",
+    "メモリ", "HBM", "データセンター", "電力", "需要", "投資", "開発", "量産", "スマートフォン", "自動車", "EV",
+    "電池", "材料", "装置", "受注", "市場", "シェア", "中国", "米国", "規制", "輸出", "政府", "補助金",
+    "、", "。", "は", "が", "を", "に", "の", "と", "で",
+]
+# 計測する検索（検索文字列, 並び順）
+BENCH_SEARCHES = [
+    ("半導体", "relevance"), ("半導体", "date"), ("TSMC", "relevance"), ("EUV露光", "relevance"),
+    ("量子コンピュータ", "date"), ("熊本 工場", "relevance"),
+]
+
+
+def percentile(values: List[float], q: float) -> float:
+    # 最近傍順位による百分位（values は空でないこと）
+    ordered = sorted(values)
+    return ordered[min(len(ordered), max(1, math.ceil(q / 100 * len(ordered)))) - 1]
+
+
+def _vocab_at(index_sql: str) -> str:
+    # 語彙配列の要素を取り出す式（index_sqlは0以上の整数式。psycopgの%はパラメータと区別して%%と書く）
+    return f"(%(vocab)s::text[])[(1 + ({index_sql}) %% %(vocab_size)s)::int]"
+
+
+def _seed_text(salt: int, words: int) -> str:
+    # 行ごと（g）に決まる語を並べた文の式（random()と違い、同じ件数なら毎回同じデータになる）
+    # 40語に1語を語彙から、残りは漢字3000字からの2文字にする（どの記事にも語彙が揃い、検索語が全件に一致するのを避ける）
+    h = f"abs(hashint4(g * {words + salt} + k * 7919 + {salt})::bigint)"
+    filler = f"chr((19968 + {h} / 40 %% 3000)::int) || chr((19968 + {h} / 120000 %% 3000)::int)"
+    word = f"CASE WHEN {h} %% 40 = 0 THEN {_vocab_at(f'{h} / 40')} ELSE {filler} END"
+    return f"(SELECT string_agg({word}, '') FROM generate_series(1, {words}) AS k)"
+
+
+_SEED_SQL = f"""
+    INSERT INTO pg_temp.articles (id, title, url, source, summary, labels, thumbnail_url, created_at, published, content)
+    SELECT g, {_seed_text(1, 6)}, 'https://example.com/bench/' || g,
+           (ARRAY['itmedia', 'nhk', 'mynavi', 'eetimes'])[1 + g %% 4],
+           {_seed_text(2, 30)},
+           jsonb_build_array({_vocab_at("g")}, {_vocab_at("g / 7")}),
+           '', timestamp '2020-01-01' + g * interval '3 minutes', timestamp '2020-01-01' + g * interval '3 minutes',
+           {_seed_text(3, 250)}
+    FROM generate_series(1, %(rows)s) AS g
+"""
+
+
+def benchmark_search(rows: int = 1_000_000, repeat: int = 20) -> Dict[str, dict]:
+    """
+    合成記事rows件の一時テーブルで記事検索のクエリをEXPLAIN ANALYZEし、実行時間を返す
+
+    一時テーブルは同じ名前（articles）で本番テーブルを隠し、本番と同じ列（生成列を含む）とインデックスを持つ。
+    トランザクションの終わりに破棄する。件数が多いと作成に数分〜数十分かかる
+
+    :return: 名前 → {"p50_ms", "p95_ms", "ok": p95が目標以内か, "scans": [...]}
+    """
+    from service.search import bigrams, parse_terms
+
+    results: Dict[str, dict] = {}
+    with get_db_conn() as conn:
+        with conn.transaction():
+            index_defs = [
+                row["def"] for row in conn.execute(
+                    "SELECT pg_get_indexdef(indexrelid) AS def FROM pg_index WHERE indrelid = 'articles'::regclass"
+                ).fetchall()
+            ]
+            conn.execute("SET LOCAL maintenance_work_mem = '512MB'")
+            conn.execute(
+                "CREATE TEMP TABLE articles (LIKE articles INCLUDING DEFAULTS INCLUDING GENERATED) ON COMMIT DROP"
+            )
+            conn.execute(_SEED_SQL, {"rows": rows, "vocab": BENCH_VOCABULARY, "vocab_size": len(BENCH_VOCABULARY)})
+            # 本番と同じ定義のインデックスを、データ投入後にまとめて作る
+            for index_def in index_defs:
+                conn.execute(re.sub(r" ON (?:ONLY )?(?:\S+\.)?articles ", " ON pg_temp.articles ", index_def, count=1))
+            conn.execute("ANALYZE pg_temp.articles")
+            for q, sort in BENCH_SEARCHES:
+                terms = parse_terms(q)
+                sql, params = db.build_search_query(terms, bigrams(terms), sort, limit=21)
+                timings, scans = [], []
+                for _ in range(max(1, repeat)):
+                    row = conn.execute("EXPLAIN (ANALYZE, FORMAT JSON) " + sql, params).fetchone()
+                    plan = row["QUERY PLAN"][0]
+                    timings.append(plan["Execution Time"])
+                    scans = plan_scans(plan["Plan"])
+                p95 = percentile(timings, 95)
+                results[f"search {q} ({sort})"] = {
+                    "p50_ms": round(percentile(timings, 50), 2),
+                    "p95_ms": round(p95, 2),
+                    "ok": p95 <= SEARCH_P95_TARGET_MS,
+                    "scans": scans,
+                }
+            # 一時テーブルを残さない（Rollbackはこのブロックで握りつぶされる）
+            raise psycopg.Rollback()
+    return results
@@ -0,0 +1,73 @@
+# 逐次届くデータを件数・経過時間でまとめて書き込む非同期バッチライター
+
+import asyncio
+import time
+from typing import Callable, Generic, List, Optional, TypeVar
+
+T = TypeVar("T")
+
+
+class AsyncBatchWriter(Generic[T]):
+    """
+    add() された要素をバッファし、batch_size件たまるか、最初の要素からinterval_sec経過した時点で
+    write(batch) をスレッドで呼び出して書き込む
+
+    :param write: バッチを書き込む同期関数（戻り値は results に順に追加される）
+    :param batch_size: 何件ごとに書き込むか
+    :param interval_sec: 件数に達しなくても書き込むまでの最大待ち秒数
+
+    使い方:
+        async with AsyncBatchWriter(db.save_articles, 100, 5.0) as writer:
+            async for article in articles:
+                await writer.add(article)
+        writer.results  # 各バッチのwrite()の戻り値
+    """
+
+    def __init__(self, write: Callable[[List[T]], object], batch_size: int, interval_sec: float):
+        self.write = write
+        self.batch_size = max(1, batch_size)
+        self.interval_sec = interval_sec
+        self.results: List[object] = []
+        self._buffer: List[T] = []
+        self._first_added: Optional[float] = None
+        self._lock: Optional[asyncio.Lock] = None
+        self._ticker: Optional[asyncio.Task] = None
+
+    async def __aenter__(self) -> "AsyncBatchWriter[T]":
+        self._lock = asyncio.Lock()
+        if self.interval_sec > 0:
+            self._ticker = asyncio.create_task(self._tick())
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb) -> None:
+        if self._ticker is not None:
+            self._ticker.cancel()
+            try:
+                await self._ticker
+            except asyncio.CancelledError:
+                pass
+            self._ticker = None
+        # 例外で抜ける場合も、そこまでに届いた分は書き込む
+        await self.flush()
+
+    async def add(self, item: T) -> None:
+        if not self._buffer:
+            self._first_added = time.monotonic()
+        self._buffer.append(item)
+        if len(self._buffer) >= self.batch_size:
+            await self.flush()
+
+    async def flush(self) -> None:
+        async with self._lock:
+            while self._buffer:
+                batch, self._buffer = self._buffer[:self.batch_size], self._buffer[self.batch_size:]
+                # batch_sizeに達したadd()はここでの書き込み完了を待つため、書き込みが遅くてもバッファは伸び続けない
+                self.results.append(await asyncio.to_thread(self.write, batch))
+            self._first_added = None
+
+    async def _tick(self) -> None:
+        # 流量が少ない間も、最初の要素からinterval_secを超えて溜め込まない
+        while True:
+            await asyncio.sleep(min(self.interval_sec, 1.0))
+            if self._first_added is not None and time.monotonic() - self._first_added >= self.interval_sec:
+                await self.flush()
@@ -0,0 +1,204 @@
+# 記事ページから本文・メタ情報を抽出する
+#
+# CONTENT_EXTRACTOR で抽出方式を切り替える:
+#   density: lxmlで1回パースし、段落ごとの文字量とリンク率から本文ブロックを選ぶ（既定）
+#   bs4:     BeautifulSoup(html.parser)で<article>、なければページ全体のテキストを使う（従来の方式）
+# density はlxmlがない環境や本文を特定できないページでは bs4 にフォールバックする。
+
+import os
+import re
+from typing import Dict, Optional
+
+from bs4 import BeautifulSoup, UnicodeDammit
+
+from entity.scraped_page import ScrapedPage
+
+CONTENT_EXTRACTOR = os.environ.get("CONTENT_EXTRACTOR", "density").lower()
+# 本文ブロックとして採用する最小文字数（これ未満なら除去後の<article>またはページ全体のテキストを使う）
+CONTENT_MIN_CHARS = int(os.environ.get("CONTENT_MIN_CHARS", 80))
+
+EXTRACTORS = ("density", "bs4")
+
+# 本文になりえない要素（中身ごと除去する）
+_DROP_TAGS = (
+    "script", "style", "noscript", "template", "iframe", "svg", "canvas", "form", "button",
+    "nav", "header", "footer", "aside",
+)
+# class/idがこれに一致する要素はメニュー・回遊導線とみなして除去する（本文らしい名前を含むものは残す）
+_NEGATIVE = re.compile(
+    r"(^|[-_\s])(nav|menu|breadcrumb|footer|sidebar|side|sns|share|social|related|ranking|recommend|"
+    r"comment|banner|ad|ads|advert|pr|widget|popup|modal|pager|pagination|tag-?list)([-_\s]|$)",
+    re.I,
+)
+_POSITIVE = re.compile(r"article|body|content|entry|main|post|story|text|honbun|news", re.I)
+# 段落としてまとめて採点する要素
+_PARAGRAPH_TAGS = ("p", "pre", "blockquote", "td", "dd")
+# これらを子に持たないdiv/section等は、それ自体を1段落とみなす（<p>を使わないページ向け）
+_BLOCK_TAGS = {
+    "p", "div", "section", "article", "main", "table", "ul", "ol", "dl", "pre", "blockquote",
+    "h1", "h2", "h3", "h4", "h5", "h6", "figure",
+}
+_TAG_BONUS = {"article": 25, "main": 20, "section": 5, "div": 5, "td": 3, "body": -5}
+# 句読点の数を文らしさの指標にする（日本語の「、」「。」を含む）
+_PUNCTUATION = re.compile(r"[、。，,．.!?！？]")
+_XML_DECLARATION = re.compile(r"^\s*<\?xml[^>]*\?>", re.I)
+
+
+def _normalize(text: str) -> str:
+    return re.sub(r"[\n\t\r]+", " ", text).strip()
+
+
+# --- 従来方式（BeautifulSoup） ---
+
+def _meta_content(soup: BeautifulSoup, *keys: str) -> str:
+    # property/name属性のいずれかが一致する<meta>のcontentを返す（先に指定したキーを優先）
+    for key in keys:
+        tag = soup.find('meta', attrs={'property': key}) or soup.find('meta', attrs={'name': key})
+        if tag and tag.get('content'):
+            return tag['content'].strip()
+    return ''
+
+
+def parse_with_bs4(html: bytes, url: str = "") -> ScrapedPage:
+    # 取得済みHTMLを1回だけパースし、本文・OGP画像・メタ情報をまとめて抽出する
+    # 本文は<article>タグ優先、なければ全体テキスト
+    soup = BeautifulSoup(html, "html.parser")
+    title_tag = soup.find("title")
+    page = ScrapedPage(
+        url=url,
+        thumbnail_url=_meta_content(soup, 'og:image', 'twitter:image'),
+        title=_meta_content(soup, 'og:title') or (title_tag.get_text(strip=True) if title_tag else ''),
+        description=_meta_content(soup, 'og:description', 'description'),
+        site_name=_meta_content(soup, 'og:site_name'),
+        published_time=_meta_content(soup, 'article:published_time'),
+    )
+    article_tag = soup.find("article")
+    text = article_tag.get_text(separator=" ", strip=True) if article_tag else soup.get_text(separator=" ", strip=True)
+    page.content = _normalize(text)
+    return page
+
+
+# --- 文字量・リンク率による本文抽出（lxml） ---
+
+def _text_of(node) -> str:
+    return " ".join(t.strip() for t in node.itertext() if t.strip())
+
+
+def _link_density(node, text_len: int) -> float:
+    if not text_len:
+        return 1.0
+    link_len = sum(len(_text_of(a)) for a in node.iter("a"))
+    return min(1.0, link_len / text_len)
+
+
+def _is_paragraph(node) -> bool:
+    if node.tag in _PARAGRAPH_TAGS:
+        return True
+    # 子にブロック要素を持たない要素は段落とみなす
+    return node.tag in ("div", "section", "article", "main") and not any(
+        isinstance(child.tag, str) and child.tag in _BLOCK_TAGS for child in node
+    )
+
+
+def _drop_boilerplate(root) -> None:
+    for node in list(root.iter(*_DROP_TAGS)):
+        node.drop_tree()
+    for node in list(root.iter("div", "section", "ul", "ol", "table", "span")):
+        names = f"{node.get('class', '')} {node.get('id', '')}"
+        if names.strip() and _NEGATIVE.search(names) and not _POSITIVE.search(names):
+            node.drop_tree()
+
+
+def select_main_node(root):
+    """
+    段落ごとに文字量と句読点の数で点を付けて親・祖父母要素に加算し、
+    リンク率で割り引いた点が最も高い要素を本文ブロックとして返す（候補がなければNone）
+    """
+    scores: Dict[object, float] = {}
+    for node in root.iter():
+        if not isinstance(node.tag, str) or not _is_paragraph(node):
+            continue
+        text = _text_of(node)
+        if len(text) < 25:
+            continue
+        score = 1 + len(_PUNCTUATION.findall(text)) + min(len(text) / 100, 3)
+        parent = node.getparent()
+        for ancestor, weight in ((node, 1.0), (parent, 1.0), (parent.getparent() if parent is not None else None, 0.5)):
+            if ancestor is None or not isinstance(ancestor.tag, str):
+                continue
+            if ancestor not in scores:
+                scores[ancestor] = _TAG_BONUS.get(ancestor.tag, 0)
+            scores[ancestor] += score * weight
+    best, best_score = None, 0.0
+    for node, score in scores.items():
+        score *= 1 - _link_density(node, len(_text_of(node)))
+        if score > best_score:
+            best, best_score = node, score
+    return best
+
+
+def _decode(html: bytes) -> str:
+    # <meta charset>・BOM・内容から文字コードを判定する（Shift_JIS / EUC-JPのページもある）
+    text = UnicodeDammit(html, is_html=True).unicode_markup or ""
+    return _XML_DECLARATION.sub("", text, count=1)
+
+
+def _lxml_meta(root, *keys: str) -> str:
+    for key in keys:
+        for attr in ("property", "name"):
+            values = root.xpath(f"//meta[@{attr}=$key]/@content", key=key)
+            if values and values[0].strip():
+                return values[0].strip()
+    return ""
+
+
+def parse_with_density(html: bytes, url: str = "") -> Optional[ScrapedPage]:
+    """
+    lxmlでパースして本文ブロックを選ぶ。lxmlがない、または本文を特定できない場合はNone
+    """
+    try:
+        import lxml.html
+    except ImportError:
+        return None
+    text = _decode(html)
+    if not text.strip():
+        return None
+    try:
+        root = lxml.html.document_fromstring(text)
+    except Exception:
+        return None
+    title = root.findtext(".//title") or ""
+    page = ScrapedPage(
+        url=url,
+        thumbnail_url=_lxml_meta(root, 'og:image', 'twitter:image'),
+        title=_lxml_meta(root, 'og:title') or title.strip(),
+        description=_lxml_meta(root, 'og:description', 'description'),
+        site_name=_lxml_meta(root, 'og:site_name'),
+        published_time=_lxml_meta(root, 'article:published_time'),
+    )
+    _drop_boilerplate(root)
+    node = select_main_node(root)
+    content = _normalize(_text_of(node)) if node is not None else ""
+    if len(content) < CONTENT_MIN_CHARS:
+        # 短い記事は、メニュー等を除いた<article>またはページ全体のテキストを使う
+        articles = root.xpath("//article")
+        body = root.find("body")
+        fallback = articles[0] if articles else body if body is not None else root
+        content = _normalize(_text_of(fallback))
+    if not content:
+        return None
+    page.content = content
+    return page
+
+
+def parse_article_page(html: bytes, url: str = "", extractor: Optional[str] = None) -> ScrapedPage:
+    """
+    取得済みHTMLを1回だけパースし、本文・OGP画像・メタ情報をまとめて抽出する
+
+    :param extractor: density / bs4（既定: CONTENT_EXTRACTOR）
+    """
+    if (extractor or CONTENT_EXTRACTOR) == "density":
+        page = parse_with_density(html, url)
+        if page is not None:
+            return page
+    return parse_with_bs4(html, url)
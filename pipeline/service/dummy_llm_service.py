@@ -2,6 +2,9 @@ from typing import Tuple, List
 from .llm_interface import LLMInterface
 
 class DummyLLMService(LLMInterface):
+    PROMPT_VERSION = "1"
+    model = "dummy"
+
     def generate_summary_and_labels(self, article_text: str) -> Tuple[str, List[str]]:
         return "これはダミー要約です", ["ダミータグ1", "ダミータグ2"]
 
@@ -0,0 +1,27 @@
+# 長時間処理の進捗イベント
+# クロール・要約などのユースケースは on_event(event: dict) を受け取り、フィード・記事単位でイベントを通知する
+# （API のストリーミング応答やジョブのイベントログが購読する）
+
+import time
+from typing import Callable, Optional
+
+EventSink = Callable[[dict], None]
+
+
+def emit(sink: Optional[EventSink], event: str, **fields) -> None:
+    """
+    イベントを通知する（sinkがNoneなら何もしない）
+
+    通知先の失敗で本処理を止めないよう、sink内の例外は握りつぶす
+    """
+    if sink is None:
+        return
+    try:
+        sink({"event": event, "ts": round(time.time(), 3), **fields})
+    except Exception as e:
+        print(f"[WARN] event sink failed: {e}")
+
+
+def elapsed_ms(started: float) -> int:
+    # time.monotonic() の開始時刻からの経過ミリ秒
+    return int((time.monotonic() - started) * 1000)
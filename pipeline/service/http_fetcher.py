@@ -0,0 +1,114 @@
+# クロール用の非同期HTTPクライアント
+# 1つのhttpx.AsyncClient（keep-alive / HTTP/2 / 圧縮）を共有し、
+# 全体の同時実行数とホスト単位の同時実行数を制限して取得する
+
+import asyncio
+import os
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Dict, Optional
+from urllib.parse import urlsplit
+
+import httpx
+
+DEFAULT_USER_AGENT = "semicon-topics-pipeline/0.1 (+https://github.com/riririyo-1/semicon-topics)"
+
+
+def _env_int(name: str, default: int) -> int:
+    try:
+        return int(os.environ.get(name, default))
+    except ValueError:
+        return default
+
+
+def _env_float(name: str, default: float) -> float:
+    try:
+        return float(os.environ.get(name, default))
+    except ValueError:
+        return default
+
+
+def _env_bool(name: str, default: bool) -> bool:
+    value = os.environ.get(name)
+    if value is None:
+        return default
+    return value.strip().lower() in ("1", "true", "yes", "on")
+
+
+class AsyncFetcher:
+    """
+    クロール1回分で共有する非同期HTTPフェッチャー
+
+    :param max_concurrency: 全体の同時リクエスト数上限（CRAWL_MAX_CONCURRENCY）
+    :param per_host_concurrency: 同一ホストへの同時リクエスト数上限（CRAWL_PER_HOST_CONCURRENCY）
+    :param timeout: リクエストタイムアウト秒（CRAWL_TIMEOUT）
+    :param http2: HTTP/2を有効にするか（CRAWL_HTTP2）
+
+    使い方:
+        async with AsyncFetcher() as fetcher:
+            resp = await fetcher.get(url)
+    """
+
+    def __init__(
+        self,
+        max_concurrency: Optional[int] = None,
+        per_host_concurrency: Optional[int] = None,
+        timeout: Optional[float] = None,
+        http2: Optional[bool] = None,
+    ):
+        self.max_concurrency = max_concurrency or _env_int("CRAWL_MAX_CONCURRENCY", 16)
+        self.per_host_concurrency = per_host_concurrency or _env_int("CRAWL_PER_HOST_CONCURRENCY", 4)
+        self.timeout = timeout or _env_float("CRAWL_TIMEOUT", 10.0)
+        self.http2 = _env_bool("CRAWL_HTTP2", True) if http2 is None else http2
+        self._client: Optional[httpx.AsyncClient] = None
+        self._global_sem: Optional[asyncio.Semaphore] = None
+        self._host_sems: Dict[str, asyncio.Semaphore] = {}
+
+    async def __aenter__(self) -> "AsyncFetcher":
+        # httpxはAccept-Encoding（gzip/deflate、brotli導入時はbr）を既定で付与し、自動で展開する
+        self._client = httpx.AsyncClient(
+            http2=self.http2,
+            timeout=self.timeout,
+            follow_redirects=True,
+            headers={"User-Agent": DEFAULT_USER_AGENT},
+            limits=httpx.Limits(
+                max_connections=self.max_concurrency,
+                max_keepalive_connections=self.max_concurrency,
+                keepalive_expiry=30.0,
+            ),
+        )
+        self._global_sem = asyncio.Semaphore(self.max_concurrency)
+        self._host_sems = {}
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb) -> None:
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    def _host_semaphore(self, url: str) -> asyncio.Semaphore:
+        host = urlsplit(url).netloc.lower()
+        sem = self._host_sems.get(host)
+        if sem is None:
+            sem = asyncio.Semaphore(self.per_host_concurrency)
+            self._host_sems[host] = sem
+        return sem
+
+    async def get(self, url: str, headers: Optional[Dict[str, str]] = None) -> httpx.Response:
+        """URLをGETしてレスポンスを返す（ホスト単位→全体の順でスロットを確保）"""
+        if self._client is None:
+            raise RuntimeError("AsyncFetcher is not started (use 'async with')")
+        async with self._host_semaphore(url):
+            async with self._global_sem:
+                return await self._client.get(url, headers=headers)
+
+    @asynccontextmanager
+    async def stream(self, url: str, headers: Optional[Dict[str, str]] = None) -> AsyncIterator[httpx.Response]:
+        """
+        URLをGETし、本文を読まずにレスポンスを返す（必要な分だけ aiter_bytes() で読み、抜けた時点で接続を閉じる）
+        """
+        if self._client is None:
+            raise RuntimeError("AsyncFetcher is not started (use 'async with')")
+        async with self._host_semaphore(url):
+            async with self._global_sem:
+                async with self._client.stream("GET", url, headers=headers) as resp:
+                    yield resp
@@ -0,0 +1,183 @@
+# 複数記事を1プロンプトにまとめて要約・タグ付けするバッチ実行
+# トークン予算内で記事を詰め、JSON配列で結果を受け取る。
+# 応答が壊れているバッチは半分に分割して再帰的に再試行し、1件になったら単発呼び出しに切り替える
+
+import json
+import os
+import re
+from typing import Callable, List, Optional, Sequence, Tuple
+
+from .tokens import estimate_tokens
+
+LLM_BATCH_TOKEN_BUDGET = int(os.environ.get("LLM_BATCH_TOKEN_BUDGET", 6000))
+LLM_BATCH_MAX_ITEMS = int(os.environ.get("LLM_BATCH_MAX_ITEMS", 8))
+
+SummaryAndLabels = Tuple[str, List[str]]
+
+
+def pack_batches(texts: Sequence[str], token_budget: int = LLM_BATCH_TOKEN_BUDGET,
+                 max_items: int = LLM_BATCH_MAX_ITEMS) -> List[List[int]]:
+    """
+    入力順を保ったまま、合計見積もりトークン数がtoken_budget以下・件数がmax_items以下になるように
+    インデックスをまとめる（1件で予算を超える記事は単独のバッチになる）
+    """
+    batches: List[List[int]] = []
+    current: List[int] = []
+    current_tokens = 0
+    for i, text in enumerate(texts):
+        tokens = estimate_tokens(text)
+        if current and (current_tokens + tokens > token_budget or len(current) >= max_items):
+            batches.append(current)
+            current, current_tokens = [], 0
+        current.append(i)
+        current_tokens += tokens
+    if current:
+        batches.append(current)
+    return batches
+
+
+def build_summary_batch_prompt(texts: Sequence[str]) -> str:
+    parts = [
+        f"以下の{len(texts)}件の記事それぞれについて、200字以内の要約（語尾は断定形）と、"
+        "登場する企業、業界、分類を表す2～10個の単語または短いフレーズのタグを作成してください。\n"
+        "結果は記事ごとに {\"id\": 記事番号, \"summary\": \"...\", \"labels\": [\"...\", ...]} の形式で、"
+        "全記事分をJSON配列のみで返してください。説明文は不要です。\n"
+    ]
+    for i, text in enumerate(texts, start=1):
+        parts.append(f"\n[記事{i}]\n{text}\n")
+    return "".join(parts)
+
+
+def count_batch_prompt_items(prompt: str) -> int:
+    # build_summary_batch_promptで作ったプロンプトに含まれる記事数（出力トークンの見積もり用）
+    return len(re.findall(r"^\[記事\d+\]$", prompt, re.M))
+
+
+def _extract_json_array(content: str):
+    # ```json ... ``` のようなコードブロックや前後の説明文を取り除いて配列部分だけを読む
+    content = re.sub(r"```(?:json)?", "", content or "")
+    start, end = content.find("["), content.rfind("]")
+    if start < 0 or end <= start:
+        raise ValueError("no JSON array in response")
+    return json.loads(content[start:end + 1])
+
+
+def find_json_end(text: str) -> int:
+    """
+    textの先頭から見て最初のJSONオブジェクト/配列が閉じた位置（終端の次のインデックス）を返す
+    まだ閉じていなければ-1（ストリーミング応答を途中で打ち切る判定に使う）
+    """
+    depth, in_string, escaped = 0, False, False
+    for i, ch in enumerate(text):
+        if in_string:
+            if escaped:
+                escaped = False
+            elif ch == "\\":
+                escaped = True
+            elif ch == '"':
+                in_string = False
+        elif ch == '"':
+            if depth > 0:
+                in_string = True
+        elif ch in "{[":
+            depth += 1
+        elif ch in "}]" and depth > 0:
+            depth -= 1
+            if depth == 0:
+                return i + 1
+    return -1
+
+
+def _normalize_labels(labels) -> List[str]:
+    if isinstance(labels, str):
+        labels = [t.strip() for t in labels.split(",") if t.strip()]
+    if not isinstance(labels, list):
+        return []
+    return [str(t).strip() for t in labels if str(t).strip()]
+
+
+def parse_summary_response(content: str) -> SummaryAndLabels:
+    """
+    1記事分の構造化応答 {"summary": "...", "labels": [...]} を解析・検証する
+    読めない場合や要約が空の場合はValueErrorを送出する
+    """
+    content = re.sub(r"```(?:json)?", "", content or "")
+    start, end = content.find("{"), content.rfind("}")
+    if start < 0 or end <= start:
+        raise ValueError("no JSON object in response")
+    data = json.loads(content[start:end + 1])
+    summary = data.get("summary") if isinstance(data, dict) else None
+    if not isinstance(summary, str) or not summary.strip():
+        raise ValueError("summary is missing in response")
+    return summary.strip(), _normalize_labels(data.get("labels"))
+
+
+def parse_summary_batch_response(content: str, n: int) -> List[Optional[SummaryAndLabels]]:
+    """
+    バッチ応答を解析し、記事順の結果リストを返す（不正・欠落した記事はNone）
+    配列として読めない場合はValueErrorを送出する
+    """
+    data = _extract_json_array(content)
+    if not isinstance(data, list):
+        raise ValueError("response is not a JSON array")
+    results: List[Optional[SummaryAndLabels]] = [None] * n
+    for item in data:
+        if not isinstance(item, dict):
+            continue
+        try:
+            idx = int(item.get("id")) - 1
+        except (TypeError, ValueError):
+            continue
+        summary = item.get("summary")
+        labels = item.get("labels")
+        if not (0 <= idx < n) or not isinstance(summary, str) or not summary.strip():
+            continue
+        results[idx] = (summary.strip(), _normalize_labels(labels))
+    return results
+
+
+def run_summary_batches(
+    texts: Sequence[str],
+    complete: Callable[[str], str],
+    single: Callable[[str], SummaryAndLabels],
+    token_budget: int = LLM_BATCH_TOKEN_BUDGET,
+    max_items: int = LLM_BATCH_MAX_ITEMS,
+) -> List[SummaryAndLabels]:
+    """
+    texts全件の要約・タグを返す
+
+    :param complete: プロンプトを受け取りLLMの生テキスト応答を返す関数
+    :param single: 1記事用の従来の生成関数（1件まで分割しても解決しない場合に使う）
+    """
+    results: List[Optional[SummaryAndLabels]] = [None] * len(texts)
+
+    def solve(indices: List[int]) -> None:
+        if len(indices) == 1:
+            results[indices[0]] = single(texts[indices[0]])
+            return
+        try:
+            parsed = parse_summary_batch_response(
+                complete(build_summary_batch_prompt([texts[i] for i in indices])), len(indices)
+            )
+        except Exception as e:
+            print(f"[WARN] batch of {len(indices)} articles failed, splitting: {e}")
+            parsed = [None] * len(indices)
+        missing = []
+        for i, item in zip(indices, parsed):
+            if item is None:
+                missing.append(i)
+            else:
+                results[i] = item
+        if not missing:
+            return
+        if len(missing) < len(indices):
+            # 一部だけ欠けた場合は欠けた記事だけで再試行する
+            solve(missing)
+            return
+        mid = len(missing) // 2
+        solve(missing[:mid])
+        solve(missing[mid:])
+
+    for batch in pack_batches(texts, token_budget, max_items):
+        solve(batch)
+    return [r if r is not None else ("", []) for r in results]
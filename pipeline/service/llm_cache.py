@@ -0,0 +1,229 @@
+# LLM結果のコンテンツアドレス型キャッシュ
+# キー = sha256(処理種別, 正規化した入力, プロンプトテンプレートのバージョン, モデル名)
+# 同一記事の再クロール・フィード間の重複・ジョブ再実行で同じ有料呼び出しを繰り返さないようにする
+
+import hashlib
+import json
+import os
+import re
+import threading
+import unicodedata
+from typing import Any, Dict, List, Optional, Protocol, Tuple
+
+from .llm_interface import LLMInterface
+
+LLM_CACHE_TTL_DAYS = int(os.environ.get("LLM_CACHE_TTL_DAYS", 30))
+LLM_CACHE_MAX_ENTRIES = int(os.environ.get("LLM_CACHE_MAX_ENTRIES", 100000))
+# 何回書き込むごとに期限切れ・件数超過の削除を行うか
+LLM_CACHE_EVICT_EVERY = int(os.environ.get("LLM_CACHE_EVICT_EVERY", 500))
+
+
+def normalize_text(text: str) -> str:
+    # NFKC正規化・空白の畳み込みで、表記ゆれ程度の差はキャッシュヒットさせる
+    text = unicodedata.normalize("NFKC", text or "")
+    return re.sub(r"\s+", " ", text).strip()
+
+
+def make_cache_key(kind: str, text: str, prompt_version: str, model: str) -> str:
+    payload = json.dumps([kind, normalize_text(text), prompt_version, model], ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class LLMCacheStore(Protocol):
+    def get(self, key: str, ttl_days: int) -> Optional[Any]:
+        """有効期限内の値を返す（なければNone）"""
+        ...
+
+    def put(self, key: str, kind: str, model: str, prompt_version: str, value: Any) -> None:
+        """値を保存する（既存キーは上書き）"""
+        ...
+
+    def evict(self, ttl_days: int, max_entries: int) -> int:
+        """期限切れと件数超過分を削除し、削除件数を返す"""
+        ...
+
+
+class PostgresLLMCacheStore:
+    """llm_cacheテーブルを使うキャッシュストア"""
+
+    def get(self, key: str, ttl_days: int) -> Optional[Any]:
+        from repository.db import get_llm_cache
+        return get_llm_cache(key, ttl_days)
+
+    def put(self, key: str, kind: str, model: str, prompt_version: str, value: Any) -> None:
+        from repository.db import put_llm_cache
+        put_llm_cache(key, kind, model, prompt_version, value)
+
+    def evict(self, ttl_days: int, max_entries: int) -> int:
+        from repository.db import evict_llm_cache
+        return evict_llm_cache(ttl_days, max_entries)
+
+
+class MemoryLLMCacheStore:
+    """プロセス内辞書のキャッシュストア（テスト・DBなし環境用。TTLは考慮しない）"""
+
+    def __init__(self):
+        self._data: Dict[str, Any] = {}
+
+    def get(self, key: str, ttl_days: int) -> Optional[Any]:
+        return self._data.get(key)
+
+    def put(self, key: str, kind: str, model: str, prompt_version: str, value: Any) -> None:
+        self._data[key] = value
+
+    def evict(self, ttl_days: int, max_entries: int) -> int:
+        overflow = len(self._data) - max_entries
+        for key in list(self._data.keys())[:max(overflow, 0)]:
+            del self._data[key]
+        return max(overflow, 0)
+
+
+class _Counters:
+    # プロセス内のヒット・ミス集計（処理種別ごと）
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.data: Dict[str, Dict[str, int]] = {}
+        self.puts = 0
+
+    def incr(self, kind: str, name: str) -> None:
+        with self._lock:
+            self.data.setdefault(kind, {"hits": 0, "misses": 0, "errors": 0})[name] += 1
+
+    def incr_puts(self) -> int:
+        with self._lock:
+            self.puts += 1
+            return self.puts
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            total_hits = sum(v["hits"] for v in self.data.values())
+            total_misses = sum(v["misses"] for v in self.data.values())
+            lookups = total_hits + total_misses
+            return {
+                "hits": total_hits,
+                "misses": total_misses,
+                "hit_rate": round(total_hits / lookups, 3) if lookups else 0.0,
+                "by_kind": {k: dict(v) for k, v in self.data.items()},
+            }
+
+
+_counters = _Counters()
+
+
+def get_llm_cache_stats() -> dict:
+    return _counters.snapshot()
+
+
+class CachedLLMService(LLMInterface):
+    """
+    LLMInterface実装をラップし、結果を永続キャッシュから返す
+
+    ラップ対象の属性 model / PROMPT_VERSION をキーに含めるため、
+    プロンプトやモデルを変えた場合は自動的に別キャッシュになる
+    """
+
+    def __init__(self, inner: LLMInterface, store: Optional[LLMCacheStore] = None,
+                 ttl_days: int = LLM_CACHE_TTL_DAYS, max_entries: int = LLM_CACHE_MAX_ENTRIES):
+        self.inner = inner
+        self.store = store or PostgresLLMCacheStore()
+        self.ttl_days = ttl_days
+        self.max_entries = max_entries
+
+    def __getattr__(self, name):
+        return getattr(self.inner, name)
+
+    @property
+    def _model(self) -> str:
+        return str(getattr(self.inner, "model", type(self.inner).__name__))
+
+    @property
+    def _prompt_version(self) -> str:
+        return str(getattr(self.inner, "PROMPT_VERSION", "1"))
+
+    def _get(self, kind: str, key: str) -> Optional[Any]:
+        try:
+            value = self.store.get(key, self.ttl_days)
+        except Exception as e:
+            print(f"[WARN] llm cache get failed: {e}")
+            _counters.incr(kind, "errors")
+            value = None
+        _counters.incr(kind, "hits" if value is not None else "misses")
+        return value
+
+    def _put(self, kind: str, key: str, value: Any) -> None:
+        try:
+            self.store.put(key, kind, self._model, self._prompt_version, value)
+            if _counters.incr_puts() % LLM_CACHE_EVICT_EVERY == 0:
+                self.store.evict(self.ttl_days, self.max_entries)
+        except Exception as e:
+            print(f"[WARN] llm cache put failed: {e}")
+            _counters.incr(kind, "errors")
+
+    def _key(self, kind: str, text: str) -> str:
+        return make_cache_key(kind, text, self._prompt_version, self._model)
+
+    def generate_summary_and_labels(self, article_text: str) -> Tuple[str, List[str]]:
+        key = self._key("summary_and_labels", article_text)
+        cached = self._get("summary_and_labels", key)
+        if cached is not None:
+            return cached["summary"], list(cached["labels"])
+        summary, labels = self.inner.generate_summary_and_labels(article_text)
+        if self._is_cacheable_summary(article_text, summary):
+            self._put("summary_and_labels", key, {"summary": summary, "labels": labels})
+        return summary, labels
+
+    @staticmethod
+    def _is_cacheable_summary(article_text: str, summary: str) -> bool:
+        # 失敗時のフォールバック結果（空要約・本文の切り詰め）はキャッシュしない
+        is_fallback = summary.endswith("...") and article_text.startswith(summary[:-3])
+        return bool(summary) and not is_fallback
+
+    def generate_summaries_and_labels(self, article_texts: List[str]) -> List[Tuple[str, List[str]]]:
+        # キャッシュにない記事だけをまとめてラップ対象のバッチAPIに渡す
+        results: List[Optional[Tuple[str, List[str]]]] = [None] * len(article_texts)
+        keys = [self._key("summary_and_labels", text) for text in article_texts]
+        missing: List[int] = []
+        for i, key in enumerate(keys):
+            cached = self._get("summary_and_labels", key)
+            if cached is not None:
+                results[i] = (cached["summary"], list(cached["labels"]))
+            else:
+                missing.append(i)
+        if missing:
+            generated = self.inner.generate_summaries_and_labels([article_texts[i] for i in missing])
+            for i, (summary, labels) in zip(missing, generated):
+                results[i] = (summary, labels)
+                if self._is_cacheable_summary(article_texts[i], summary):
+                    self._put("summary_and_labels", keys[i], {"summary": summary, "labels": labels})
+        return results
+
+    def generate_categories(self, article_text: str) -> List[str]:
+        key = self._key("categories", article_text)
+        cached = self._get("categories", key)
+        if cached is not None:
+            return list(cached)
+        categories = self.inner.generate_categories(article_text)
+        if categories and categories != ["未分類"]:
+            self._put("categories", key, categories)
+        return categories
+
+    def generate_monthly_summary(self, articles: List[str]) -> str:
+        key = self._key("monthly_summary", "\n\x1e\n".join(articles))
+        cached = self._get("monthly_summary", key)
+        if cached is not None:
+            return cached
+        summary = self.inner.generate_monthly_summary(articles)
+        if summary:
+            self._put("monthly_summary", key, summary)
+        return summary
+
+    def generate_chunk_summary(self, articles: List[str]) -> str:
+        # 月次まとめのチャンク単位の結果。記事が変わらないチャンクは再実行時もLLMを呼ばない
+        key = self._key("chunk_summary", "\n\x1e\n".join(articles))
+        cached = self._get("chunk_summary", key)
+        if cached is not None:
+            return cached
+        summary = self.inner.generate_chunk_summary(articles)
+        if summary:
+            self._put("chunk_summary", key, summary)
+        return summary
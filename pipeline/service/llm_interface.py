@@ -5,6 +5,10 @@ class LLMInterface(Protocol):
         """記事本文から要約とラベルリストを生成"""
         ...
 
+    def generate_summaries_and_labels(self, article_texts: List[str]) -> List[Tuple[str, List[str]]]:
+        """複数記事の要約とラベルリストを入力順に生成（既定実装は1件ずつ呼び出す）"""
+        return [self.generate_summary_and_labels(text) for text in article_texts]
+
     def generate_categories(self, article_text: str) -> List[str]:
         """記事本文からカテゴリ（大カテゴリ・小カテゴリ等）を推論"""
         ...
@@ -12,3 +16,7 @@ class LLMInterface(Protocol):
     def generate_monthly_summary(self, articles: List[str]) -> str:
         """複数記事から月次まとめ（要約・ポイント）を生成"""
         ...
+
+    def generate_chunk_summary(self, articles: List[str]) -> str:
+        """記事の一部（チャンク）から、月次まとめの材料となる要点を生成（既定実装は月次まとめと同じ）"""
+        return self.generate_monthly_summary(articles)
@@ -0,0 +1,103 @@
+# 大きなTOPICS向けの階層型（map-reduce）月次まとめ
+# 記事を見積もりトークン数でチャンクに分け、チャンクごとの要点を並行生成（map）し、
+# 要点を月次まとめに集約する（reduce）。要点がまだ予算を超える場合は再帰的に集約する
+
+import hashlib
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, List, Optional
+
+from .llm_interface import LLMInterface
+from .tokens import estimate_tokens, truncate_to_tokens
+
+# 1回のLLM呼び出しに渡す入力の見積もりトークン数（Ollamaの既定コンテキストに収まる値）
+MONTHLY_CHUNK_TOKEN_BUDGET = int(os.environ.get("MONTHLY_CHUNK_TOKEN_BUDGET", 3000))
+# 1記事あたりの上限（これを超える本文は切り詰める）
+MONTHLY_ARTICLE_MAX_TOKENS = int(os.environ.get("MONTHLY_ARTICLE_MAX_TOKENS", 1500))
+MONTHLY_SUMMARY_CONCURRENCY = int(os.environ.get("MONTHLY_SUMMARY_CONCURRENCY", 4))
+# チャンク境界の目安（平均してこの件数に1件、内容ハッシュで区切り位置を決める）
+MONTHLY_CHUNK_ANCHOR_EVERY = 6
+MAX_REDUCE_DEPTH = 5
+
+
+def _is_anchor(text: str) -> bool:
+    digest = hashlib.sha1(text.encode("utf-8")).digest()
+    return digest[0] % MONTHLY_CHUNK_ANCHOR_EVERY == 0
+
+
+def chunk_articles(texts: List[str], token_budget: int = MONTHLY_CHUNK_TOKEN_BUDGET) -> List[List[str]]:
+    """
+    記事を入力順のまま、見積もりトークン数がtoken_budget以下のチャンクに分ける
+
+    予算による区切りに加えて、内容ハッシュで決まる「アンカー記事」の直後でも区切る（チャンクが半分以上埋まっている場合）。
+    これにより記事が1件増減・変更されても、影響は主にその記事を含むチャンクに留まり、
+    他のチャンクの結果はキャッシュから再利用できる
+    """
+    chunks: List[List[str]] = []
+    current: List[str] = []
+    current_tokens = 0
+    for text in texts:
+        tokens = estimate_tokens(text)
+        if current and current_tokens + tokens > token_budget:
+            chunks.append(current)
+            current, current_tokens = [], 0
+        current.append(text)
+        current_tokens += tokens
+        if _is_anchor(text) and current_tokens * 2 >= token_budget:
+            chunks.append(current)
+            current, current_tokens = [], 0
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+def summarize_monthly(
+    llm: LLMInterface,
+    texts: List[str],
+    token_budget: int = MONTHLY_CHUNK_TOKEN_BUDGET,
+    concurrency: int = MONTHLY_SUMMARY_CONCURRENCY,
+    check_cancelled: Optional[Callable[[], None]] = None,
+) -> str:
+    """
+    記事テキストのリストから月次まとめを生成する
+
+    入力全体が予算内なら1回の呼び出しで生成し、超える場合はmap-reduceで生成する。
+    チャンク単位の結果はLLM結果キャッシュ（generate_chunk_summary）に乗るため、
+    再実行時は記事が変わったチャンクだけが再計算される
+    check_cancelledはチャンクごとのmapと各reduceの前に呼ばれ、例外を送出すると中断する
+    集約がMAX_REDUCE_DEPTH段で予算内に収まらない場合は、残った要点をすべて均等に切り詰めて最後の集約に渡す
+
+    :raises RuntimeError: 要点が多すぎて、1件1トークンずつでも予算に収まらない場合
+    """
+    def check() -> None:
+        if check_cancelled:
+            check_cancelled()
+
+    def summarize_chunk(chunk: List[str]) -> str:
+        check()
+        return llm.generate_chunk_summary(chunk)
+
+    texts = [truncate_to_tokens(t, min(MONTHLY_ARTICLE_MAX_TOKENS, token_budget)) for t in texts if t]
+    depth = 0
+    while sum(estimate_tokens(t) for t in texts) > token_budget and len(texts) > 1:
+        if depth >= MAX_REDUCE_DEPTH:
+            # 要点を捨てず、すべてを均等に切り詰めて最後の集約1回に渡す
+            per_text = token_budget // len(texts)
+            if per_text < 1:
+                raise RuntimeError(
+                    f"summarize_monthly: {len(texts)} partials do not fit in token_budget={token_budget}"
+                )
+            print(f"[WARN] summarize_monthly: reduce depth limit reached, truncating {len(texts)} partials to {per_text} tokens each")
+            texts = [truncate_to_tokens(t, per_text) for t in texts]
+            break
+        chunks = chunk_articles(texts, token_budget)
+        print(f"[INFO] summarize_monthly: level {depth} {len(texts)} texts -> {len(chunks)} chunks")
+        with ThreadPoolExecutor(max_workers=max(1, concurrency)) as executor:
+            partials = list(executor.map(summarize_chunk, chunks))
+        # 失敗したチャンクは空になるので除外する
+        texts = [p for p in partials if p]
+        depth += 1
+    if not texts:
+        return ""
+    check()
+    return llm.generate_monthly_summary(texts)
@@ -0,0 +1,103 @@
+# 記事の近似重複判定（SimHash）
+#
+# 同じ記事が複数のフィード（NHKの分野別、マイナビ Tech+の各カテゴリ、ITmedia総合とEE Times Japanなど）に
+# URLを変えて載るため、タイトルと本文の文字n-gramから64ビットのSimHashを作り、ハミング距離の近いものを同一記事とみなす。
+# 日本語は単語区切りがないため、分かち書きせずに正規化後の文字n-gramを特徴量にする。
+#
+# DBでは16ビットずつ4つに分けた値（バンド）で候補を引く。距離がNEAR_DUP_MAX_DISTANCE（3）以下なら
+# 鳩の巣原理でいずれかのバンドが一致するため、4つの式インデックスで漏れなく候補を絞り込める。
+
+import hashlib
+import os
+import re
+import unicodedata
+from collections import Counter
+from typing import Iterable, List, Optional, Tuple
+
+NEAR_DUP_NGRAM = int(os.environ.get("NEAR_DUP_NGRAM", 3))
+# 重複とみなすハミング距離の上限（バンド数-1以下にする）
+NEAR_DUP_MAX_DISTANCE = int(os.environ.get("NEAR_DUP_MAX_DISTANCE", 3))
+# 指紋に使う本文の先頭文字数（長い記事でも計算量を一定に保つ）
+NEAR_DUP_CONTENT_CHARS = int(os.environ.get("NEAR_DUP_CONTENT_CHARS", 2000))
+
+BANDS = 4
+BAND_BITS = 64 // BANDS
+_BAND_MASK = (1 << BAND_BITS) - 1
+
+# 空白・記号は表記揺れが大きいため除いて比較する
+_NOISE = re.compile(r"[\s\W_]+")
+
+
+def normalize_text(text: str) -> str:
+    # 全角・半角を揃え（NFKC）、小文字化して空白・記号を除く
+    return _NOISE.sub("", unicodedata.normalize("NFKC", text or "").lower())
+
+
+def char_ngrams(text: str, n: int = NEAR_DUP_NGRAM) -> List[str]:
+    if len(text) <= n:
+        return [text] if text else []
+    return [text[i:i + n] for i in range(len(text) - n + 1)]
+
+
+def simhash(features: Iterable[str]) -> Optional[int]:
+    """
+    特徴量から64ビットのSimHashを返す（符号なし。特徴量がなければNone）
+
+    同じ特徴量が複数回あれば、その回数だけ重みを持つ
+    """
+    # プロセス間で値が変わらないハッシュを使う（組み込みhashはPYTHONHASHSEEDで変わる）
+    digests = [hashlib.blake2b(feature.encode("utf-8"), digest_size=8).digest() for feature in features]
+    if not digests:
+        return None
+    # ビットごとに1の特徴量を数える代わりに、バイト位置ごとの値の出現数をまとめて数える（特徴量あたり64回のループを避ける）
+    joined = b"".join(digests)
+    value = 0
+    for k in range(8):
+        column = Counter(joined[k::8])
+        for bit in range(8):
+            ones = sum(n for byte, n in column.items() if byte >> bit & 1)
+            # 1の特徴量が過半ならそのビットを立てる（先頭バイトが上位ビット）
+            if 2 * ones > len(digests):
+                value |= 1 << ((7 - k) * 8 + bit)
+    return value
+
+
+def to_signed(value: int) -> int:
+    # PostgreSQLのBIGINT（符号付き）に収まる値に変換する
+    return value - (1 << 64) if value >= 1 << 63 else value
+
+
+def article_fingerprint(title: str, content: str) -> Optional[int]:
+    """
+    タイトルと本文の先頭から記事の指紋（符号付き64ビット、articles.simhash）を返す。どちらも空ならNone
+    """
+    text = normalize_text(f"{title} {(content or '')[:NEAR_DUP_CONTENT_CHARS]}")
+    value = simhash(char_ngrams(text))
+    return to_signed(value) if value is not None else None
+
+
+def hamming_distance(a: int, b: int) -> int:
+    return bin((a ^ b) & ((1 << 64) - 1)).count("1")
+
+
+def bands(fingerprint: int) -> Tuple[int, ...]:
+    # DBの式インデックス ((simhash >> (16*i)) & 65535) と同じ値
+    return tuple((fingerprint >> (BAND_BITS * i)) & _BAND_MASK for i in range(BANDS))
+
+
+def find_canonical(fingerprint: int, candidates: Iterable[dict], max_distance: int = NEAR_DUP_MAX_DISTANCE) -> Optional[int]:
+    """
+    候補（id, simhash, canonical_id）のうち最も近い記事の代表記事IDを返す（距離がmax_distanceを超えればNone）
+
+    候補自身が別記事の重複なら、その代表記事にまとめる（クラスタを1段に保つ）
+    """
+    best: Optional[Tuple[Tuple[int, int], int]] = None
+    for candidate in candidates:
+        distance = hamming_distance(fingerprint, candidate["simhash"])
+        if distance > max_distance:
+            continue
+        # 距離が同じなら先に登録された記事を優先する
+        key = (distance, candidate["id"])
+        if best is None or key < best[0]:
+            best = (key, candidate.get("canonical_id") or candidate["id"])
+    return best[1] if best else None
@@ -1,9 +1,51 @@
 import os
 import requests
 import json
+import threading
 import time
-from typing import Tuple, List
+from typing import Tuple, List, Optional
+from requests.adapters import HTTPAdapter
 from .llm_interface import LLMInterface
+from .llm_batch import run_summary_batches, parse_summary_response, find_json_end
+
+# モデルをメモリに常駐させる時間（Ollamaのkeep_alive。"-1"で無期限、"0"で都度アンロード）
+OLLAMA_KEEP_ALIVE = os.environ.get("OLLAMA_KEEP_ALIVE", "30m")
+# コンテキスト長・最大生成トークン数（0ならモデルの既定値）
+OLLAMA_NUM_CTX = int(os.environ.get("OLLAMA_NUM_CTX", 0))
+OLLAMA_NUM_PREDICT = int(os.environ.get("OLLAMA_NUM_PREDICT", 0))
+# トークンを逐次受信し、JSON応答は閉じた時点で生成を打ち切る
+OLLAMA_STREAM = os.environ.get("OLLAMA_STREAM", "false").lower() in ("1", "true", "yes", "on")
+OLLAMA_TIMEOUT = float(os.environ.get("OLLAMA_TIMEOUT", 60))
+# プロセスで共有するHTTP接続数（要約の並行数以上にする）
+OLLAMA_POOL_SIZE = int(os.environ.get("OLLAMA_POOL_SIZE", 8))
+
+_session: Optional[requests.Session] = None
+_session_lock = threading.Lock()
+
+def _get_session() -> requests.Session:
+    # Ollamaへの接続をプロセス内で使い回す（サービスのインスタンスは呼び出しごとに作られるため共有にする）
+    global _session
+    with _session_lock:
+        if _session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=OLLAMA_POOL_SIZE)
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+            _session = session
+        return _session
+
+# モデルの準備状態（/readyで参照）: unknown / checking / pulling / ready / failed
+_model_status = {"state": "unknown", "model": None, "error": None, "updated_at": None}
+_model_status_lock = threading.Lock()
+_pull_thread: Optional[threading.Thread] = None
+
+def _set_model_status(state: str, model: str, error: Optional[str] = None) -> None:
+    with _model_status_lock:
+        _model_status.update(state=state, model=model, error=error, updated_at=time.time())
+
+def get_ollama_model_status() -> dict:
+    with _model_status_lock:
+        return dict(_model_status)
 
 def ensure_ollama_model(max_retries: int = 3, wait_sec: int = 10):
     """
@@ -12,49 +54,109 @@ def ensure_ollama_model(max_retries: int = 3, wait_sec: int = 10):
     base_url = os.environ.get("OLLAMA_BASE_URL", "http://ollama:11434")
     model = os.environ.get("OLLAMA_MODEL", "llama2:7b-q4")
     for attempt in range(max_retries):
+        _set_model_status("checking", model)
         try:
             resp = requests.get(f"{base_url}/api/tags", timeout=10)
             resp.raise_for_status()
             tags = resp.json().get("models", [])
             if any(model in (m.get("name") or "") for m in tags):
                 print(f"[INFO] ollama model '{model}' already exists")
+                _set_model_status("ready", model)
                 return
         except Exception as e:
             print(f"[WARN] ollama model check failed: {e}")
         # pull
         try:
             print(f"[INFO] pulling ollama model '{model}' ... (attempt {attempt+1})")
+            _set_model_status("pulling", model)
             resp = requests.post(f"{base_url}/api/pull", json={"name": model}, timeout=600)
             resp.raise_for_status()
             print(f"[INFO] ollama model '{model}' pull complete")
+            _set_model_status("ready", model)
             return
         except Exception as e:
             print(f"[ERROR] ollama model pull failed: {e}")
+            _set_model_status("failed", model, str(e))
             if attempt < max_retries - 1:
                 print(f"[INFO] retrying in {wait_sec} seconds...")
                 time.sleep(wait_sec)
     raise RuntimeError(f"ollama model '{model}' could not be pulled after {max_retries} attempts")
 
+def start_ollama_model_pull() -> threading.Thread:
+    """
+    ensure_ollama_modelをバックグラウンドスレッドで実行する（起動処理を待たせない）
+    すでに実行中ならそのスレッドを返す
+    """
+    global _pull_thread
+
+    def run():
+        try:
+            ensure_ollama_model()
+        except Exception as e:
+            print(f"[WARN] ollama model auto-pull failed: {e}")
+
+    with _model_status_lock:
+        if _pull_thread is None or not _pull_thread.is_alive():
+            _pull_thread = threading.Thread(target=run, name="ollama-model-pull", daemon=True)
+            _pull_thread.start()
+        return _pull_thread
+
 class OllamaLLMService(LLMInterface):
-    def __init__(self):
+    # プロンプトを変更したら上げる（LLM結果キャッシュのキーに含まれる）
+    PROMPT_VERSION = "1"
+
+    def __init__(self, stream: Optional[bool] = None):
         self.base_url = os.environ.get("OLLAMA_BASE_URL", "http://ollama:11434")
         self.model = os.environ.get("OLLAMA_MODEL", "llama2:7b-q4")
+        self.stream = OLLAMA_STREAM if stream is None else stream
+        self.session = _get_session()
 
-    def _chat(self, prompt: str) -> str:
-        # Ollama OpenAI互換API: /v1/chat/completions
-        url = f"{self.base_url}/v1/chat/completions"
-        headers = {"Content-Type": "application/json"}
-        data = {
+    def _request_body(self, prompt: str, stream: bool) -> dict:
+        # Ollamaネイティブ API: /api/chat（keep_alive・optionsを指定できる）
+        options = {}
+        if OLLAMA_NUM_CTX > 0:
+            options["num_ctx"] = OLLAMA_NUM_CTX
+        if OLLAMA_NUM_PREDICT > 0:
+            options["num_predict"] = OLLAMA_NUM_PREDICT
+        body = {
             "model": self.model,
             "messages": [
                 {"role": "user", "content": prompt}
-            ]
+            ],
+            "stream": stream,
+            "keep_alive": OLLAMA_KEEP_ALIVE,
         }
-        resp = requests.post(url, headers=headers, data=json.dumps(data), timeout=60)
-        resp.raise_for_status()
-        result = resp.json()
-        # OpenAI互換: result["choices"][0]["message"]["content"]
-        return result["choices"][0]["message"]["content"]
+        if options:
+            body["options"] = options
+        return body
+
+    def _chat(self, prompt: str, expect_json: bool = False) -> str:
+        url = f"{self.base_url}/api/chat"
+        if not self.stream:
+            resp = self.session.post(url, json=self._request_body(prompt, False), timeout=OLLAMA_TIMEOUT)
+            resp.raise_for_status()
+            return resp.json()["message"]["content"]
+        # ストリーミング: 1行1チャンクのNDJSONを受信し、JSON応答は閉じた時点で接続を切って生成を止める
+        parts: List[str] = []
+        with self.session.post(url, json=self._request_body(prompt, True), timeout=OLLAMA_TIMEOUT, stream=True) as resp:
+            resp.raise_for_status()
+            for line in resp.iter_lines():
+                if not line:
+                    continue
+                chunk = json.loads(line)
+                parts.append((chunk.get("message") or {}).get("content", ""))
+                if chunk.get("done"):
+                    break
+                if expect_json and ("}" in parts[-1] or "]" in parts[-1]):
+                    text = "".join(parts)
+                    end = find_json_end(text)
+                    if end >= 0:
+                        # 以降のトークン（説明文など）は不要。閉じると接続が切れ、Ollama側の生成も中断される
+                        return text[:end]
+        return "".join(parts)
+
+    def _chat_json(self, prompt: str) -> str:
+        return self._chat(prompt, expect_json=True)
 
     def generate_summary_and_labels(self, article_text: str) -> Tuple[str, List[str]]:
         prompt = (
@@ -63,24 +165,27 @@ class OllamaLLMService(LLMInterface):
             "要約とタグをそれぞれJSONで返してください。例: {\"summary\": \"...\", \"labels\": [\"...\", ...]}"
         )
         try:
-            content = self._chat(prompt)
-            data = json.loads(content)
-            summary = data.get("summary", "")
-            labels = data.get("labels", [])
-            if not isinstance(labels, list):
-                labels = []
-            return summary, labels
+            content = self._chat_json(prompt)
+            return parse_summary_response(content)
         except Exception as e:
             print(f"[ERROR] OllamaLLMService.generate_summary_and_labels failed: {e}")
             return "", []
 
+    def complete_batch_prompt(self, prompt: str) -> str:
+        # 複数記事をまとめたプロンプト1件分のリクエスト（RateLimitedLLMServiceがリクエストごとに枠を確保する）
+        return self._chat_json(prompt)
+
+    def generate_summaries_and_labels(self, article_texts: List[str]) -> List[Tuple[str, List[str]]]:
+        # 複数記事を1プロンプトにまとめて要約・タグ付けする（壊れた応答は分割して再試行）
+        return run_summary_batches(article_texts, self.complete_batch_prompt, self.generate_summary_and_labels)
+
     def generate_categories(self, article_text: str) -> List[str]:
         prompt = (
             f"次の文章を大カテゴリ・小カテゴリに分類してください。"
             f"カテゴリ名を日本語で、最大5つまでJSON配列で返してください。\n文章: {article_text}"
         )
         try:
-            content = self._chat(prompt)
+            content = self._chat_json(prompt)
             categories = json.loads(content)
             if not isinstance(categories, list):
                 categories = []
@@ -100,3 +205,16 @@ class OllamaLLMService(LLMInterface):
         except Exception as e:
             print(f"[ERROR] OllamaLLMService.generate_monthly_summary failed: {e}")
             return ""
+
+    def generate_chunk_summary(self, articles: List[str]) -> str:
+        prompt = (
+            "以下は今月の半導体業界の記事の一部です。後で全体のまとめを作る材料にするので、"
+            "重要な出来事・企業・技術動向を箇条書きで300字以内に整理してください。\n"
+            + "\n\n".join(articles)
+        )
+        try:
+            content = self._chat(prompt)
+            return content.strip()
+        except Exception as e:
+            print(f"[ERROR] OllamaLLMService.generate_chunk_summary failed: {e}")
+            return ""
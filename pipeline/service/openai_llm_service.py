@@ -1,27 +1,61 @@
 import os
+import json
 from dotenv import load_dotenv
 from typing import Tuple, List
 from langchain.prompts import PromptTemplate
 from langchain.chains import LLMChain, SequentialChain
 from langchain_community.chat_models import ChatOpenAI
 from .llm_interface import LLMInterface
+from .llm_batch import run_summary_batches, parse_summary_response
 from tenacity import retry, stop_after_attempt, wait_fixed
 
+# 要約＋タグの生成方式
+# structured: 1リクエストでJSON（summary, labels）を返させる（既定）
+# chain: 要約→タグの2段階SequentialChain（従来方式）
+OPENAI_SUMMARY_MODE = os.environ.get("OPENAI_SUMMARY_MODE", "structured").lower()
+
 class OpenAILLMService(LLMInterface):
-    def __init__(self):
+    # プロンプトを変更したら上げる（LLM結果キャッシュのキーに含まれる）
+    PROMPT_VERSION = "2"
+
+    def __init__(self, summary_mode: str = None):
         load_dotenv()
         self.api_key = os.environ.get('OPENAI_API_KEY')
         if not self.api_key:
             raise RuntimeError('OPENAI_API_KEY is not set')
+        self.model = "gpt-4o-mini"
+        self.summary_mode = (summary_mode or OPENAI_SUMMARY_MODE).lower()
+        if self.summary_mode not in ("structured", "chain"):
+            raise ValueError(f"Invalid OPENAI_SUMMARY_MODE: {self.summary_mode}")
+        # 生成方式で出力が変わるため、キャッシュキーも分ける
+        self.PROMPT_VERSION = f"{OpenAILLMService.PROMPT_VERSION}-{self.summary_mode}"
         self.llm = ChatOpenAI(
             openai_api_key=self.api_key,
-            model_name="gpt-4o-mini",       # モデルを指定
+            model_name=self.model,          # モデルを指定
             # max_tokens=512,               # 必要に応じて調整
             # temperature=0.5               # 応答の多様性を設定（任意）
         )
+        # JSONモード（応答が必ずJSONオブジェクトになる）
+        self.json_llm = ChatOpenAI(
+            openai_api_key=self.api_key,
+            model_name=self.model,
+            model_kwargs={"response_format": {"type": "json_object"}},
+        )
+        self._build_chains()
+
+    def _build_chains(self) -> None:
+        # プロンプト・チェーンはインスタンスごとに1回だけ組み立てる
+        prompt_structured = PromptTemplate(
+            input_variables=["article_text"],
+            template=(
+                "次の文章を200字以内で要約し、その要約から登場する企業、業界、分類を表す"
+                "5～10個の単語または短いフレーズのタグを抽出してください。要約の語尾は断定形で。\n"
+                "結果は {{\"summary\": \"要約\", \"labels\": [\"タグ1\", \"タグ2\", ...]}} のJSONオブジェクトのみで返してください。\n"
+                "文章: {article_text}"
+            ),
+        )
+        self.chain_structured = LLMChain(llm=self.json_llm, prompt=prompt_structured, output_key="result")
 
-    @retry(stop=stop_after_attempt(3), wait=wait_fixed(2))
-    def generate_summary_and_labels(self, article_text: str) -> Tuple[str, List[str]]:
         prompt_summary = PromptTemplate(
             input_variables=["article_text"],
             template="次の文章を200字以内で要約して。語尾は断定形で: {article_text}",
@@ -31,32 +65,19 @@ class OpenAILLMService(LLMInterface):
             input_variables=["article_summary"],
             template=(
                 "次の記事の文章から、トピックを表すタグを生成して："
-                "{article_text}\n"
+                "{article_summary}\n"
                 "登場する企業、業界、分類を表すような5～10個の単語または短いフレーズを、半角のカンマ「,」区切りで。"
             ),
         )
         chain_tags = LLMChain(llm=self.llm, prompt=prompt_tags, output_key="article_tags")
-        chain = SequentialChain(
+        self.chain_sequential = SequentialChain(
             chains=[chain_summary, chain_tags],
             input_variables=["article_text"],
             output_variables=["article_summary", "article_tags"],
             verbose=False,
         )
-        try:
-            out = chain({'article_text': article_text})
-            summary = out.get('article_summary', '').strip()
-            tags = out.get('article_tags', '')
-            labels = [t.strip() for t in tags.split(',') if t.strip()]
-            return summary, labels
-        except Exception as e:
-            print(f"[ERROR] OpenAILLMService.generate_summary_and_labels failed: {e}")
-            # フォールバック処理
-            fallback_summary = article_text[:200] + "..."
-            return fallback_summary, []
 
-    @retry(stop=stop_after_attempt(3), wait=wait_fixed(2))
-    def generate_categories(self, article_text: str) -> List[str]:
-        prompt = PromptTemplate(
+        prompt_categories = PromptTemplate(
             input_variables=["article_text"],
             template=(
                 "次の文章を大カテゴリ・小カテゴリに分類し、カテゴリ名を日本語で、JSON配列で返してください。"
@@ -65,11 +86,74 @@ class OpenAILLMService(LLMInterface):
                 "\n文章: {article_text}"
             ),
         )
-        chain = LLMChain(llm=self.llm, prompt=prompt, output_key="categories")
+        self.chain_categories = LLMChain(llm=self.llm, prompt=prompt_categories, output_key="categories")
+
+        prompt_monthly = PromptTemplate(
+            input_variables=["articles"],
+            template=(
+                "以下は今回の半導体TOPICSの主要な記事リストです。"
+                "全体を総括して大勢の人に伝えたいので、この期間の半導体業界の動向・ポイントを500字程度でまとめてください。\n"
+                "{articles}"
+            ),
+        )
+        self.chain_monthly = LLMChain(llm=self.llm, prompt=prompt_monthly, output_key="monthly_summary")
+
+        prompt_chunk = PromptTemplate(
+            input_variables=["articles"],
+            template=(
+                "以下は今回の半導体TOPICSの記事の一部です。後で全体のまとめを作る材料にするので、"
+                "重要な出来事・企業・技術動向を箇条書きで400字程度に整理してください。\n"
+                "{articles}"
+            ),
+        )
+        self.chain_chunk = LLMChain(llm=self.llm, prompt=prompt_chunk, output_key="chunk_summary")
+
+    def _generate_structured(self, article_text: str) -> Tuple[str, List[str]]:
+        # 1リクエストで要約とタグをJSONで受け取り、検証する
+        out = self.chain_structured({'article_text': article_text})
+        return parse_summary_response(out.get('result', ''))
+
+    def _generate_sequential(self, article_text: str) -> Tuple[str, List[str]]:
+        # 要約→タグの2リクエスト（従来方式）
+        out = self.chain_sequential({'article_text': article_text})
+        summary = out.get('article_summary', '').strip()
+        tags = out.get('article_tags', '')
+        labels = [t.strip() for t in tags.split(',') if t.strip()]
+        return summary, labels
+
+    @retry(stop=stop_after_attempt(3), wait=wait_fixed(2))
+    def generate_summary_and_labels(self, article_text: str) -> Tuple[str, List[str]]:
+        try:
+            if self.summary_mode == "structured":
+                try:
+                    return self._generate_structured(article_text)
+                except ValueError as e:
+                    # JSONとして不正な応答の場合は従来の2段階チェーンで取り直す
+                    print(f"[WARN] OpenAILLMService structured output invalid, falling back to chain: {e}")
+            return self._generate_sequential(article_text)
+        except Exception as e:
+            print(f"[ERROR] OpenAILLMService.generate_summary_and_labels failed: {e}")
+            # フォールバック処理
+            fallback_summary = article_text[:200] + "..."
+            return fallback_summary, []
+
+    def _chat(self, prompt: str) -> str:
+        # 単発のチャット呼び出し（生テキスト応答を返す）
+        return self.llm.invoke(prompt).content
+
+    def complete_batch_prompt(self, prompt: str) -> str:
+        # 複数記事をまとめたプロンプト1件分のリクエスト（RateLimitedLLMServiceがリクエストごとに枠を確保する）
+        return self._chat(prompt)
+
+    def generate_summaries_and_labels(self, article_texts: List[str]) -> List[Tuple[str, List[str]]]:
+        # 複数記事を1リクエストにまとめて要約・タグ付けする（壊れた応答は分割して再試行）
+        return run_summary_batches(article_texts, self.complete_batch_prompt, self.generate_summary_and_labels)
+
+    @retry(stop=stop_after_attempt(3), wait=wait_fixed(2))
+    def generate_categories(self, article_text: str) -> List[str]:
         try:
-            out = chain({'article_text': article_text})
+            out = self.chain_categories({'article_text': article_text})
             categories_json = out.get('categories', '').strip()
-            import json
             categories = json.loads(categories_json)
             if not isinstance(categories, list):
                 categories = []
@@ -80,20 +164,19 @@ class OpenAILLMService(LLMInterface):
             return ["未分類"]
 
     def generate_monthly_summary(self, articles: List[str]) -> str:
-        prompt = PromptTemplate(
-            input_variables=["articles"],
-            template=(
-                "以下は今回の半導体TOPICSの主要な記事リストです。"
-                "全体を総括して大勢の人に伝えたいので、この期間の半導体業界の動向・ポイントを500字程度でまとめてください。\n"
-                "{articles}"
-            ),
-        )
-        chain = LLMChain(llm=self.llm, prompt=prompt, output_key="monthly_summary")
         try:
             articles_text = "\n\n".join(articles)
-            out = chain({'articles': articles_text})
+            out = self.chain_monthly({'articles': articles_text})
             summary = out.get('monthly_summary', '').strip()
             return summary
         except Exception as e:
             print(f"[ERROR] OpenAILLMService.generate_monthly_summary failed: {e}")
             return ""
+
+    def generate_chunk_summary(self, articles: List[str]) -> str:
+        try:
+            out = self.chain_chunk({'articles': "\n\n".join(articles)})
+            return out.get('chunk_summary', '').strip()
+        except Exception as e:
+            print(f"[ERROR] OpenAILLMService.generate_chunk_summary failed: {e}")
+            return ""
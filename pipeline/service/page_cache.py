@@ -0,0 +1,64 @@
+# 記事ページ抽出結果の短命なプロセス内キャッシュ
+# 同一実行内で同じURLを何度参照しても、取得・パースは1回で済むようにする
+
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Generic, Optional, TypeVar
+
+T = TypeVar("T")
+
+
+class PageCache(Generic[T]):
+    """
+    TTLと最大件数を持つスレッドセーフなLRUキャッシュ
+
+    :param ttl_sec: 有効期限（秒）
+    :param max_entries: 最大保持件数（超過時は最も古く参照されたものから破棄）
+    """
+
+    def __init__(self, ttl_sec: float = 600.0, max_entries: int = 512):
+        self.ttl_sec = ttl_sec
+        self.max_entries = max_entries
+        self._data: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: str) -> Optional[T]:
+        now = time.monotonic()
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                self.misses += 1
+                return None
+            expires_at, value = item
+            if expires_at < now:
+                del self._data[key]
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key: str, value: T) -> None:
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.ttl_sec, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"entries": len(self._data), "hits": self.hits, "misses": self.misses}
+
+
+page_cache: PageCache = PageCache(
+    ttl_sec=float(os.environ.get("PAGE_CACHE_TTL_SEC", 600)),
+    max_entries=int(os.environ.get("PAGE_CACHE_MAX_ENTRIES", 512)),
+)
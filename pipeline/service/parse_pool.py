@@ -0,0 +1,152 @@
+# クロールの記事ページのパース段（プロセスプール）
+#
+# HTMLのパース・本文抽出はCPU処理でGILを保持するため、イベントループと同じプロセスで行うと
+# 取得を並行にしても1コアしか使えない。取得（非同期I/O）とパースを分け、パースはワーカープロセスで行う。
+# 取得段とは上限付きのキューでつなぎ、パースが追いつかない間は取得側を待たせる。
+# プロセス間で受け渡すのは取得したHTMLのバイト列と抽出結果のタプルだけにする。
+# プールはプロセスで1つだけ作り、クロールをまたいで使い回す。
+
+import asyncio
+import atexit
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import List, Optional, Tuple
+
+from entity.scraped_page import ScrapedPage
+from service.content_extractor import parse_article_page
+
+# パースに使うプロセス数（0ならイベントループ上でそのままパースする）
+CRAWL_PARSE_WORKERS = int(os.environ.get("CRAWL_PARSE_WORKERS", os.cpu_count() or 1))
+# パース待ちで保持するページ数の上限（既定: プロセス数の2倍）
+CRAWL_PARSE_QUEUE = int(os.environ.get("CRAWL_PARSE_QUEUE", 0))
+
+PageFields = Tuple[str, str, str, str, str, str]
+
+# プロセス共通のプール（クロールごとにプロセスを起動し直さない。main.pyのlifespan終了時・プロセス終了時に停止）
+_executor: Optional[ProcessPoolExecutor] = None
+_executor_lock = threading.Lock()
+
+
+def _parse_in_worker(html: bytes, url: str) -> PageFields:
+    # ワーカープロセスで実行する（戻り値はScrapedPageのurl以外の項目）
+    page = parse_article_page(html, url)
+    return (page.content, page.thumbnail_url, page.title, page.description, page.site_name, page.published_time)
+
+
+def can_start_processes() -> bool:
+    # デーモンプロセス（ジョブワーカー）は子プロセスを持てない
+    return not multiprocessing.current_process().daemon
+
+
+def get_parse_executor(workers: int) -> Optional[ProcessPoolExecutor]:
+    """
+    共有のプロセスプールを返す（初回に workers 個で作成する）。子プロセスを起動できないプロセスではNone
+    """
+    global _executor
+    if workers <= 0 or not can_start_processes():
+        return None
+    with _executor_lock:
+        if _executor is None:
+            # 親プロセスのスレッドやロック（DBプール・HTTPクライアント）を引き継がないようspawnで起動する
+            _executor = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+        return _executor
+
+
+def _discard_executor(executor: ProcessPoolExecutor) -> None:
+    # 壊れたプールを捨て、次回のget_parse_executorで作り直させる
+    global _executor
+    with _executor_lock:
+        if _executor is executor:
+            _executor = None
+    executor.shutdown(wait=False, cancel_futures=True)
+
+
+def shutdown_parse_pool() -> None:
+    global _executor
+    with _executor_lock:
+        executor, _executor = _executor, None
+    if executor is not None:
+        executor.shutdown(wait=True, cancel_futures=True)
+
+
+atexit.register(shutdown_parse_pool)
+
+
+class ParseStage:
+    """
+    記事ページのパースを共有のプロセスプールで並列実行する
+
+    :param workers: 同時にパースするページ数（既定: CRAWL_PARSE_WORKERS）
+    :param queue_size: パース待ちページ数の上限（既定: CRAWL_PARSE_QUEUE、0ならworkersの2倍）
+
+    子プロセスを持てないデーモンプロセス（interface/worker.pyのジョブワーカー）では、
+    プロセスプールの代わりにスレッドでパースする（イベントループは止めない）。
+
+    使い方:
+        async with ParseStage() as parser:
+            page = await parser.parse(resp.content, url)
+    """
+
+    def __init__(self, workers: Optional[int] = None, queue_size: Optional[int] = None):
+        self.workers = CRAWL_PARSE_WORKERS if workers is None else max(0, workers)
+        self.queue_size = queue_size or CRAWL_PARSE_QUEUE or self.workers * 2
+        self._queue: Optional[asyncio.Queue] = None
+        self._consumers: List[asyncio.Task] = []
+
+    async def __aenter__(self) -> "ParseStage":
+        if self.workers > 0:
+            self._queue = asyncio.Queue(maxsize=self.queue_size)
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb) -> None:
+        # プールは共有のため停止しない
+        for consumer in self._consumers:
+            consumer.cancel()
+        await asyncio.gather(*self._consumers, return_exceptions=True)
+        self._consumers = []
+
+    async def _run(self, html: bytes, url: str) -> PageFields:
+        loop = asyncio.get_running_loop()
+        executor = get_parse_executor(self.workers)
+        if executor is not None:
+            try:
+                pending = loop.run_in_executor(executor, _parse_in_worker, html, url)
+            except (BrokenProcessPool, RuntimeError, AssertionError) as e:
+                # プロセスを起動できない・プールが停止済みの場合はスレッドでパースする
+                print(f"[WARN] parse pool unavailable, parsing in thread: {e}")
+                _discard_executor(executor)
+            else:
+                try:
+                    return await pending
+                except BrokenProcessPool:
+                    # ワーカープロセスが異常終了した場合もクロールは止めない（プールは次回作り直す）
+                    _discard_executor(executor)
+        return await loop.run_in_executor(None, _parse_in_worker, html, url)
+
+    async def _consume(self) -> None:
+        # キューから1件ずつ取り出してパースする（同時にパースするのはworkers件まで）
+        while True:
+            html, url, future = await self._queue.get()
+            if future.done():
+                continue
+            try:
+                fields = await self._run(html, url)
+            except Exception as e:
+                if not future.done():
+                    future.set_exception(e)
+                continue
+            if not future.done():
+                future.set_result(fields)
+
+    async def parse(self, html: bytes, url: str) -> ScrapedPage:
+        """HTMLをパースして抽出結果を返す（パース待ちが上限に達している間は待つ）"""
+        if self.workers <= 0:
+            return parse_article_page(html, url)
+        if not self._consumers:
+            self._consumers = [asyncio.create_task(self._consume()) for _ in range(self.workers)]
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((html, url, future))
+        return ScrapedPage(url, *(await future))
@@ -0,0 +1,140 @@
+# LLMプロバイダごとのリクエスト数（RPM）・トークン数（TPM）制限
+# 並行ワーカーから同じプロバイダを呼ぶ場合でも、上限を超えないように呼び出しを待機させる
+
+import os
+import threading
+import time
+from collections import deque
+from typing import Dict, List, Tuple
+
+from .llm_batch import count_batch_prompt_items, run_summary_batches
+from .llm_interface import LLMInterface
+from .tokens import estimate_tokens
+
+# プロバイダごとの既定値（0は無制限）。環境変数 {PROVIDER}_RPM / {PROVIDER}_TPM で上書きできる
+DEFAULT_LIMITS: Dict[str, Tuple[int, int]] = {
+    "openai": (500, 200000),
+    "ollama": (0, 0),
+}
+
+# 出力トークンの見積もり（要約200字＋タグ程度）
+OUTPUT_TOKENS_ESTIMATE = 400
+
+
+class RateLimiter:
+    """
+    直近60秒のスライディングウィンドウでRPM・TPMを制限するスレッドセーフなリミッタ
+
+    :param rpm: 1分あたりのリクエスト数上限（0は無制限）
+    :param tpm: 1分あたりのトークン数上限（0は無制限）
+    """
+
+    def __init__(self, rpm: int = 0, tpm: int = 0, window_sec: float = 60.0):
+        self.rpm = rpm
+        self.tpm = tpm
+        self.window_sec = window_sec
+        self._events: deque = deque()
+        self._tokens_in_window = 0
+        self._lock = threading.Lock()
+        self.waited_sec = 0.0
+
+    def _purge(self, now: float) -> None:
+        while self._events and self._events[0][0] <= now - self.window_sec:
+            _, tokens = self._events.popleft()
+            self._tokens_in_window -= tokens
+
+    def acquire(self, tokens: int = 0) -> float:
+        """枠が空くまで待機して1リクエスト分を確保し、待機秒数を返す"""
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._purge(now)
+                rpm_ok = not self.rpm or len(self._events) < self.rpm
+                # 1件でTPMを超える大きな入力は、ウィンドウが空のときに限り通す
+                tpm_ok = not self.tpm or not self._events or self._tokens_in_window + tokens <= self.tpm
+                if rpm_ok and tpm_ok:
+                    self._events.append((now, tokens))
+                    self._tokens_in_window += tokens
+                    self.waited_sec += waited
+                    return waited
+                sleep_sec = max(self._events[0][0] + self.window_sec - now, 0.01)
+            time.sleep(sleep_sec)
+            waited += sleep_sec
+
+    def stats(self) -> dict:
+        with self._lock:
+            self._purge(time.monotonic())
+            return {
+                "rpm_limit": self.rpm,
+                "tpm_limit": self.tpm,
+                "requests_in_window": len(self._events),
+                "tokens_in_window": self._tokens_in_window,
+                "waited_sec_total": round(self.waited_sec, 2),
+            }
+
+
+_limiters: Dict[str, RateLimiter] = {}
+_limiters_lock = threading.Lock()
+
+
+def get_rate_limiter(provider: str) -> RateLimiter:
+    # プロバイダごとにプロセスで1つのリミッタを共有する
+    provider = provider.lower()
+    with _limiters_lock:
+        limiter = _limiters.get(provider)
+        if limiter is None:
+            default_rpm, default_tpm = DEFAULT_LIMITS.get(provider, (0, 0))
+            limiter = RateLimiter(
+                rpm=int(os.environ.get(f"{provider.upper()}_RPM", default_rpm)),
+                tpm=int(os.environ.get(f"{provider.upper()}_TPM", default_tpm)),
+            )
+            _limiters[provider] = limiter
+        return limiter
+
+
+class RateLimitedLLMService(LLMInterface):
+    """
+    LLMInterface実装をラップし、各呼び出しの前にプロバイダのレート制限枠を確保する
+    """
+
+    def __init__(self, inner: LLMInterface, limiter: RateLimiter):
+        self.inner = inner
+        self.limiter = limiter
+
+    def __getattr__(self, name):
+        # model名などラップ対象の属性はそのまま参照できるようにする
+        return getattr(self.inner, name)
+
+    def generate_summary_and_labels(self, article_text: str) -> Tuple[str, List[str]]:
+        self.limiter.acquire(estimate_tokens(article_text) + OUTPUT_TOKENS_ESTIMATE)
+        return self.inner.generate_summary_and_labels(article_text)
+
+    def generate_summaries_and_labels(self, article_texts: List[str]) -> List[Tuple[str, List[str]]]:
+        complete = getattr(self.inner, "complete_batch_prompt", None)
+        if complete is None:
+            # まとめたリクエストを外から送れない実装は、呼び出し全体の見積もりで1回だけ枠を確保する
+            self.limiter.acquire(
+                sum(estimate_tokens(t) for t in article_texts) + OUTPUT_TOKENS_ESTIMATE * len(article_texts)
+            )
+            return self.inner.generate_summaries_and_labels(article_texts)
+
+        def limited_complete(prompt: str) -> str:
+            # 分割による再試行を含め、実際に送るリクエストごとに枠を確保する
+            self.limiter.acquire(estimate_tokens(prompt) + OUTPUT_TOKENS_ESTIMATE * max(1, count_batch_prompt_items(prompt)))
+            return complete(prompt)
+
+        # 1件まで分割しても解決しない記事の単発呼び出しも、このラッパー経由で枠を確保する
+        return run_summary_batches(article_texts, limited_complete, self.generate_summary_and_labels)
+
+    def generate_categories(self, article_text: str) -> List[str]:
+        self.limiter.acquire(estimate_tokens(article_text) + OUTPUT_TOKENS_ESTIMATE)
+        return self.inner.generate_categories(article_text)
+
+    def generate_monthly_summary(self, articles: List[str]) -> str:
+        self.limiter.acquire(sum(estimate_tokens(a) for a in articles) + OUTPUT_TOKENS_ESTIMATE)
+        return self.inner.generate_monthly_summary(articles)
+
+    def generate_chunk_summary(self, articles: List[str]) -> str:
+        self.limiter.acquire(sum(estimate_tokens(a) for a in articles) + OUTPUT_TOKENS_ESTIMATE)
+        return self.inner.generate_chunk_summary(articles)
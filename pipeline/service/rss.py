@@ -1,53 +1,92 @@
+import asyncio
+import hashlib
 import os
 import re
-from datetime import date, datetime as dt
-from typing import List, Optional, Tuple
+import time
+from datetime import date, datetime as dt, timedelta
+from typing import AsyncIterator, Awaitable, Callable, Dict, List, Optional, Set, Tuple
 
 import feedparser
 import httpx
-from bs4 import BeautifulSoup
 from dateutil import parser as date_parser
 from dotenv import load_dotenv
 
-import requests
-from langchain.prompts import PromptTemplate
-from langchain.chains import LLMChain, SequentialChain
-from langchain_community.chat_models import ChatOpenAI
-
 from entity.article import Article
+from entity.feed_state import FeedState
+from entity.scraped_page import ScrapedPage
+from service.content_extractor import parse_article_page
+from service.events import EventSink, emit, elapsed_ms
+from service.http_fetcher import AsyncFetcher
+from service.page_cache import page_cache
+from service.parse_pool import ParseStage
 
 # --- スクレイピング用実装関数 ---
 
+def scrape_article(url: str) -> ScrapedPage:
+    # 指定URLを1回だけ取得・パースする（同一URLはページキャッシュから返す）
+    cached = page_cache.get(url)
+    if cached is not None:
+        return cached
+    try:
+        resp = httpx.get(url, timeout=10, follow_redirects=True)
+        resp.raise_for_status()
+        page = parse_article_page(resp.content, url)
+    except Exception as e:
+        print(f"[ERROR] scrape_article({url}): {e}")
+        return ScrapedPage(url=url)
+    page_cache.set(url, page)
+    return page
+
+
+async def scrape_article_async(fetcher: AsyncFetcher, url: str, parser: Optional[ParseStage] = None) -> ScrapedPage:
+    # scrape_articleの非同期版（共有フェッチャー経由、キャッシュも共有）
+    # parserを渡すとパースをプロセスプールで行い、イベントループを止めない
+    cached = page_cache.get(url)
+    if cached is not None:
+        return cached
+    try:
+        resp = await fetcher.get(url)
+        resp.raise_for_status()
+        page = await parser.parse(resp.content, url) if parser is not None else parse_article_page(resp.content, url)
+    except Exception as e:
+        print(f"[ERROR] scrape_article({url}): {e}")
+        return ScrapedPage(url=url)
+    page_cache.set(url, page)
+    return page
+
+
+async def scrape_articles_async(urls: List[str]) -> List[ScrapedPage]:
+    # 複数URLを1つのAsyncFetcher上で並行取得・パースする（入力順で返す）
+    async with AsyncFetcher() as fetcher:
+        return list(await asyncio.gather(*(scrape_article_async(fetcher, url) for url in urls)))
+
+
+def scrape_articles(urls: List[str]) -> List[ScrapedPage]:
+    # scrape_articles_asyncの同期ラッパー（イベントループ外から利用する）
+    if not urls:
+        return []
+    return asyncio.run(scrape_articles_async(urls))
+
+
+def scrape_article_content_and_thumbnail(url: str) -> Tuple[str, str]:
+    # 指定URLの記事本文とOGP画像URLを1回の取得で返す
+    page = scrape_article(url)
+    return page.content, page.thumbnail_url
+
+
 def fetch_article_text(url: str) -> str:
 
     # 指定URLから記事本文テキストを抽出する
     # <article>タグ優先、なければ全体テキスト
     
-    try:
-        resp = httpx.get(url, timeout=10)
-        resp.raise_for_status()
-        soup = BeautifulSoup(resp.content, "html.parser")
-        article_tag = soup.find("article")
-        text = article_tag.get_text(separator=" ", strip=True) if article_tag else soup.get_text(separator=" ", strip=True)
-        return re.sub(r"[\n\t\r]+", " ", text).strip()
-    except Exception as e:
-        print(f"[ERROR] fetch_article_text({url}): {e}")
-        return ""
+    return scrape_article(url).content
 
 
 def fetch_thumbnail_url(url: str) -> str:
     
     # 指定URLからOGP画像を取得する
     
-    try:
-        resp = httpx.get(url, timeout=10)
-        resp.raise_for_status()
-        soup = BeautifulSoup(resp.content, "html.parser")
-        og = soup.find('meta', property='og:image')
-        return og['content'] if og and og.get('content') else ''
-    except Exception as e:
-        print(f"[ERROR] fetch_thumbnail_url({url}): {e}")
-        return ''
+    return scrape_article(url).thumbnail_url
 
 
 # build_llm_chain, generate_summary_and_labelsはapp/service/summarizer.pyに移動
@@ -56,60 +95,274 @@ def fetch_thumbnail_url(url: str) -> str:
 from repository.rss_feeds_loader import get_rss_feeds
 
 
-def fetch_rss_articles(start_date: date, end_date: date, sources: Optional[List[str]] = None) -> List[Article]:
-    # 指定期間・指定ソースのRSSを取得し、記事一覧を返却
-    # RSSフィード定義は外部yamlから取得
-    articles: List[Article] = []
-    load_dotenv()
+def _entry_published(entry) -> Optional[dt]:
+    # RSSエントリの公開日時を取得
+    if getattr(entry, 'published_parsed', None):
+        tm = entry.published_parsed
+        return dt(*tm[:6])
+    dt_str = getattr(entry, 'published', None) or getattr(entry, 'updated', None)
+    if dt_str:
+        try:
+            return date_parser.parse(dt_str)
+        except Exception:
+            print(f"[WARN] Could not parse date: {dt_str}")
+    return None
+
+
+def _iter_feeds(sources: Optional[List[str]] = None) -> List[Tuple[str, str]]:
+    # 指定ソースのフィード一覧を(name, url)のリストで返す
     feeds_dict = get_rss_feeds()
     keys = sources if sources else list(feeds_dict.keys())
-
+    result: List[Tuple[str, str]] = []
     for key in keys:
         feeds = feeds_dict.get(key)
         if not feeds:
             continue
         # feedsはリスト形式
         for feed in feeds:
-            source = feed["name"]
-            url = feed["url"]
+            result.append((feed["name"], feed["url"]))
+    return result
+
+
+async def _build_article(
+    fetcher: AsyncFetcher, source: str, entry, pub_dt: dt, on_event: Optional[EventSink] = None,
+    parser: Optional[ParseStage] = None
+) -> Article:
+    # 本文・サムネ取得（1回の取得・パースで両方抽出）
+    started = time.monotonic()
+    page = await scrape_article_async(fetcher, entry.link, parser)
+    emit(
+        on_event, "article_fetched", source=source, url=entry.link, title=entry.title,
+        has_content=bool(page.content), elapsed_ms=elapsed_ms(started)
+    )
+    # summary, labelsは空で初期化
+    return Article(
+        title=entry.title,
+        url=entry.link,
+        source=source,
+        published=pub_dt,
+        summary="",
+        labels=[],
+        thumbnail_url=page.thumbnail_url,
+        content=page.content
+    )
+
+
+# 保存済みURLの問い合わせ関数（同期関数。スレッドで実行される）
+KnownUrlFilter = Callable[[List[str]], Set[str]]
+
+# 取得できた記事の受け取り先（キューへのputなど）
+ArticleSink = Callable[[Article], Awaitable[None]]
+
+# 取得済みで未消費の記事数の上限（これを超えるとスクレイピングを待たせ、メモリ使用量を一定に保つ）
+CRAWL_MAX_PENDING_ARTICLES = int(os.environ.get("CRAWL_MAX_PENDING_ARTICLES", 200))
+
+
+def _content_hash(content: bytes) -> str:
+    return hashlib.sha256(content).hexdigest()
+
+
+def _range_covered(state: Optional[FeedState], start_date: date, end_date: date) -> bool:
+    # 要求された期間が前回パースした期間に含まれるか（含まれなければ、フィードが不変でも対象の記事が残っている）
+    return bool(
+        state and state.crawled_from and state.crawled_to
+        and state.crawled_from <= start_date and end_date <= state.crawled_to
+    )
+
+
+def _crawled_range(
+    state: Optional[FeedState], unchanged: bool, start_date: date, end_date: date
+) -> Tuple[date, date]:
+    # 今回パースした期間。フィードが前回と同じで期間が重なる・隣接する場合は、前回の期間とつなげる
+    if (
+        unchanged and state.crawled_from and state.crawled_to
+        and state.crawled_from <= end_date + timedelta(days=1)
+        and start_date <= state.crawled_to + timedelta(days=1)
+    ):
+        return min(start_date, state.crawled_from), max(end_date, state.crawled_to)
+    return start_date, end_date
+
+
+def _conditional_headers(state: Optional[FeedState]) -> Dict[str, str]:
+    # 前回のバリデータから条件付きGET用ヘッダを組み立てる
+    headers: Dict[str, str] = {}
+    if state and state.etag:
+        headers["If-None-Match"] = state.etag
+    if state and state.last_modified:
+        headers["If-Modified-Since"] = state.last_modified
+    return headers
+
+
+async def _fetch_feed_articles(
+    fetcher: AsyncFetcher, sink: ArticleSink, source: str, url: str, start_date: date, end_date: date,
+    feed_states: Optional[Dict[str, FeedState]] = None, stats: Optional[dict] = None,
+    known_url_filter: Optional[KnownUrlFilter] = None, seen_urls: Optional[Set[str]] = None,
+    on_event: Optional[EventSink] = None, slots: Optional[asyncio.Semaphore] = None,
+    parser: Optional[ParseStage] = None
+) -> int:
+    # 1フィード分の記事を取得し、1件できるごとにsinkへ渡す（エントリのスクレイピングは並行実行）。戻り値は渡した件数
+    # feed_statesが渡された場合は条件付きGETを行い、304または本文ハッシュ不変ならパースせずに終える。
+    # ただし省略するのは要求された期間が前回パースした期間に含まれる場合だけ（それ以外は無条件に取得してパースする）
+    state = feed_states.get(url) if feed_states is not None else None
+    covered = _range_covered(state, start_date, end_date)
+    started = time.monotonic()
+    try:
+        resp = await fetcher.get(url, headers=_conditional_headers(state) if covered else {})
+        fetched_at = dt.now()
+        if resp.status_code == 304:
+            if stats is not None:
+                stats["feeds_not_modified"] = stats.get("feeds_not_modified", 0) + 1
+            if state:
+                state.last_fetched_at = fetched_at
+            emit(on_event, "feed", source=source, url=url, status="not_modified", elapsed_ms=elapsed_ms(started))
+            return 0
+        resp.raise_for_status()
+        # 大きなフィードのハッシュ計算・パースはイベントループを止めないようスレッドで行う
+        content_hash = await asyncio.to_thread(_content_hash, resp.content)
+        unchanged = bool(state and state.content_hash == content_hash)
+        crawled_from, crawled_to = _crawled_range(state, unchanged, start_date, end_date)
+        new_state = FeedState(
+            feed_url=url,
+            etag=resp.headers.get("ETag"),
+            last_modified=resp.headers.get("Last-Modified"),
+            content_hash=content_hash,
+            last_fetched_at=fetched_at,
+            crawled_from=crawled_from,
+            crawled_to=crawled_to,
+        )
+        if feed_states is not None:
+            feed_states[url] = new_state
+        if unchanged and covered:
+            if stats is not None:
+                stats["feeds_unchanged"] = stats.get("feeds_unchanged", 0) + 1
+            emit(on_event, "feed", source=source, url=url, status="unchanged", elapsed_ms=elapsed_ms(started))
+            return 0
+        feed_data = await asyncio.to_thread(feedparser.parse, resp.content)
+        targets = []
+        for entry in feed_data.entries:
+            pub_dt = _entry_published(entry)
+            if not pub_dt:
+                continue
+            if not (start_date <= pub_dt.date() <= end_date):
+                continue
+            # 同一クロール内で別フィードに同じ記事がある場合は1回だけ処理する
+            if seen_urls is not None:
+                if entry.link in seen_urls:
+                    if stats is not None:
+                        stats["duplicates_in_crawl"] = stats.get("duplicates_in_crawl", 0) + 1
+                    emit(on_event, "article_skipped", source=source, url=entry.link, reason="duplicate")
+                    continue
+                seen_urls.add(entry.link)
+            targets.append((entry, pub_dt))
+        # 保存済みURLはスクレイピング前に除外する（フィード単位で1回のバッチ問い合わせ）
+        if known_url_filter and targets:
+            known = await asyncio.to_thread(known_url_filter, [entry.link for entry, _ in targets])
+            if known:
+                targets = [(entry, pub_dt) for entry, pub_dt in targets if entry.link not in known]
+                if stats is not None:
+                    stats["prefiltered"] = stats.get("prefiltered", 0) + len(known)
+                for link in known:
+                    emit(on_event, "article_skipped", source=source, url=link, reason="known")
+        emit(
+            on_event, "feed", source=source, url=url, status="fetched",
+            entries=len(feed_data.entries), targets=len(targets), elapsed_ms=elapsed_ms(started)
+        )
+
+        async def build_and_send(entry, pub_dt) -> None:
+            # 記事ができ次第渡し、フィード内の全記事本文をまとめて保持しない
+            # slotsがあれば空きを待ってからスクレイピングする（未消費の記事数を上限内に保つ）
+            if slots is not None:
+                await slots.acquire()
             try:
-                resp = httpx.get(url, timeout=10)
-                resp.raise_for_status()
-                feed_data = feedparser.parse(resp.content)
-                for entry in feed_data.entries:
-                    # 日時取得
-                    pub_dt: Optional[dt] = None
-                    if getattr(entry, 'published_parsed', None):
-                        tm = entry.published_parsed
-                        pub_dt = dt(*tm[:6])
-                    else:
-                        dt_str = getattr(entry, 'published', None) or getattr(entry, 'updated', None)
-                        if dt_str:
-                            try:
-                                pub_dt = date_parser.parse(dt_str)
-                            except Exception:
-                                print(f"[WARN] Could not parse date: {dt_str}")
-                    if not pub_dt:
-                        continue
-                    if not (start_date <= pub_dt.date() <= end_date):
-                        continue
-                    # 本文・サムネ取得
-                    content = fetch_article_text(entry.link)
-                    thumbnail = fetch_thumbnail_url(entry.link)
-                    # summary, labelsは空で初期化
-                    summary = ""
-                    labels = []
-                    articles.append(Article(
-                        title=entry.title,
-                        url=entry.link,
-                        source=source,
-                        published=pub_dt,
-                        summary=summary,
-                        labels=labels,
-                        thumbnail_url=thumbnail,
-                        content=content
-                    ))
-            except Exception as e:
-                print(f"[ERROR] Failed RSS fetch for {source} ({url}): {e}")
+                article = await _build_article(fetcher, source, entry, pub_dt, on_event, parser)
+            except BaseException:
+                if slots is not None:
+                    slots.release()
+                raise
+            await sink(article)
+
+        await asyncio.gather(*(build_and_send(entry, pub_dt) for entry, pub_dt in targets))
+        return len(targets)
+    except Exception as e:
+        print(f"[ERROR] Failed RSS fetch for {source} ({url}): {e}")
+        if stats is not None:
+            stats["feeds_failed"] = stats.get("feeds_failed", 0) + 1
+        emit(on_event, "error", source=source, url=url, error=str(e), elapsed_ms=elapsed_ms(started))
+        return 0
+
+
+async def iter_rss_articles(
+    start_date: date, end_date: date, sources: Optional[List[str]] = None,
+    feed_states: Optional[Dict[str, FeedState]] = None, stats: Optional[dict] = None,
+    known_url_filter: Optional[KnownUrlFilter] = None, on_event: Optional[EventSink] = None,
+    max_pending: Optional[int] = None
+) -> AsyncIterator[Article]:
+    # 指定期間・指定ソースのRSS記事を、取得できた順に1件ずつ返す非同期ジェネレータ
+    # 全フィード・全記事を1つのAsyncFetcher上で並行取得するため、
+    # 所要時間は全リクエストの合計ではなく最も遅いホストで決まる
+    # スクレイピング中・未消費の記事は合わせてmax_pending件（既定: CRAWL_MAX_PENDING_ARTICLES）までに抑える
+    # feed_states: フィードURL→FeedState。前回値を渡すと条件付きGETを行い、今回の値で上書きされる
+    # stats: 集計（feeds/feeds_not_modified/feeds_unchanged/feeds_failed/prefiltered/duplicates_in_crawl）を書き込む
+    # known_url_filter: URLリストを受け取り保存済みのURL集合を返す関数。該当エントリはスクレイピングしない
+    # on_event: フィード・記事単位の進捗イベント（feed / article_fetched / article_skipped / error）の通知先
+    load_dotenv()
+    feeds = _iter_feeds(sources)
+    if stats is not None:
+        stats["feeds"] = len(feeds)
+    seen_urls: Set[str] = set()
+    # スクレイピング開始時に確保し、利用側が記事を受け取って次を要求した時点で返す
+    slots = asyncio.Semaphore(max(1, max_pending or CRAWL_MAX_PENDING_ARTICLES))
+    queue: asyncio.Queue = asyncio.Queue()
+    # 取得（非同期I/O）とパース（プロセスプール）を分け、パース待ちが溜まると取得を待たせる
+    async with AsyncFetcher() as fetcher, ParseStage() as parser:
+        producer = asyncio.ensure_future(asyncio.gather(
+            *(
+                _fetch_feed_articles(
+                    fetcher, queue.put, source, url, start_date, end_date, feed_states, stats,
+                    known_url_filter, seen_urls, on_event, slots, parser
+                )
+                for source, url in feeds
+            )
+        ))
+        try:
+            while True:
+                getter = asyncio.ensure_future(queue.get())
+                await asyncio.wait({getter, producer}, return_when=asyncio.FIRST_COMPLETED)
+                if getter.done():
+                    yield getter.result()
+                    slots.release()
+                    continue
+                getter.cancel()
+                # 全フィード完了：キューに残った分を返して終える
+                while not queue.empty():
+                    yield queue.get_nowait()
+                    slots.release()
+                break
+            producer.result()
+        finally:
+            # 利用側が途中でやめた場合は、残りのフィード・記事の取得を打ち切る
+            if not producer.done():
+                producer.cancel()
+                try:
+                    await producer
+                except asyncio.CancelledError:
+                    pass
+
+
+async def fetch_rss_articles_async(
+    start_date: date, end_date: date, sources: Optional[List[str]] = None,
+    feed_states: Optional[Dict[str, FeedState]] = None, stats: Optional[dict] = None,
+    known_url_filter: Optional[KnownUrlFilter] = None, on_event: Optional[EventSink] = None
+) -> List[Article]:
+    # iter_rss_articlesの結果を一覧で返す（件数が少ない用途向け。クロールは逐次保存のiter_rss_articlesを使う）
+    articles: List[Article] = []
+    async for article in iter_rss_articles(
+        start_date, end_date, sources, feed_states, stats, known_url_filter, on_event
+    ):
+        articles.append(article)
     return articles
 
+
+def fetch_rss_articles(start_date: date, end_date: date, sources: Optional[List[str]] = None) -> List[Article]:
+    # 同期呼び出し用のラッパー（イベントループ外から利用する）
+    return asyncio.run(fetch_rss_articles_async(start_date, end_date, sources))
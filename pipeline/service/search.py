@@ -0,0 +1,82 @@
+# 記事検索の検索語の正規化・バイグラム化とページングカーソル
+#
+# 索引側（migrations/0005_article_search_functions.sql の search_normalize / search_bigrams）と同じ規則で
+# 検索語を正規化し、連続2文字（バイグラム）に分ける。DBではバイグラムをすべて含む記事をGIN索引で引いたあと、
+# 正規化済みテキストの生成列（articles.search_doc）に検索語そのものを含むか（LIKE）で確かめる。正規化後の検索語は記号（%・_）を含まない。
+# 1文字の検索語はバイグラムがないため索引では絞り込めない（ほかの検索語と組み合わせて使う想定）。
+
+import base64
+import json
+import os
+import re
+from datetime import datetime
+from typing import List, Optional, Tuple
+
+SEARCH_DEFAULT_LIMIT = int(os.environ.get("SEARCH_DEFAULT_LIMIT", 20))
+SEARCH_MAX_LIMIT = int(os.environ.get("SEARCH_MAX_LIMIT", 100))
+# 関連度順に並べ替える候補の上限（一致した記事のうち新しい順にこの件数まで）
+SEARCH_RANK_WINDOW = int(os.environ.get("SEARCH_RANK_WINDOW", 1000))
+# 1回の検索で使う検索語の上限
+SEARCH_MAX_TERMS = 8
+
+SORTS = ("relevance", "date")
+
+# 全角英数記号（U+FF01〜U+FF5E）を半角に揃える（NFKCはDBと結果が揃わないため使わない）
+_FULLWIDTH = {code: code - 0xFEE0 for code in range(0xFF01, 0xFF5F)}
+# 空白・ASCII記号・和文の約物を除く（search_normalize の正規表現と同じ文字）
+_NOISE = re.compile(r"[\s!-/:-@\[-`{-~　、。・「」『』【】〈〉《》〔〕…‥]+")
+
+
+def normalize_search_text(text: str) -> str:
+    return _NOISE.sub("", (text or "").translate(_FULLWIDTH)).lower()
+
+
+def parse_terms(q: str) -> List[str]:
+    """
+    検索文字列を空白で区切り、正規化した検索語を返す（空・重複を除き、SEARCH_MAX_TERMS件まで）
+    """
+    terms: List[str] = []
+    for word in (q or "").split():
+        term = normalize_search_text(word)
+        if term and term not in terms:
+            terms.append(term)
+    return terms[:SEARCH_MAX_TERMS]
+
+
+def bigrams(terms: List[str]) -> List[str]:
+    # 全検索語のバイグラム（索引の @> 条件に使う。1文字の検索語からは作らない）
+    grams = {term[i:i + 2] for term in terms for i in range(len(term) - 1)}
+    return sorted(grams)
+
+
+def encode_cursor(sort: str, row: dict) -> str:
+    """
+    ページ最後の記事から次ページのカーソル（URLに載せられる文字列）を作る
+
+    関連度順は (score, 公開日時, id)、新しい順は (公開日時, id) をキーにする。公開日時がない記事はNone
+    """
+    published = row.get("published")
+    key = [published.isoformat() if published else None, row["id"]]
+    if sort == "relevance":
+        key.insert(0, row["score"])
+    raw = json.dumps({"sort": sort, "key": key}, separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str, sort: str) -> Tuple[Optional[int], Optional[datetime], int]:
+    """
+    カーソルを (score, 公開日時, id) に戻す（新しい順のカーソルではscoreはNone）
+
+    :raises ValueError: カーソルが不正、または並び順が異なる場合
+    """
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        data = json.loads(raw)
+        key = list(data["key"])
+        if data["sort"] != sort:
+            raise ValueError("sort mismatch")
+        score = int(key.pop(0)) if sort == "relevance" else None
+        published, article_id = key
+        return score, datetime.fromisoformat(published) if published else None, int(article_id)
+    except (ValueError, TypeError, KeyError, IndexError) as e:
+        raise ValueError(f"invalid cursor: {cursor}") from e
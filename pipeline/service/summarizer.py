@@ -1,24 +1,44 @@
 import os
+import threading
 from dotenv import load_dotenv
-from typing import Tuple, Dict
+from typing import Optional, Tuple, Dict
 from .llm_interface import LLMInterface
+from .rate_limiter import RateLimitedLLMService, get_rate_limiter
+from .llm_cache import CachedLLMService
 
-# LLM実装のimport
-from .openai_llm_service import OpenAILLMService
-from .ollama_llm_service import OllamaLLMService
+# LLM実装（langchain等の重い依存を含む）は使うプロバイダだけを初回利用時にimportする
 
 load_dotenv()
 LLM_PROVIDER = os.environ.get("LLM_PROVIDER", "openai").lower()
+LLM_CACHE_ENABLED = os.environ.get("LLM_CACHE_ENABLED", "true").lower() in ("1", "true", "yes", "on")
 
-def get_llm_service() -> LLMInterface:
-    if LLM_PROVIDER == "ollama":
-        return OllamaLLMService()
-    elif LLM_PROVIDER == "openai":
-        return OpenAILLMService()
+def get_llm_service(provider: Optional[str] = None) -> LLMInterface:
+    # プロバイダ実装をレート制限付きで返す（リミッタはプロバイダごとにプロセスで共有）
+    # LLM_CACHE_ENABLEDの場合はさらに結果キャッシュでラップし、キャッシュヒット時はレート枠も消費しない
+    provider = (provider or LLM_PROVIDER).lower()
+    if provider == "ollama":
+        from .ollama_llm_service import OllamaLLMService
+        llm = OllamaLLMService()
+    elif provider == "openai":
+        from .openai_llm_service import OpenAILLMService
+        llm = OpenAILLMService()
     else:
-        raise ValueError(f"Invalid LLM provider: {LLM_PROVIDER}")
+        raise ValueError(f"Invalid LLM provider: {provider}")
+    llm = RateLimitedLLMService(llm, get_rate_limiter(provider))
+    if LLM_CACHE_ENABLED:
+        llm = CachedLLMService(llm)
+    return llm
 
-_llm = get_llm_service()
+_llm: Optional[LLMInterface] = None
+_llm_lock = threading.Lock()
+
+def _default_llm() -> LLMInterface:
+    # 既定プロバイダのサービスは初回呼び出し時に作る（import時にAPIキー未設定でも失敗しない）
+    global _llm
+    with _llm_lock:
+        if _llm is None:
+            _llm = get_llm_service()
+        return _llm
 
 def generate_summary_and_labels(article_text: str) -> Tuple[str, list]:
-    return _llm.generate_summary_and_labels(article_text)
+    return _default_llm().generate_summary_and_labels(article_text)
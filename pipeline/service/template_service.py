@@ -1,37 +1,64 @@
-from jinja2 import Environment, FileSystemLoader
-import os
-from datetime import datetime
-
-TEMPLATE_DIR = os.path.join(os.path.dirname(__file__), "../templates")
-TEMPLATE_FILE = "monthly_topics.html"
-
-def generate_monthly_topics_html(topics_data: dict) -> str:
-    """
-    topics_data例:
-    {
-        "topics_title": "2025年5月 半導体TOPICS",
-        "topics_month": "2025-05",
-        "created_at": "2025-05-01",
-        "monthly_summary": "今月のまとめテキスト",
-        "articles": [
-            {
-                "title": "記事タイトル",
-                "url": "https://...",
-                "source": "出典",
-                "published": "2025-05-01",
-                "summary": "要約テキスト",
-                "labels": ["ラベル1", "ラベル2"],
-                "category_main": "技術",
-                "category_sub": ["新製品", "製造技術"]
-            },
-            ...
-        ]
-    }
-    """
-    env = Environment(
-        loader=FileSystemLoader(TEMPLATE_DIR, encoding="utf-8"),
-        autoescape=True
-    )
-    template = env.get_template(TEMPLATE_FILE)
-    html = template.render(**topics_data)
+from jinja2 import Environment, FileSystemLoader, Template
+import hashlib
+import os
+import threading
+from datetime import datetime
+from typing import Optional
+
+TEMPLATE_DIR = os.path.join(os.path.dirname(__file__), "../templates")
+TEMPLATE_FILE = "monthly_topics.html"
+# テンプレートファイルの変更を検知して再コンパイルするか（開発時向け。既定は起動時に1回だけコンパイル）
+TEMPLATE_AUTO_RELOAD = os.environ.get("TEMPLATE_AUTO_RELOAD", "false").lower() in ("1", "true", "yes", "on")
+
+# プロセスで共有するJinja環境（コンパイル済みテンプレートを保持する）
+_env = Environment(
+    loader=FileSystemLoader(TEMPLATE_DIR, encoding="utf-8"),
+    autoescape=True,
+    auto_reload=TEMPLATE_AUTO_RELOAD
+)
+_template: Optional[Template] = None
+_template_version: Optional[str] = None
+_template_lock = threading.Lock()
+
+def get_monthly_topics_template() -> Template:
+    """
+    コンパイル済みの月次TOPICSテンプレートを返す（初回のみ読み込み・コンパイル）
+    """
+    global _template, _template_version
+    with _template_lock:
+        if _template is None or (TEMPLATE_AUTO_RELOAD and not _template.is_up_to_date):
+            source, _, _ = _env.loader.get_source(_env, TEMPLATE_FILE)
+            _template = _env.get_template(TEMPLATE_FILE)
+            _template_version = hashlib.sha256(source.encode("utf-8")).hexdigest()[:16]
+        return _template
+
+def template_version() -> str:
+    # テンプレート本文のハッシュ（出力キャッシュのキーに含め、テンプレート変更時に作り直させる）
+    get_monthly_topics_template()
+    return _template_version
+
+def generate_monthly_topics_html(topics_data: dict) -> str:
+    """
+    topics_data例:
+    {
+        "topics_title": "2025年5月 半導体TOPICS",
+        "topics_month": "2025-05",
+        "created_at": "2025-05-01",
+        "monthly_summary": "今月のまとめテキスト",
+        "articles": [
+            {
+                "title": "記事タイトル",
+                "url": "https://...",
+                "source": "出典",
+                "published": "2025-05-01",
+                "summary": "要約テキスト",
+                "labels": ["ラベル1", "ラベル2"],
+                "category_main": "技術",
+                "category_sub": ["新製品", "製造技術"]
+            },
+            ...
+        ]
+    }
+    """
+    html = get_monthly_topics_template().render(**topics_data)
     return html
\ No newline at end of file
@@ -0,0 +1,130 @@
+# 記事ページのサムネイル（OGP / Twitterカード画像）取得
+#
+# サムネイルは<head>内の<meta>にしかないため、本文全体は取得・パースしない。
+# レスポンスをストリームで読み、</head>（または<body>）に達するか THUMBNAIL_MAX_BYTES を読んだ時点で打ち切る。
+# <meta>の走査は標準ライブラリのHTMLParserで逐次行い、BeautifulSoupのツリーは作らない。
+
+import asyncio
+import codecs
+import os
+from html.parser import HTMLParser
+from typing import List, Optional
+from urllib.parse import urljoin
+
+from service.http_fetcher import AsyncFetcher
+from service.page_cache import page_cache
+
+# 1ページから読む最大バイト数（展開後）。<head>が巨大なページでもここで打ち切る
+THUMBNAIL_MAX_BYTES = int(os.environ.get("THUMBNAIL_MAX_BYTES", 256 * 1024))
+# 同時に取得するページ数（ホスト単位の上限は CRAWL_PER_HOST_CONCURRENCY）
+THUMBNAIL_CONCURRENCY = int(os.environ.get("THUMBNAIL_CONCURRENCY", 16))
+
+# 優先順（先頭ほど優先。og:imageが見つかればその時点で打ち切る）
+IMAGE_META_KEYS = ("og:image", "og:image:url", "og:image:secure_url", "twitter:image", "twitter:image:src")
+
+
+class HeadImageScanner(HTMLParser):
+    """
+    HTMLを断片ごとに feed() し、<head>内のOGP / Twitterカード画像URLを探す
+
+    done が True になったら以降の断片は読まなくてよい。image に最も優先度の高い画像URLが入る
+    """
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.done = False
+        self._found = {}
+
+    def handle_starttag(self, tag, attrs):
+        if self.done:
+            return
+        if tag == "body":
+            self.done = True
+            return
+        if tag != "meta":
+            return
+        attrs = dict(attrs)
+        key = (attrs.get("property") or attrs.get("name") or "").strip().lower()
+        content = (attrs.get("content") or "").strip()
+        if key in IMAGE_META_KEYS and content and key not in self._found:
+            self._found[key] = content
+            if key == IMAGE_META_KEYS[0]:
+                self.done = True
+
+    def handle_endtag(self, tag):
+        if tag == "head":
+            self.done = True
+
+    @property
+    def image(self) -> str:
+        for key in IMAGE_META_KEYS:
+            if key in self._found:
+                return self._found[key]
+        return ""
+
+
+def scan_head_image(chunks, max_bytes: int = THUMBNAIL_MAX_BYTES) -> str:
+    # 文字列の断片を順に走査する（取得済みHTMLや、テストでの逐次入力用）
+    scanner = HeadImageScanner()
+    read = 0
+    for chunk in chunks:
+        scanner.feed(chunk)
+        read += len(chunk)
+        if scanner.done or read >= max_bytes:
+            break
+    return scanner.image
+
+
+def _decoder(encoding: Optional[str]):
+    # 画像URLはASCIIのため、宣言がない・不正なページはUTF-8として読めば足りる
+    try:
+        return codecs.getincrementaldecoder(encoding or "utf-8")(errors="replace")
+    except LookupError:
+        return codecs.getincrementaldecoder("utf-8")(errors="replace")
+
+
+async def fetch_thumbnail_async(fetcher: AsyncFetcher, url: str, max_bytes: int = THUMBNAIL_MAX_BYTES) -> str:
+    """
+    ページの<head>だけを読み、サムネイル画像URLを返す（画像がなければ空文字）
+
+    同じ実行内で本文ごと取得済みのページ（page_cache）があればそれを使う。
+    :raises httpx.HTTPError: 取得に失敗した場合
+    """
+    cached = page_cache.get(url)
+    if cached is not None and cached.thumbnail_url:
+        return cached.thumbnail_url
+    scanner = HeadImageScanner()
+    async with fetcher.stream(url) as resp:
+        resp.raise_for_status()
+        decoder = _decoder(resp.charset_encoding)
+        read = 0
+        async for chunk in resp.aiter_bytes():
+            scanner.feed(decoder.decode(chunk))
+            read += len(chunk)
+            if scanner.done or read >= max_bytes:
+                # 残りの本文は受信せずに接続を閉じる
+                break
+        base_url = str(resp.url)
+    image = scanner.image
+    return urljoin(base_url, image) if image else ""
+
+
+async def fetch_thumbnails_async(urls: List[str], concurrency: Optional[int] = None) -> List[Optional[str]]:
+    """
+    複数ページのサムネイルを並行に取得する（入力順。取得に失敗したページはNone）
+    """
+    async with AsyncFetcher(max_concurrency=concurrency or THUMBNAIL_CONCURRENCY) as fetcher:
+        async def fetch(url: str) -> Optional[str]:
+            try:
+                return await fetch_thumbnail_async(fetcher, url)
+            except Exception as e:
+                print(f"[ERROR] fetch_thumbnail({url}): {e}")
+                return None
+        return list(await asyncio.gather(*(fetch(url) for url in urls)))
+
+
+def fetch_thumbnails(urls: List[str], concurrency: Optional[int] = None) -> List[Optional[str]]:
+    # fetch_thumbnails_asyncの同期ラッパー（イベントループ外から利用する）
+    if not urls:
+        return []
+    return asyncio.run(fetch_thumbnails_async(urls, concurrency))
@@ -0,0 +1,28 @@
+# LLM入力のトークン数見積もり
+# 厳密なトークナイザは使わず、レート制限・チャンク分割の目安として用いる
+
+def estimate_tokens(text: str) -> int:
+    """
+    テキストのおおよそのトークン数を返す
+
+    日本語など非ASCII文字は1文字≒1トークン、ASCII文字は4文字≒1トークンとして数える
+    """
+    if not text:
+        return 0
+    non_ascii = sum(1 for ch in text if ord(ch) > 127)
+    ascii_chars = len(text) - non_ascii
+    return non_ascii + (ascii_chars + 3) // 4
+
+
+def truncate_to_tokens(text: str, max_tokens: int) -> str:
+    """
+    見積もりトークン数がmax_tokens以下になるよう末尾を切り詰める
+    """
+    if estimate_tokens(text) <= max_tokens:
+        return text
+    cost = 0.0
+    for i, ch in enumerate(text):
+        cost += 1.0 if ord(ch) > 127 else 0.25
+        if cost > max_tokens:
+            return text[:i]
+    return text
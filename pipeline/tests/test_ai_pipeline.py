@@ -34,4 +34,19 @@ def test_generate_summary_and_labels_with_fallback():
     with patch.object(service, 'llm', side_effect=Exception("LLM Error")):
         summary, labels = service.generate_summary_and_labels("テスト本文")
         assert summary == "テスト本文"[:200] + "..."
-        assert labels == []
\ No newline at end of file
+        assert labels == []
+
+def test_generate_summary_and_labels_structured_with_chain_fallback(monkeypatch):
+    monkeypatch.setenv("OPENAI_API_KEY", "dummy")
+    service = OpenAILLMService(summary_mode="structured")
+
+    # 1リクエストのJSON応答から要約とタグを取り出す
+    with patch.object(service, "chain_structured", return_value={"result": '{"summary": "要約", "labels": ["AI", "半導体"]}'}), \
+            patch.object(service, "chain_sequential") as mock_chain:
+        assert service.generate_summary_and_labels("テスト本文") == ("要約", ["AI", "半導体"])
+        mock_chain.assert_not_called()
+
+    # JSONが不正な場合は2段階チェーンにフォールバック
+    with patch.object(service, "chain_structured", return_value={"result": "not json"}), \
+            patch.object(service, "chain_sequential", return_value={"article_summary": "要約2", "article_tags": "A, B"}):
+        assert service.generate_summary_and_labels("テスト本文") == ("要約2", ["A", "B"])
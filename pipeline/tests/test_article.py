@@ -0,0 +1,12 @@
+from entity.article import Article, normalize_url
+
+def test_normalize_url():
+    assert normalize_url(" HTTPS://News.Example.JP/Path/To/ ") == "https://news.example.jp/Path/To"
+    assert normalize_url("https://example.com/a?id=1#comments") == "https://example.com/a?id=1"
+    assert normalize_url("https://EXAMPLE.com?x=1") == "https://example.com?x=1"
+    assert normalize_url("https://example.com/") == "https://example.com"
+
+def test_article_url_key():
+    a = Article(title="t", url="https://Example.com/a/", source="s", published=None)
+    b = Article(title="t2", url="https://example.com/a#top", source="s2", published=None)
+    assert a.url_key == b.url_key
@@ -0,0 +1,57 @@
+import asyncio
+from datetime import date, datetime
+from unittest.mock import patch
+from entity.article import Article
+from service.batch_writer import AsyncBatchWriter
+from usecase import crawl_articles as usecase
+
+def test_batch_writer_flushes_by_size_and_on_exit():
+    written = []
+
+    async def main():
+        async with AsyncBatchWriter(lambda batch: written.append(list(batch)) or len(batch), 2, 0) as writer:
+            for i in range(5):
+                await writer.add(i)
+            # 2件ごとに書き込まれ、端数はまだバッファにある
+            assert written == [[0, 1], [2, 3]]
+        return writer.results
+
+    assert asyncio.run(main()) == [2, 2, 1]
+    assert written == [[0, 1], [2, 3], [4]]
+
+def test_batch_writer_flushes_by_interval():
+    written = []
+
+    async def main():
+        async with AsyncBatchWriter(written.append, 100, 0.05) as writer:
+            await writer.add("a")
+            await asyncio.sleep(1.2)
+            assert written == [["a"]]
+
+    asyncio.run(main())
+
+def test_crawl_saves_articles_while_crawling():
+    saved_batches = []
+
+    async def fake_iter(*args, **kwargs):
+        for i in range(5):
+            # 先に取得した記事は後続の取得中にすでに保存されている
+            assert sum(len(b) for b in saved_batches) == (i // 2) * 2
+            yield Article(title=f"t{i}", url=f"https://example.com/{i}", source="S", published=datetime(2025, 5, 1))
+
+    def fake_save(batch):
+        saved_batches.append(batch)
+        return {"inserted": len(batch), "skipped": 0, "ids": [int(a.url.rsplit("/", 1)[1]) for a in batch]}
+
+    with patch.object(usecase.rss, "iter_rss_articles", fake_iter), \
+            patch.object(usecase.db, "get_feed_states", return_value={}), \
+            patch.object(usecase.db, "save_feed_states") as mock_save_states, \
+            patch.object(usecase.db, "save_articles", side_effect=fake_save), \
+            patch.object(usecase, "cluster_near_duplicates", side_effect=lambda ids: len(ids) // 2), \
+            patch.object(usecase, "CRAWL_WRITE_BATCH", 2):
+        result = usecase.crawl_articles(date(2025, 5, 1), date(2025, 5, 1))
+    assert [len(b) for b in saved_batches] == [2, 2, 1]
+    assert result["fetched"] == 5 and result["inserted"] == 5
+    assert result["near_duplicates"] == 2
+    assert all(a.simhash is not None for batch in saved_batches for a in batch)
+    mock_save_states.assert_called_once()
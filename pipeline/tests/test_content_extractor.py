@@ -0,0 +1,32 @@
+import os
+from service import content_extractor
+from service.content_extractor import parse_article_page
+
+FIXTURE = os.path.join(os.path.dirname(__file__), "fixtures", "sample_news.html")
+
+def _fixture() -> bytes:
+    with open(FIXTURE, "rb") as f:
+        return f.read()
+
+def test_density_extractor_skips_menus_and_sidebars():
+    page = parse_article_page(_fixture(), "https://example.com/a", extractor="density")
+    assert "国内出荷額は前年同月比で10％増加" in page.content
+    assert "カテゴリ1" not in page.content
+    assert "ランキング記事" not in page.content
+    assert "Copyright" not in page.content
+    assert page.thumbnail_url == "https://example.com/img/sample.jpg"
+    assert page.title == "半導体製造装置の出荷額、12カ月連続で増加"
+    # 従来方式はページ全体のテキストを返す
+    legacy = parse_article_page(_fixture(), "https://example.com/a", extractor="bs4")
+    assert "カテゴリ1" in legacy.content and len(legacy.content) > len(page.content)
+
+def test_density_extractor_decodes_declared_charset():
+    html = ('<html><head><meta charset="shift_jis"><title>題名</title></head><body>'
+            '<div><p>' + "本文の文章です。" * 20 + '</p></div></body></html>').encode("shift_jis")
+    page = parse_article_page(html, extractor="density")
+    assert page.title == "題名"
+    assert page.content.startswith("本文の文章です。")
+
+def test_density_extractor_falls_back_to_bs4_without_content():
+    assert content_extractor.parse_with_density(b"") is None
+    assert parse_article_page(b"", extractor="density").content == ""
@@ -0,0 +1,46 @@
+import pytest
+from unittest.mock import patch
+from usecase import drain_backlog as usecase
+
+def _claims(batches):
+    # claim_article_backlogの戻り値を順に返す（最後は候補なし）
+    responses = [(rows, rows[-1]["id"] if rows else last_id) for rows, last_id in batches] + [([], None)]
+    return patch.object(usecase, "claim_article_backlog", side_effect=responses)
+
+def test_drain_backlog_walks_keyset_until_empty():
+    processed = []
+    progress = []
+
+    def process(rows, report):
+        processed.append([row["id"] for row in rows])
+        report(len(rows), len(rows))
+        return {"updated": len(rows) - 1, "errors": 1}
+
+    batches = [([{"id": 1}, {"id": 2}], None), ([], 5), ([{"id": 7}], None)]
+    with _claims(batches) as mock_claim, \
+            patch.object(usecase, "count_article_backlog", return_value=3), \
+            patch.object(usecase, "release_article_leases") as mock_release:
+        result = usecase.drain_backlog("summarize", process, batch_size=2, on_progress=lambda d, t: progress.append((d, t)))
+    assert processed == [[1, 2], [7]]
+    # 候補がすべて他プロセスに確保済みでも走査位置は進める
+    assert [c.args[2] for c in mock_claim.call_args_list] == [0, 2, 5, 7]
+    assert [c.args[2] for c in mock_release.call_args_list] == [[1, 2], [7]]
+    assert progress == [(2, 3), (3, 3)]
+    assert result["updated"] == 1 and result["errors"] == 2
+    assert result["batches"] == 2 and result["processed"] == 3 and result["stopped"] == "empty"
+
+def test_drain_backlog_stops_on_time_budget_and_releases_on_error():
+    def process(rows, report):
+        raise RuntimeError("boom")
+
+    with _claims([([{"id": 1}], None)]), \
+            patch.object(usecase, "release_article_leases") as mock_release:
+        with pytest.raises(RuntimeError):
+            usecase.drain_backlog("tag", process)
+    mock_release.assert_called_once()
+
+    with patch.object(usecase, "claim_article_backlog") as mock_claim, \
+            patch.object(usecase.time, "monotonic", side_effect=[0.0, 100.0, 100.0]):
+        result = usecase.drain_backlog("thumbnails", lambda rows, report: {}, time_budget_sec=10)
+    mock_claim.assert_not_called()
+    assert result["stopped"] == "time_budget"
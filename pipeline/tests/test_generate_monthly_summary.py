@@ -0,0 +1,17 @@
+from unittest.mock import patch
+from entity.scraped_page import ScrapedPage
+from usecase import generate_monthly_summary as usecase
+
+ARTICLES = [
+    {"id": 1, "title": "A", "source": "S", "url": "https://example.com/1", "summary": "要約A", "content": "本文A"},
+    {"id": 2, "title": "B", "source": "S", "url": "https://example.com/2", "summary": "", "content": "本文B"},
+    {"id": 3, "title": "C", "source": "S", "url": "https://example.com/3", "summary": "", "content": ""},
+]
+
+def test_select_article_texts_prefers_stored_and_fetches_only_missing():
+    with patch.object(usecase, "scrape_articles", return_value=[ScrapedPage(url="https://example.com/3", content="本文C")]) as mock_scrape, \
+            patch.object(usecase, "update_article_contents") as mock_update:
+        texts = usecase.select_article_texts(ARTICLES)
+    mock_scrape.assert_called_once_with(["https://example.com/3"])
+    mock_update.assert_called_once_with([(3, "本文C")])
+    assert texts == ["A（S）\n要約A", "B（S）\n本文B", "C（S）\n本文C"]
@@ -0,0 +1,91 @@
+import pytest
+from unittest.mock import patch
+from interface import worker
+from usecase import jobs
+from usecase.jobs import JobCancelled, JobContext
+
+def _job(job_type="summarize", params=None):
+    return {"id": 1, "type": job_type, "params": params or {}, "attempts": 1}
+
+@pytest.fixture(autouse=True)
+def job_events():
+    # job_eventsへの書き込みを記録する（DBには接続しない）
+    written = []
+    with patch.object(worker, "insert_job_events", side_effect=lambda job_id, events: written.extend(events)):
+        yield written
+
+def test_run_job_completes_with_handler_result(job_events):
+    def handler(ctx):
+        ctx.emit({"event": "summarized", "id": 10})
+        return {"updated": 3}
+    with patch.dict(worker.JOB_HANDLERS, {"summarize": handler}), \
+            patch.object(worker, "complete_job") as mock_complete, \
+            patch.object(worker, "heartbeat_job", return_value=False):
+        status = worker.run_job(_job(), "w1")
+    assert status == "success"
+    mock_complete.assert_called_once_with(1, "w1", {"updated": 3})
+    assert [e["event"] for e in job_events] == ["job_started", "summarized", "job_finished"]
+    assert job_events[-1]["outcome"] == "success"
+
+def test_run_job_marks_cancelled_when_progress_sees_cancel():
+    def handler(ctx):
+        ctx.cancel()
+        ctx.report(1, 10)
+        return {}
+    with patch.dict(worker.JOB_HANDLERS, {"summarize": handler}), \
+            patch.object(worker, "mark_job_cancelled") as mock_cancelled, \
+            patch.object(worker, "complete_job") as mock_complete:
+        status = worker.run_job(_job(), "w1")
+    assert status == "cancelled"
+    mock_cancelled.assert_called_once_with(1, "w1")
+    mock_complete.assert_not_called()
+
+def test_run_job_failure_is_handed_to_retry():
+    def handler(ctx):
+        raise RuntimeError("boom")
+    with patch.dict(worker.JOB_HANDLERS, {"summarize": handler}), \
+            patch.object(worker, "fail_job", return_value="pending") as mock_fail:
+        status = worker.run_job(_job(), "w1")
+    assert status == "pending"
+    assert mock_fail.call_args[0][:3] == (1, "w1", "boom")
+
+def test_job_context_progress_is_capped_below_100():
+    ctx = JobContext(1)
+    ctx.report(10, 10)
+    assert ctx.progress == 99
+    ctx.cancel()
+    with pytest.raises(JobCancelled):
+        ctx.report(10, 10)
+
+def test_enqueue_job_validates_type_and_params():
+    with patch.object(jobs, "insert_job", return_value=7) as mock_insert:
+        assert jobs.enqueue_job("crawl", {"start_date": "2024-05-01"}) == 7
+        with pytest.raises(ValueError):
+            jobs.enqueue_job("unknown")
+        with pytest.raises(ValueError):
+            jobs.enqueue_job("monthly_summary", {})
+    mock_insert.assert_called_once_with("crawl", status="pending", params={"start_date": "2024-05-01"}, max_attempts=3)
+
+def test_crawl_job_stops_when_cancelled():
+    from usecase import crawl_articles as crawl
+
+    async def fake_iter(*args, **kwargs):
+        yield object()
+
+    ctx = JobContext(1, {"start_date": "2025-05-01"})
+    ctx.cancel()
+    with patch.object(crawl.rss, "iter_rss_articles", fake_iter), \
+            patch.object(crawl.db, "get_feed_states", return_value={}), \
+            patch.object(crawl.db, "save_articles") as mock_save, \
+            patch.object(crawl.db, "save_feed_states") as mock_save_states:
+        with pytest.raises(JobCancelled):
+            jobs._run_crawl(ctx)
+    # 中断したクロールはフィードのバリデータを更新しない（次回取り直す）
+    mock_save.assert_not_called()
+    mock_save_states.assert_not_called()
+
+def test_monthly_summary_job_passes_cancellation_check():
+    ctx = JobContext(1, {"topics_id": 3})
+    with patch("usecase.generate_monthly_summary.generate_monthly_summary", return_value="まとめ") as mock_generate:
+        assert jobs._run_monthly_summary(ctx)["monthly_summary"] == "まとめ"
+    assert mock_generate.call_args.kwargs["check_cancelled"] == ctx.raise_if_cancelled
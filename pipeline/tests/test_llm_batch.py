@@ -0,0 +1,35 @@
+import json
+from service.llm_batch import find_json_end, pack_batches, parse_summary_batch_response, run_summary_batches
+
+def test_pack_batches_respects_budget_and_max_items():
+    texts = ["あ" * 100, "い" * 100, "う" * 300, "え" * 10, "お" * 10, "か" * 10]
+    assert pack_batches(texts, token_budget=250, max_items=2) == [[0, 1], [2], [3, 4], [5]]
+
+def test_parse_summary_batch_response_handles_fences_and_missing_items():
+    content = "```json\n" + json.dumps([
+        {"id": 2, "summary": "要約2", "labels": ["A", "B"]},
+        {"id": 1, "summary": "", "labels": []},
+    ], ensure_ascii=False) + "\n```"
+    assert parse_summary_batch_response(content, 2) == [None, ("要約2", ["A", "B"])]
+
+def test_run_summary_batches_splits_malformed_batches():
+    prompts = []
+
+    def complete(prompt):
+        prompts.append(prompt)
+        # 「壊れ」を含むバッチは不正な応答を返す
+        if "壊れ" in prompt:
+            return "not json"
+        n = prompt.count("[記事")
+        return json.dumps([{"id": i, "summary": f"s{i}", "labels": ["x"]} for i in range(1, n + 1)])
+
+    texts = ["a", "b", "壊れ", "d"]
+    results = run_summary_batches(texts, complete, lambda text: ("single:" + text, []), max_items=4)
+    # [a, b, 壊れ, d] → 失敗 → [a, b] 成功 / [壊れ, d] 失敗 → 1件ずつ単発呼び出し
+    assert results == [("s1", ["x"]), ("s2", ["x"]), ("single:壊れ", []), ("single:d", [])]
+    assert len(prompts) == 3
+
+def test_find_json_end_ignores_brackets_inside_strings():
+    text = '結果: {"summary": "a}b", "labels": ["x]"]} 以上'
+    assert text[:find_json_end(text)].endswith('["x]"]}')
+    assert find_json_end('{"summary": "途中') == -1
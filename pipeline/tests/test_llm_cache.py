@@ -0,0 +1,25 @@
+from service.dummy_llm_service import DummyLLMService
+from service.llm_cache import CachedLLMService, MemoryLLMCacheStore, make_cache_key
+
+class CountingLLM(DummyLLMService):
+    def __init__(self):
+        self.calls = 0
+
+    def generate_summary_and_labels(self, article_text):
+        self.calls += 1
+        return super().generate_summary_and_labels(article_text)
+
+def test_cache_key_depends_on_text_prompt_version_and_model():
+    base = make_cache_key("summary_and_labels", "本文　テスト", "1", "m")
+    assert base == make_cache_key("summary_and_labels", " 本文 テスト\n", "1", "m")
+    assert base != make_cache_key("summary_and_labels", "本文 テスト", "2", "m")
+    assert base != make_cache_key("summary_and_labels", "本文 テスト", "1", "other")
+
+def test_cached_llm_service_reuses_results():
+    inner = CountingLLM()
+    llm = CachedLLMService(inner, store=MemoryLLMCacheStore())
+    first = llm.generate_summary_and_labels("同じ記事")
+    second = llm.generate_summary_and_labels("同じ記事")
+    assert first == second
+    assert inner.calls == 1
+    assert llm.generate_monthly_summary(["a", "b"]) == llm.generate_monthly_summary(["a", "b"])
@@ -0,0 +1,75 @@
+import os
+from unittest.mock import patch
+from repository import migrations as migrations_module
+from repository.migrations import (
+    acquire_migration_lock, concurrent_index_name, drop_invalid_index, load_migrations, split_statements, MIGRATIONS_DIR
+)
+from repository.query_plans import percentile, plan_scans, has_seq_scan
+
+def test_repository_migrations_are_ordered_and_flagged():
+    migrations = load_migrations()
+    assert [m.version for m in migrations] == sorted(m.version for m in migrations)
+    by_name = {m.name: m for m in migrations}
+    assert by_name["pipeline_schema"].transactional
+    # CONCURRENTLYを含むファイルはトランザクション外で実行する
+    assert not by_name["hot_query_indexes"].transactional
+    for statement in split_statements(by_name["hot_query_indexes"].sql):
+        assert statement.startswith("CREATE INDEX CONCURRENTLY IF NOT EXISTS")
+
+def test_load_migrations_ignores_other_files(tmp_path):
+    (tmp_path / "0002_b.sql").write_text("SELECT 2;")
+    (tmp_path / "0001_a.sql").write_text("SELECT 1;")
+    (tmp_path / "README.md").write_text("x")
+    assert [(m.version, m.name) for m in load_migrations(str(tmp_path))] == [(1, "a"), (2, "b")]
+
+def test_plan_scans_detects_seq_scan_on_articles():
+    plan = {"Node Type": "Limit", "Plans": [
+        {"Node Type": "Index Scan", "Relation Name": "articles", "Index Name": "idx_articles_summary_backlog"}
+    ]}
+    scans = plan_scans(plan)
+    assert scans == ["Index Scan:articles(idx_articles_summary_backlog)"]
+    assert not has_seq_scan(scans)
+    assert has_seq_scan(plan_scans({"Node Type": "Seq Scan", "Relation Name": "articles"}))
+
+def test_search_doc_migrations_and_bench_percentile():
+    by_name = {m.name: m for m in load_migrations()}
+    # 関数・生成列はトランザクション内、索引はCONCURRENTLYで作る（生成列の索引だけを作り、作り直さない）
+    assert by_name["article_search_functions"].transactional
+    assert "search_doc TEXT" in by_name["article_search_functions"].sql
+    assert not by_name["article_search_index"].transactional
+    assert [concurrent_index_name(st) for st in split_statements(by_name["article_search_index"].sql)] == [
+        "idx_articles_search_doc_bigrams", "idx_articles_published_id"
+    ]
+    timings = [float(ms) for ms in range(1, 21)]
+    assert percentile(timings, 50) == 10.0 and percentile(timings, 95) == 19.0 and percentile([3.0], 95) == 3.0
+
+class _FakeConn:
+    # 実行したSQLを記録し、問い合わせごとに用意した行を返す
+    def __init__(self, rows):
+        self.rows = list(rows)
+        self.executed = []
+
+    def execute(self, query, params=None):
+        self.executed.append((query if isinstance(query, str) else repr(query), params))
+        return self
+
+    def fetchone(self):
+        return self.rows.pop(0)
+
+def test_migration_lock_is_polled_without_blocking():
+    conn = _FakeConn([{"locked": False}, {"locked": False}, {"locked": True}])
+    with patch.object(migrations_module.time, "sleep") as sleep:
+        acquire_migration_lock(conn, poll_sec=0.5, timeout_sec=60)
+    assert all("pg_try_advisory_lock" in query for query, _ in conn.executed)
+    assert len(conn.executed) == 3 and sleep.call_count == 2
+
+def test_invalid_index_from_interrupted_build_is_dropped():
+    statement = "CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_articles_search_doc_bigrams\n  ON articles USING gin (x);"
+    assert concurrent_index_name(statement) == "idx_articles_search_doc_bigrams"
+    assert concurrent_index_name("ALTER TABLE articles ADD COLUMN x INT;") is None
+    conn = _FakeConn([{"indisvalid": False}])
+    assert drop_invalid_index(conn, statement)
+    assert "DROP INDEX CONCURRENTLY" in conn.executed[-1][0] and "idx_articles_search_doc_bigrams" in conn.executed[-1][0]
+    # 有効なインデックス・未作成のインデックスはそのまま（IF NOT EXISTSに任せる）
+    assert not drop_invalid_index(_FakeConn([{"indisvalid": True}]), statement)
+    assert not drop_invalid_index(_FakeConn([None]), statement)
@@ -0,0 +1,73 @@
+import pytest
+from service.dummy_llm_service import DummyLLMService
+from service.monthly_summarizer import chunk_articles, summarize_monthly
+
+class RecordingLLM(DummyLLMService):
+    def __init__(self):
+        self.chunk_calls = []
+        self.final_calls = []
+
+    def generate_chunk_summary(self, articles):
+        self.chunk_calls.append(list(articles))
+        return "要点" * 10
+
+    def generate_monthly_summary(self, articles):
+        self.final_calls.append(list(articles))
+        return "まとめ"
+
+def test_chunk_articles_respects_budget():
+    texts = [f"記事{i}" + "あ" * 95 for i in range(20)]
+    chunks = chunk_articles(texts, token_budget=300)
+    assert [t for chunk in chunks for t in chunk] == texts
+    assert all(sum(len(t) for t in chunk) <= 300 for chunk in chunks)
+
+def test_chunk_articles_keeps_unchanged_chunks_stable():
+    texts = [f"記事{i}" + "あ" * 95 for i in range(40)]
+    before = chunk_articles(texts, token_budget=500)
+    changed = list(texts)
+    changed[5] = changed[5] + "追記" * 10
+    after = chunk_articles(changed, token_budget=500)
+    # 変更した記事の近傍以外のチャンクは同じ（キャッシュを再利用できる）
+    assert sum(1 for chunk in before if chunk in after) >= len(before) - 2
+
+def test_summarize_monthly_single_call_when_within_budget():
+    llm = RecordingLLM()
+    assert summarize_monthly(llm, ["a", "b"], token_budget=100) == "まとめ"
+    assert llm.chunk_calls == [] and llm.final_calls == [["a", "b"]]
+
+def test_summarize_monthly_map_reduce_for_large_input():
+    llm = RecordingLLM()
+    texts = ["あ" * 90 for _ in range(10)]
+    assert summarize_monthly(llm, texts, token_budget=300, concurrency=2) == "まとめ"
+    assert sum(len(c) for c in llm.chunk_calls) == 10
+    assert len(llm.final_calls) == 1 and len(llm.final_calls[0]) == len(llm.chunk_calls)
+
+def test_summarize_monthly_stops_between_map_steps_when_cancelled():
+    llm = RecordingLLM()
+    calls = []
+
+    def check_cancelled():
+        calls.append(1)
+        if len(calls) > 2:
+            raise RuntimeError("cancelled")
+
+    texts = ["あ" * 90 for _ in range(10)]
+    with pytest.raises(RuntimeError):
+        summarize_monthly(llm, texts, token_budget=300, concurrency=1, check_cancelled=check_cancelled)
+    assert len(llm.chunk_calls) == 2 and llm.final_calls == []
+
+def test_summarize_monthly_keeps_every_partial_at_depth_limit():
+    class NonShrinkingLLM(RecordingLLM):
+        def generate_chunk_summary(self, articles):
+            self.chunk_calls.append(list(articles))
+            return "要" * 60
+
+    llm = NonShrinkingLLM()
+    texts = [f"{i}" + "あ" * 59 for i in range(6)]
+    assert summarize_monthly(llm, texts, token_budget=100, concurrency=1) == "まとめ"
+    # 要点が縮まなくても途中の要点を捨てず、6件すべてを予算内に切り詰めて最後に1回だけ集約する
+    assert len(llm.final_calls) == 1 and len(llm.final_calls[0]) == 6
+    assert sum(len(t) for t in llm.final_calls[0]) <= 100
+
+    with pytest.raises(RuntimeError):
+        summarize_monthly(NonShrinkingLLM(), texts, token_budget=3, concurrency=1)
@@ -0,0 +1,38 @@
+from unittest.mock import patch
+from service.near_duplicate import article_fingerprint, bands, find_canonical, hamming_distance
+from usecase import cluster_near_duplicates as usecase
+
+BODY = (
+    "東京エレクトロンは、2025年度の半導体製造装置の売上高見通しを上方修正したと発表した。"
+    "生成AI向けの先端ロジックとHBMの投資が想定を上回り、エッチング装置と成膜装置の受注が伸びた。"
+    "同社は中国向けの比率が下がる一方で、台湾と韓国向けが増えると説明している。"
+)
+
+def test_fingerprint_is_close_for_copies_and_far_for_other_stories():
+    original = article_fingerprint("東京エレクトロン、売上高見通しを上方修正", BODY)
+    # 別フィードでの転載（全角・半角や句読点の表記が異なる）
+    copy = article_fingerprint("東京エレクトロン､売上高見通しを上方修正", BODY.replace("2025", "２０２５").replace("。", "｡ "))
+    other = article_fingerprint("NHK 気象ニュース", "関東地方は週末にかけて晴れて気温が上がる見込みで、熱中症に注意が必要です。")
+    assert hamming_distance(original, copy) <= 3
+    assert hamming_distance(original, other) > 10
+    # 距離3以下ならいずれかのバンドが一致する
+    assert any(a == b for a, b in zip(bands(original), bands(copy)))
+    assert article_fingerprint("", "") is None
+
+def test_find_canonical_follows_existing_cluster():
+    candidates = [{"id": 5, "simhash": 0b1011, "canonical_id": 2}, {"id": 7, "simhash": 0b1, "canonical_id": None}]
+    assert find_canonical(0b1011, candidates) == 2
+    assert find_canonical(-1, candidates) is None
+
+def test_cluster_near_duplicates_links_articles_within_one_batch():
+    rows = [
+        {"article_id": 11, "article_simhash": 100, "id": 10, "simhash": 100, "canonical_id": None},
+        {"article_id": 12, "article_simhash": 101, "id": 11, "simhash": 100, "canonical_id": None},
+    ]
+    with patch.object(usecase, "get_near_duplicate_candidates", return_value=rows), \
+            patch.object(usecase, "mark_near_duplicates", return_value=2) as mock_mark:
+        assert usecase.cluster_near_duplicates([11, 12]) == 2
+    # 12は11の重複だが、11の代表記事10にまとめる
+    assert mock_mark.call_args[0][0] == [(11, 10), (12, 10)]
+    # 本文の削除は明示的に有効にした場合だけ
+    assert mock_mark.call_args[1]["keep_content"] is True
@@ -0,0 +1,30 @@
+import json
+from unittest.mock import MagicMock
+from service import ollama_llm_service
+from service.ollama_llm_service import OllamaLLMService
+
+def _stream_response(contents):
+    resp = MagicMock()
+    resp.iter_lines.return_value = iter(
+        json.dumps({"message": {"content": c}, "done": False}).encode() for c in contents
+    )
+    resp.__enter__.return_value = resp
+    return resp
+
+def test_streaming_chat_stops_when_json_closes():
+    svc = OllamaLLMService(stream=True)
+    svc.session = MagicMock()
+    resp = _stream_response(['{"summary": "要', '約", "labels": ["A"]', '}', " 以上です", "（不要な続き）"])
+    svc.session.post.return_value = resp
+    assert svc.generate_summary_and_labels("本文") == ("要約", ["A"])
+    # 閉じた時点で読むのをやめる（残りのチャンクは消費しない）
+    assert len(list(resp.iter_lines.return_value)) == 2
+    body = svc.session.post.call_args.kwargs["json"]
+    assert body["stream"] is True and body["keep_alive"] == ollama_llm_service.OLLAMA_KEEP_ALIVE
+
+def test_sessions_are_shared_and_options_applied(monkeypatch):
+    monkeypatch.setattr(ollama_llm_service, "OLLAMA_NUM_CTX", 8192)
+    monkeypatch.setattr(ollama_llm_service, "OLLAMA_NUM_PREDICT", 512)
+    a, b = OllamaLLMService(stream=False), OllamaLLMService(stream=False)
+    assert a.session is b.session
+    assert a._request_body("p", False)["options"] == {"num_ctx": 8192, "num_predict": 512}
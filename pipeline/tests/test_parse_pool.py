@@ -0,0 +1,75 @@
+import asyncio
+import multiprocessing
+from datetime import date
+from unittest.mock import patch
+
+from service import parse_pool
+from service.parse_pool import ParseStage
+
+HTML = ('<html><head><meta property="og:image" content="https://example.com/og.jpg"><title>t</title></head>'
+        '<body><article><p>' + "本文の文章です。" * 20 + '</p></article></body></html>').encode("utf-8")
+
+def test_parse_stage_parses_in_worker_processes():
+    async def run():
+        async with ParseStage(workers=2, queue_size=1) as parser:
+            return await asyncio.gather(*(parser.parse(HTML, f"https://example.com/{i}") for i in range(4)))
+
+    pages = asyncio.run(run())
+    assert [page.url for page in pages] == [f"https://example.com/{i}" for i in range(4)]
+    assert all(page.thumbnail_url == "https://example.com/og.jpg" for page in pages)
+    assert all(page.content.startswith("本文の文章です。") for page in pages)
+
+def test_parse_stage_without_workers_parses_inline():
+    async def run():
+        async with ParseStage(workers=0) as parser:
+            return await parser.parse(HTML, "https://example.com/a")
+
+    with patch.object(parse_pool, "get_parse_executor") as get_executor:
+        page = asyncio.run(run())
+    assert page.title == "t"
+    get_executor.assert_not_called()
+
+def test_parse_stage_reuses_one_pool_across_crawls():
+    async def run():
+        async with ParseStage(workers=1) as parser:
+            await parser.parse(HTML, "https://example.com/a")
+        return parse_pool._executor
+
+    first, second = asyncio.run(run()), asyncio.run(run())
+    assert first is not None and first is second
+
+FEED = b"""<?xml version="1.0"?><rss version="2.0"><channel><title>t</title>
+<item><title>A</title><link>https://example.com/a</link><pubDate>Mon, 05 May 2025 10:00:00 +0000</pubDate></item>
+</channel></rss>"""
+
+def _crawl_in_job_worker(results) -> None:
+    # ジョブワーカーと同じデーモンプロセスでクロールする（子プロセスを起動できない）
+    import httpx
+    from service import rss
+    from service.http_fetcher import AsyncFetcher
+
+    def handler(request):
+        return httpx.Response(200, content=FEED if request.url.path == "/feed" else HTML)
+
+    async def _aenter(self):
+        self._client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+        self._global_sem = asyncio.Semaphore(self.max_concurrency)
+        self._host_sems = {}
+        return self
+
+    with patch.object(AsyncFetcher, "__aenter__", _aenter), \
+            patch.object(parse_pool, "CRAWL_PARSE_WORKERS", 2), \
+            patch("service.rss.get_rss_feeds", return_value={"x": [{"name": "X", "url": "https://example.com/feed"}]}):
+        articles = asyncio.run(rss.fetch_rss_articles_async(date(2025, 5, 1), date(2025, 5, 31)))
+    results.put([(article.content, article.thumbnail_url) for article in articles])
+
+def test_crawl_in_daemonic_job_worker_parses_pages():
+    ctx = multiprocessing.get_context("spawn")
+    results = ctx.Queue()
+    proc = ctx.Process(target=_crawl_in_job_worker, args=(results,), daemon=True)
+    proc.start()
+    articles = results.get(timeout=60)
+    proc.join(10)
+    assert len(articles) == 1
+    content, thumbnail = articles[0]
+    assert content.startswith("本文の文章です。") and thumbnail == "https://example.com/og.jpg"
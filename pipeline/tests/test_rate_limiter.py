@@ -0,0 +1,38 @@
+import json
+from service.rate_limiter import RateLimitedLLMService, RateLimiter
+
+class _CountingLimiter(RateLimiter):
+    def __init__(self):
+        super().__init__()
+        self.acquired = []
+
+    def acquire(self, tokens: int = 0) -> float:
+        self.acquired.append(tokens)
+        return 0.0
+
+class _FakeProvider:
+    # まとめたプロンプトと単発呼び出しで送ったリクエストを記録する
+    def __init__(self):
+        self.requests = []
+
+    def complete_batch_prompt(self, prompt):
+        self.requests.append(prompt)
+        if "壊れ" in prompt:
+            return "not json"
+        n = prompt.count("[記事")
+        return json.dumps([{"id": i, "summary": f"s{i}", "labels": []} for i in range(1, n + 1)])
+
+    def generate_summary_and_labels(self, text):
+        self.requests.append(text)
+        return "single:" + text, []
+
+def test_batch_acquires_once_per_request_including_splits():
+    provider, limiter = _FakeProvider(), _CountingLimiter()
+    llm = RateLimitedLLMService(provider, limiter)
+    results = llm.generate_summaries_and_labels(["a", "b", "壊れ", "d"])
+    # [a, b, 壊れ, d] → 失敗 → [a, b] 成功 / [壊れ, d] 失敗 → 壊れ・d を単発で呼び出す
+    assert [summary for summary, _ in results] == ["s1", "s2", "single:壊れ", "single:d"]
+    assert len(provider.requests) == 5
+    assert len(limiter.acquired) == len(provider.requests)
+    # 4件まとめたリクエストの見積もりは2件のものより大きい
+    assert limiter.acquired[0] > limiter.acquired[1]
@@ -0,0 +1,163 @@
+from datetime import date
+from unittest.mock import patch
+from service import rss
+from service.page_cache import page_cache
+
+HTML = """
+<html><head>
+<title>タイトル</title>
+<meta property="og:image" content="https://example.com/og.jpg">
+<meta property="og:site_name" content="Example">
+<meta name="description" content="概要テキスト">
+</head><body><nav>メニュー</nav><article>本文 テスト</article></body></html>
+""".encode("utf-8")
+
+def test_parse_article_page_extracts_body_and_metadata():
+    page = rss.parse_article_page(HTML, "https://example.com/a")
+    assert page.content == "本文 テスト"
+    assert page.thumbnail_url == "https://example.com/og.jpg"
+    assert page.title == "タイトル"
+    assert page.description == "概要テキスト"
+    assert page.site_name == "Example"
+
+def test_scrape_article_fetches_each_url_once():
+    page_cache.clear()
+
+    class _Resp:
+        content = HTML
+        def raise_for_status(self):
+            pass
+
+    with patch("service.rss.httpx.get", return_value=_Resp()) as mock_get:
+        content, thumbnail = rss.scrape_article_content_and_thumbnail("https://example.com/b")
+        assert rss.fetch_article_text("https://example.com/b") == content
+        assert rss.fetch_thumbnail_url("https://example.com/b") == thumbnail
+        assert mock_get.call_count == 1
+    page_cache.clear()
+
+FEED = b"""<?xml version="1.0"?><rss version="2.0"><channel><title>t</title>
+<item><title>A</title><link>https://example.com/a</link><pubDate>Mon, 05 May 2025 10:00:00 +0000</pubDate></item>
+</channel></rss>"""
+
+def _run_crawl(handler, feed_states, stats, start_date=date(2025, 5, 1), end_date=date(2025, 5, 31), **kwargs):
+    import asyncio
+    import httpx
+    from service.http_fetcher import AsyncFetcher
+
+    async def _aenter(self):
+        self._client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+        self._global_sem = asyncio.Semaphore(self.max_concurrency)
+        self._host_sems = {}
+        return self
+
+    with patch.object(AsyncFetcher, "__aenter__", _aenter), \
+            patch("service.rss.get_rss_feeds", return_value={"x": [{"name": "X", "url": "https://example.com/feed"}]}):
+        return asyncio.run(rss.fetch_rss_articles_async(
+            start_date, end_date, feed_states=feed_states, stats=stats, **kwargs
+        ))
+
+def test_fetch_rss_articles_skips_not_modified_and_unchanged_feeds():
+    import httpx
+    page_cache.clear()
+    seen_headers = []
+
+    def handler(request):
+        if request.url.path == "/feed":
+            seen_headers.append(request.headers.get("If-None-Match"))
+            if request.headers.get("If-None-Match") == '"v1"' and len(seen_headers) == 2:
+                return httpx.Response(304)
+            return httpx.Response(200, content=FEED, headers={"ETag": '"v1"'})
+        return httpx.Response(200, content=HTML)
+
+    feed_states, stats = {}, {}
+    assert len(_run_crawl(handler, feed_states, stats)) == 1
+    assert feed_states["https://example.com/feed"].etag == '"v1"'
+
+    # 2回目: 304 Not Modified
+    stats = {}
+    assert _run_crawl(handler, feed_states, stats) == []
+    assert stats["feeds_not_modified"] == 1
+
+    # 3回目: 200だが本文ハッシュが同じ
+    stats = {}
+    assert _run_crawl(handler, feed_states, stats) == []
+    assert stats["feeds_unchanged"] == 1
+    assert seen_headers == [None, '"v1"', '"v1"']
+    page_cache.clear()
+
+def test_fetch_rss_articles_refetches_unchanged_feed_for_uncovered_range():
+    import httpx
+    page_cache.clear()
+    seen_headers = []
+
+    def handler(request):
+        if request.url.path == "/feed":
+            seen_headers.append(request.headers.get("If-None-Match"))
+            if request.headers.get("If-None-Match") == '"v1"':
+                return httpx.Response(304)
+            return httpx.Response(200, content=FEED, headers={"ETag": '"v1"'})
+        return httpx.Response(200, content=HTML)
+
+    feed_states = {}
+    # 5/1〜5/3 には記事（5/5公開）がない
+    assert _run_crawl(handler, feed_states, {}, end_date=date(2025, 5, 3)) == []
+    state = feed_states["https://example.com/feed"]
+    assert (state.crawled_from, state.crawled_to) == (date(2025, 5, 1), date(2025, 5, 3))
+
+    # 前回の期間を超える期間は、フィードが不変でも条件付きGETを使わずにパースする
+    stats = {}
+    assert len(_run_crawl(handler, feed_states, stats)) == 1
+    assert "feeds_unchanged" not in stats and "feeds_not_modified" not in stats
+    state = feed_states["https://example.com/feed"]
+    assert (state.crawled_from, state.crawled_to) == (date(2025, 5, 1), date(2025, 5, 31))
+
+    # 前回の期間に含まれる期間は304で省略する
+    stats = {}
+    assert _run_crawl(handler, feed_states, stats, start_date=date(2025, 5, 2)) == []
+    assert stats["feeds_not_modified"] == 1
+    assert seen_headers == [None, None, '"v1"']
+    page_cache.clear()
+
+def test_fetch_rss_articles_prefilters_known_urls_before_scraping():
+    import httpx
+    page_cache.clear()
+    requested = []
+
+    def handler(request):
+        requested.append(request.url.path)
+        if request.url.path == "/feed":
+            return httpx.Response(200, content=FEED)
+        return httpx.Response(200, content=HTML)
+
+    stats = {}
+    articles = _run_crawl(handler, None, stats, known_url_filter=lambda urls: set(urls))
+    assert articles == []
+    assert stats["prefiltered"] == 1
+    assert requested == ["/feed"]
+
+def test_feed_is_hashed_and_parsed_off_the_event_loop():
+    import threading
+    import httpx
+    page_cache.clear()
+    threads = []
+    real_parse, real_hash = rss.feedparser.parse, rss._content_hash
+
+    def parse(content):
+        threads.append(threading.get_ident())
+        return real_parse(content)
+
+    def content_hash(content):
+        threads.append(threading.get_ident())
+        return real_hash(content)
+
+    def handler(request):
+        if request.url.path == "/feed":
+            return httpx.Response(200, content=FEED)
+        return httpx.Response(200, content=HTML)
+
+    with patch("service.rss.feedparser.parse", side_effect=parse), \
+            patch("service.rss._content_hash", side_effect=content_hash):
+        assert len(_run_crawl(handler, {}, {})) == 1
+    # イベントループ（asyncio.runを呼んだこのスレッド）では実行しない
+    assert len(threads) == 2 and threading.get_ident() not in threads
+    page_cache.clear()
@@ -0,0 +1,64 @@
+import os
+import re
+from datetime import date, datetime
+from unittest.mock import patch
+
+import pytest
+from fastapi.testclient import TestClient
+
+from service.search import bigrams, decode_cursor, encode_cursor, normalize_search_text, parse_terms
+from usecase import search_articles as usecase
+
+MIGRATION = os.path.join(os.path.dirname(os.path.dirname(__file__)), "migrations", "0005_article_search_functions.sql")
+
+def test_normalize_matches_index_rules():
+    # 全角英数・大文字・空白・記号・和文の約物の違いを吸収する
+    assert normalize_search_text("ＴＳＭＣ、 EUV露光「2nm」") == "tsmceuv露光2nm"
+    assert parse_terms("  TSMC  tsmc 半導体 ・ ") == ["tsmc", "半導体"]
+    assert bigrams(["tsmc", "量子", "株"]) == ["mc", "sm", "ts", "量子"]
+
+def test_fullwidth_table_matches_migration():
+    # DB側（search_normalize のtranslate）とPython側の全角→半角の対応が同じであること
+    with open(MIGRATION, encoding="utf-8") as f:
+        sql = f.read()
+    full, half = re.search(r"translate\(coalesce\(t, ''\),\s*'(.*?)',\s*'(.*?)'\)", sql, re.S).groups()
+    half = half.replace("''", "'")
+    assert len(full) == len(half) == 94
+    assert normalize_search_text(full) == normalize_search_text(half)
+
+def test_cursor_round_trip():
+    row = {"id": 42, "score": 6, "published": datetime(2025, 6, 1, 9, 30)}
+    assert decode_cursor(encode_cursor("relevance", row), "relevance") == (6, datetime(2025, 6, 1, 9, 30), 42)
+    assert decode_cursor(encode_cursor("date", {"id": 3, "published": None}), "date") == (None, None, 3)
+    with pytest.raises(ValueError):
+        decode_cursor(encode_cursor("date", row), "relevance")
+    with pytest.raises(ValueError):
+        decode_cursor("not-a-cursor", "date")
+
+def test_search_pages_with_next_cursor():
+    rows = [
+        {"id": i, "title": f"TSMC {i}", "url": f"https://example.com/{i}", "source": "itmedia", "summary": "", "labels": [],
+         "thumbnail_url": "", "published": datetime(2025, 6, i), "score": 4, "sort_published": datetime(2025, 6, i)}
+        for i in (3, 2, 1)
+    ]
+    with patch.object(usecase, "search_article_rows", return_value=rows) as search:
+        page = usecase.search_articles("ＴＳＭＣ", sources=["itmedia"], date_from=date(2025, 6, 1), date_to=date(2025, 6, 30), limit=2)
+    assert [item["id"] for item in page["items"]] == [3, 2]
+    assert "sort_published" not in page["items"][0]
+    assert decode_cursor(page["next_cursor"], "relevance") == (4, datetime(2025, 6, 2), 2)
+    args, kwargs = search.call_args
+    assert args == (["tsmc"], ["mc", "sm", "ts"])
+    # 終了日はその日を含む（翌日0時未満）。次ページ判定のため1件多く取得する
+    assert kwargs["date_from"] == datetime(2025, 6, 1) and kwargs["date_to"] == datetime(2025, 7, 1)
+    assert kwargs["limit"] == 3 and kwargs["after"] is None
+
+def test_search_endpoint_rejects_empty_query():
+    from interface.api import app
+    client = TestClient(app)
+    with patch.object(usecase, "search_article_rows") as search:
+        assert client.get("/search", params={"q": " 、。 "}).status_code == 400
+        assert client.get("/search", params={"q": "EUV", "sort": "popular"}).status_code == 400
+    search.assert_not_called()
+    with patch.object(usecase, "search_article_rows", return_value=[]):
+        resp = client.get("/search", params={"q": "EUV", "sort": "date", "source": ["nhk", "itmedia"]})
+    assert resp.status_code == 200 and resp.json() == {"terms": ["euv"], "items": [], "next_cursor": None}
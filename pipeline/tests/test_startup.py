@@ -0,0 +1,55 @@
+import os
+import subprocess
+import sys
+from fastapi.testclient import TestClient
+from unittest.mock import patch
+
+def test_import_main_is_lazy_without_api_key():
+    # APIキーなしでもimportでき、langchainやモデルpullはimport時に走らない
+    env = {k: v for k, v in os.environ.items() if k != "OPENAI_API_KEY"}
+    code = (
+        "import sys, main\n"
+        "assert not any(m.startswith('langchain') for m in sys.modules), 'langchain imported'\n"
+        "from service import ollama_llm_service\n"
+        "assert ollama_llm_service.get_ollama_model_status()['state'] == 'unknown'\n"
+    )
+    subprocess.run([sys.executable, "-c", code], cwd=os.path.dirname(os.path.dirname(__file__)), env=env, check=True)
+
+def test_ready_reports_model_state():
+    from interface.api import app
+    from service import ollama_llm_service, summarizer
+    client = TestClient(app)
+    with patch.object(summarizer, "LLM_PROVIDER", "ollama"):
+        with patch.dict(ollama_llm_service._model_status, {"state": "pulling"}):
+            resp = client.get("/ready")
+            assert resp.status_code == 503 and resp.json()["ready"] is False
+        with patch.dict(ollama_llm_service._model_status, {"state": "ready"}):
+            assert client.get("/ready").status_code == 200
+
+def test_workers_start_only_after_migrations():
+    import threading
+    import main
+    from repository import migrations
+    release = threading.Event()
+    migration_thread = threading.Thread(target=release.wait)
+    migration_thread.start()
+    with patch.object(main, "WorkerPool") as pool_cls:
+        pool = pool_cls.return_value
+        starter = threading.Thread(target=main._start_workers_after_migrations, args=(pool, migration_thread))
+        starter.start()
+        starter.join(0.2)
+        assert not pool.start.called
+        with patch.dict(migrations._status, {"state": "done"}):
+            release.set()
+            starter.join(5)
+        pool.start.assert_called_once()
+
+def test_workers_not_started_when_migrations_failed():
+    import threading
+    import main
+    from repository import migrations
+    migration_thread = threading.Thread(target=lambda: None)
+    migration_thread.start()
+    with patch.object(main, "WorkerPool") as pool_cls, patch.dict(migrations._status, {"state": "failed"}):
+        main._start_workers_after_migrations(pool_cls.return_value, migration_thread)
+        assert not pool_cls.return_value.start.called
@@ -0,0 +1,31 @@
+import asyncio
+import json
+from interface.streaming import format_event, run_with_events
+from service.events import emit
+
+def _collect(run, fmt="ndjson"):
+    async def main():
+        return [chunk async for chunk in run_with_events(run, fmt)]
+    return asyncio.run(main())
+
+def test_run_with_events_streams_thread_events_then_done():
+    def work(on_event):
+        for i in range(3):
+            emit(on_event, "summarized", id=i)
+        return {"updated": 3}
+    chunks = _collect(lambda on_event: asyncio.to_thread(work, on_event))
+    events = [json.loads(chunk) for chunk in chunks]
+    assert [e["event"] for e in events] == ["summarized"] * 3 + ["done"]
+    assert [e["id"] for e in events[:3]] == [0, 1, 2]
+    assert events[-1]["result"] == {"updated": 3}
+
+def test_run_with_events_reports_error():
+    async def fail(on_event):
+        emit(on_event, "feed", status="fetched")
+        raise RuntimeError("boom")
+    events = [json.loads(chunk) for chunk in _collect(fail)]
+    assert events[-1] == {"event": "error", "error": "boom"}
+
+def test_format_event_sse():
+    chunk = format_event({"event": "done", "result": {"n": 1}}, "sse", event_id=5)
+    assert chunk == 'id: 5\nevent: done\ndata: {"event": "done", "result": {"n": 1}}\n\n'
@@ -0,0 +1,21 @@
+from datetime import datetime
+from unittest.mock import patch
+from service.dummy_llm_service import DummyLLMService
+from usecase import summarize_articles as usecase
+
+ROWS = [
+    {"id": i, "title": f"t{i}", "url": f"https://example.com/{i}", "source": "s",
+     "created_at": datetime(2025, 5, 1), "content": "本文"}
+    for i in range(5)
+]
+
+def test_summarize_articles_writes_results_in_batches():
+    written = []
+    with patch.object(usecase, "get_llm_service", return_value=DummyLLMService()), \
+            patch.object(usecase, "get_articles_without_summary", return_value=ROWS), \
+            patch.object(usecase, "update_article_summaries", side_effect=lambda rs: written.append(list(rs))):
+        result = usecase.summarize_articles(limit=5, concurrency=3, write_batch=2, llm_batch=2)
+    assert result["updated"] == 5 and result["errors"] == 0
+    assert [len(batch) for batch in written] == [2, 2, 1]
+    assert sorted(r["id"] for batch in written for r in batch) == [0, 1, 2, 3, 4]
+    assert all(r["summary"] == "これはダミー要約です" for batch in written for r in batch)
@@ -0,0 +1,48 @@
+import asyncio
+import httpx
+from unittest.mock import patch
+from service import thumbnail
+from service.http_fetcher import AsyncFetcher
+from usecase import fetch_thumbnails as usecase
+
+HEAD = (
+    '<html><head><title>t</title>'
+    '<meta name="twitter:image" content="https://example.com/tw.jpg">'
+    '<meta property="og:image" content="/img/og.jpg">'
+    '</head>'
+)
+
+def test_scan_head_image_prefers_og_image_and_stops_at_body():
+    assert thumbnail.scan_head_image([HEAD[:40], HEAD[40:]]) == "/img/og.jpg"
+    only_twitter = '<head><meta name="twitter:image" content="a.jpg"></head>'
+    assert thumbnail.scan_head_image([only_twitter]) == "a.jpg"
+    # <body>以降の<meta>は見ない
+    assert thumbnail.scan_head_image(['<body><meta property="og:image" content="b.jpg">']) == ""
+
+def test_fetch_thumbnail_reads_only_the_head():
+    sent = []
+
+    async def body():
+        for chunk in [HEAD.encode(), b"<body>" + b"x" * 1000] + [b"y" * 1000] * 100:
+            sent.append(chunk)
+            yield chunk
+
+    async def run():
+        transport = httpx.MockTransport(lambda request: httpx.Response(200, content=body()))
+        async with AsyncFetcher() as fetcher:
+            await fetcher._client.aclose()
+            fetcher._client = httpx.AsyncClient(transport=transport)
+            return await thumbnail.fetch_thumbnail_async(fetcher, "https://example.com/a/page")
+
+    assert asyncio.run(run()) == "https://example.com/img/og.jpg"
+    # </head>を含む最初の断片で打ち切る
+    assert len(sent) == 1
+
+def test_fetch_and_update_thumbnails_writes_in_one_statement():
+    rows = [{"id": i, "url": f"https://example.com/{i}"} for i in range(3)]
+    with patch.object(usecase, "get_articles_without_thumbnail", return_value=rows), \
+            patch.object(usecase, "fetch_thumbnails", return_value=["https://example.com/0.jpg", "", None]), \
+            patch.object(usecase, "update_article_thumbnails", return_value=1) as mock_update:
+        result = usecase.fetch_and_update_thumbnails(limit=3)
+    mock_update.assert_called_once_with([(0, "https://example.com/0.jpg")])
+    assert result == {"updated": 1, "errors": 1}
@@ -0,0 +1,33 @@
+from fastapi.testclient import TestClient
+from unittest.mock import patch
+from service import template_service
+from usecase import topics_export
+
+STATE = {"template_html": None, "template_html_key": None, "fingerprint": "f1"}
+
+def test_template_is_compiled_once():
+    assert template_service.get_monthly_topics_template() is template_service.get_monthly_topics_template()
+
+def test_export_renders_and_stores_on_miss_then_serves_stored_html():
+    stored = {}
+    with patch.object(topics_export, "get_topic_export_state", side_effect=lambda _: {**STATE, **stored}), \
+            patch.object(topics_export, "save_topic_template_html",
+                         side_effect=lambda _, html, key: stored.update(template_html=html, template_html_key=key)), \
+            patch.object(topics_export, "export_topics_html", return_value="<html>1</html>") as mock_render:
+        first = topics_export.export_topics_html_cached(1)
+        second = topics_export.export_topics_html_cached(1)
+        assert first == second == ("<html>1</html>", stored["template_html_key"])
+        assert mock_render.call_count == 1
+        # 記事集合などが変わりフィンガープリントが変われば作り直す
+        changed = {"fingerprint": "f2"}
+        with patch.object(topics_export, "get_topic_export_state", side_effect=lambda _: {**STATE, **stored, **changed}):
+            html, key = topics_export.export_topics_html_cached(1)
+        assert mock_render.call_count == 2 and key != first[1]
+
+def test_export_endpoint_returns_304_for_matching_etag():
+    from interface.api import app
+    client = TestClient(app)
+    with patch("interface.api.export_topics_html_cached", return_value=("<html></html>", "k1")):
+        resp = client.post("/topics/1/export")
+        assert resp.status_code == 200 and resp.headers["etag"] == '"k1"'
+        assert client.get("/topics/1/export", headers={"If-None-Match": '"k1"'}).status_code == 304
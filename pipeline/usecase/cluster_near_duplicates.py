@@ -0,0 +1,39 @@
+# 新しく登録した記事を、先に登録された近似重複記事のクラスタにまとめるユースケース
+# まとめた記事は要約・タグ付けの対象から外れ、代表記事の結果が複写される（repository.dbのBACKLOG_STAGES）
+
+import os
+from typing import Dict, List
+
+from repository.db import get_near_duplicate_candidates, mark_near_duplicates
+from service.near_duplicate import NEAR_DUP_MAX_DISTANCE, find_canonical
+
+# 同じ記事とみなす公開日時の差の上限（日）
+NEAR_DUP_WINDOW_DAYS = float(os.environ.get("NEAR_DUP_WINDOW_DAYS", 7))
+# 重複記事の本文を削除するか（明示的に有効にした場合だけ）。指紋の判定は近似のため、
+# 別の記事を重複と誤判定しても本文から要約・再判定をやり直せるよう、既定では本文を残す
+NEAR_DUP_DROP_CONTENT = os.environ.get("NEAR_DUP_DROP_CONTENT", "false").lower() in ("1", "true", "yes", "on")
+
+def cluster_near_duplicates(article_ids: List[int]) -> int:
+    """
+    登録済み記事のうち近似重複と判定した記事に代表記事を設定し、その件数を返す
+
+    代表記事は各クラスタで最初に登録された記事。同じ呼び出しで登録した記事同士もまとめる
+    """
+    if not article_ids:
+        return 0
+    candidates: Dict[int, List[dict]] = {}
+    fingerprints: Dict[int, int] = {}
+    for row in get_near_duplicate_candidates(article_ids, NEAR_DUP_WINDOW_DAYS):
+        candidates.setdefault(row["article_id"], []).append(row)
+        fingerprints[row["article_id"]] = row["article_simhash"]
+    assigned: Dict[int, int] = {}
+    # ID順に判定し、先に判定した記事の代表記事を後の記事の判定に使う（DBへの書き込みは最後に1回）
+    for article_id in sorted(candidates):
+        rows = [
+            {**row, "canonical_id": assigned.get(row["id"], row["canonical_id"])}
+            for row in candidates[article_id]
+        ]
+        canonical_id = find_canonical(fingerprints[article_id], rows, NEAR_DUP_MAX_DISTANCE)
+        if canonical_id is not None:
+            assigned[article_id] = canonical_id
+    return mark_near_duplicates(list(assigned.items()), keep_content=not NEAR_DUP_DROP_CONTENT)
@@ -1,18 +1,96 @@
+import asyncio
+import os
+import time
 from datetime import date
-from typing import List, Optional
+from typing import Callable, List, Optional
 from service import rss
+from service.batch_writer import AsyncBatchWriter
+from service.events import EventSink, emit
 from repository import db
+from service.near_duplicate import article_fingerprint
+from usecase.cluster_near_duplicates import cluster_near_duplicates
 
-def crawl_articles(
+# 何件ごと・何秒ごとに取得済み記事をDBへ書き込むか
+CRAWL_WRITE_BATCH = int(os.environ.get("CRAWL_WRITE_BATCH", 100))
+CRAWL_WRITE_INTERVAL_SEC = float(os.environ.get("CRAWL_WRITE_INTERVAL_SEC", 5))
+
+async def crawl_articles_async(
     start_date: date,
     end_date: date,
-    sources: Optional[List[str]] = None
+    sources: Optional[List[str]] = None,
+    use_feed_cache: bool = True,
+    on_event: Optional[EventSink] = None,
+    check_cancelled: Optional[Callable[[], None]] = None
 ) -> dict:
-    articles = rss.fetch_rss_articles(start_date, end_date, sources or [])
-    result = db.save_articles(articles)
+    """
+    指定期間のRSS記事を並行取得し、DBへ保存する（イベントループ上で実行）
+
+    use_feed_cache=Trueの場合、前回のETag/Last-Modified/本文ハッシュで変化がなく、
+    期間が前回パースした期間に含まれるフィードは処理しない（それ以外の期間は自動で取り直す）。
+    Falseにすると前回の状態によらずすべてのフィードを取得・パースする。
+    on_eventを渡すと、フィード・記事単位の進捗イベントと保存結果（バッチごとのinserted）を通知する。
+    check_cancelledは記事を受け取るたび・保存バッチごとに呼ばれ、例外を送出するとクロールを中断する
+    （中断時はフィードのバリデータを更新しないため、次回は同じ期間を取り直す）。
+
+    取得した記事は一覧にまとめず、CRAWL_WRITE_BATCH件またはCRAWL_WRITE_INTERVAL_SEC秒ごとに保存する。
+    クロール中から記事がDBに見え、途中で失敗してもそれまでの分は保存済みになる。
+    """
+    started = time.monotonic()
+    feed_states = await asyncio.to_thread(db.get_feed_states) if use_feed_cache else {}
+    stats: dict = {}
+    fetched = 0
+
+    def save_batch(batch):
+        # DB保存は同期処理のため、AsyncBatchWriterがスレッドで実行する（イベントループを塞がない）
+        if check_cancelled:
+            check_cancelled()
+        for article in batch:
+            article.simhash = article_fingerprint(article.title, article.content)
+        result = db.save_articles(batch)
+        # 登録した記事を近似重複のクラスタにまとめる（まとめた記事は要約しない）
+        result["near_duplicates"] = cluster_near_duplicates(result.pop("ids"))
+        emit(on_event, "inserted", batch=len(batch), **result)
+        return result
+
+    async with AsyncBatchWriter(save_batch, CRAWL_WRITE_BATCH, CRAWL_WRITE_INTERVAL_SEC) as writer:
+        async for article in rss.iter_rss_articles(
+            start_date, end_date, sources or [], feed_states=feed_states, stats=stats,
+            known_url_filter=db.get_existing_urls, on_event=on_event
+        ):
+            if check_cancelled:
+                check_cancelled()
+            fetched += 1
+            await writer.add(article)
+    result = {
+        "inserted": sum(r["inserted"] for r in writer.results),
+        "skipped": sum(r["skipped"] for r in writer.results),
+        "near_duplicates": sum(r["near_duplicates"] for r in writer.results),
+    }
+    # 記事の保存が済んでからバリデータを更新する（途中で失敗した場合は次回も取り直す）
+    await asyncio.to_thread(db.save_feed_states, list(feed_states.values()))
+    feeds_not_modified = stats.get("feeds_not_modified", 0)
+    feeds_unchanged = stats.get("feeds_unchanged", 0)
     return {
         "start_date": str(start_date),
         "end_date": str(end_date),
-        "fetched": len(articles),
-        **result
-    }
\ No newline at end of file
+        "feeds": stats.get("feeds", 0),
+        "feeds_cached": feeds_not_modified + feeds_unchanged,
+        "feeds_not_modified": feeds_not_modified,
+        "feeds_unchanged": feeds_unchanged,
+        "feeds_failed": stats.get("feeds_failed", 0),
+        "prefiltered": stats.get("prefiltered", 0),
+        "duplicates_in_crawl": stats.get("duplicates_in_crawl", 0),
+        "fetched": fetched,
+        **result,
+        "elapsed_sec": round(time.monotonic() - started, 2)
+    }
+
+def crawl_articles(
+    start_date: date,
+    end_date: date,
+    sources: Optional[List[str]] = None,
+    use_feed_cache: bool = True,
+    on_event: Optional[EventSink] = None,
+    check_cancelled: Optional[Callable[[], None]] = None
+) -> dict:
+    return asyncio.run(crawl_articles_async(start_date, end_date, sources, use_feed_cache, on_event, check_cancelled))
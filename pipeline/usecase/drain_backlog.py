@@ -0,0 +1,79 @@
+# 未処理記事（要約・タグ付け・サムネイル待ち）を、なくなるか時間予算を使い切るまで処理し続けるユースケース
+#
+# 記事はID順（キーセット）に少しずつ確保（article_leases）してから処理するため、
+# 複数のpipelineが同時に同じ工程を回しても同じ記事を重複して処理しない。
+
+import os
+import socket
+import time
+import uuid
+from typing import Callable, List, Optional
+
+from repository.db import claim_article_backlog, count_article_backlog, release_article_leases
+
+DRAIN_BATCH = int(os.environ.get("DRAIN_BATCH", 20))
+# 1回の確保の有効秒数（1バッチの処理がこれを超えると他のプロセスに引き継がれうる）
+DRAIN_LEASE_SEC = float(os.environ.get("DRAIN_LEASE_SEC", 600))
+# 時間予算の既定値（0以下は無制限）
+DRAIN_TIME_BUDGET_SEC = float(os.environ.get("DRAIN_TIME_BUDGET_SEC", 0))
+
+# 確保した記事を処理して件数の集計を返す関数。第2引数にはバッチ内の進捗 (done, total) を通知する
+BatchProcessor = Callable[[List[dict], Optional[Callable[[int, int], None]]], dict]
+
+
+def drain_backlog(
+    stage: str,
+    process: BatchProcessor,
+    batch_size: Optional[int] = None,
+    time_budget_sec: Optional[float] = None,
+    lease_sec: Optional[float] = None,
+    on_progress: Optional[Callable[[int, int], None]] = None,
+) -> dict:
+    """
+    stageの未処理記事をID順にbatch_size件ずつ確保してprocessに渡し、集計を合算して返す
+
+    未処理記事がなくなるか、time_budget_secを過ぎたら次のバッチを確保せずに終わる（処理中のバッチは最後まで行う）。
+    失敗して未処理のまま残った記事は、同じ呼び出しの中では再度確保しない。
+
+    :param stage: repository.db.BACKLOG_STAGES のキー（summarize / tag / thumbnails）
+    :param on_progress: (処理済み件数, 開始時の未処理件数) で呼ばれる。例外を送出すると中断する
+    :return: processの集計の合計に batches / processed / stopped（empty / time_budget）を加えたもの
+    """
+    batch_size = max(1, batch_size or DRAIN_BATCH)
+    time_budget_sec = DRAIN_TIME_BUDGET_SEC if time_budget_sec is None else time_budget_sec
+    lease_sec = lease_sec or DRAIN_LEASE_SEC
+    worker_id = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+    started = time.monotonic()
+    total = count_article_backlog(stage) if on_progress else 0
+    summary = {"batches": 0, "processed": 0}
+    after_id = 0
+    stopped = "empty"
+    while True:
+        if time_budget_sec > 0 and time.monotonic() - started >= time_budget_sec:
+            stopped = "time_budget"
+            break
+        rows, last_id = claim_article_backlog(stage, worker_id, after_id, batch_size, lease_sec)
+        if last_id is None:
+            break
+        after_id = last_id
+        if not rows:
+            # 候補がすべて他のプロセスに確保されていた
+            continue
+        done_before = summary["processed"]
+
+        def report(done: int, _total: int) -> None:
+            if on_progress:
+                on_progress(done_before + done, max(total, done_before + done))
+
+        try:
+            result = process(rows, report)
+        finally:
+            release_article_leases(stage, worker_id, [row["id"] for row in rows])
+        for key, value in result.items():
+            if isinstance(value, int) and not isinstance(value, bool):
+                summary[key] = summary.get(key, 0) + value
+        summary["batches"] += 1
+        summary["processed"] += len(rows)
+    summary["stopped"] = stopped
+    summary["elapsed_sec"] = round(time.monotonic() - started, 3)
+    return summary
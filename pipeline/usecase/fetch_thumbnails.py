@@ -1,21 +1,39 @@
 # サムネイル未設定の記事に対してサムネイル画像を取得し、DBを更新するユースケース
 
-from repository.db import get_articles_without_thumbnail, update_article_thumbnail
-from service.rss import fetch_thumbnail_url
+import os
+from typing import Callable, List, Optional
+from repository.db import get_articles_without_thumbnail, update_article_thumbnails
+from service.thumbnail import fetch_thumbnails
+from usecase.drain_backlog import drain_backlog
 
-def fetch_and_update_thumbnails(limit: int = 100) -> dict:
-    # サムネイル未設定の記事をDBから取得
-    articles = get_articles_without_thumbnail(limit)
+# 何件ごとに並行取得・一括書き戻しするか（進捗通知・キャンセル受付の単位）
+THUMBNAIL_WRITE_BATCH = int(os.environ.get("THUMBNAIL_WRITE_BATCH", 50))
+
+def _fetch_thumbnails(articles: List[dict], on_progress: Optional[Callable[[int, int], None]]) -> dict:
     updated, errors = 0, 0
-    for row in articles:
+    for i in range(0, len(articles), THUMBNAIL_WRITE_BATCH):
+        batch = articles[i:i + THUMBNAIL_WRITE_BATCH]
+        # <head>だけを並行に取得し、見つかった分を1文で書き戻す
+        thumbnails = fetch_thumbnails([row["url"] for row in batch])
+        errors += sum(1 for thumbnail in thumbnails if thumbnail is None)
+        results = [(row["id"], thumbnail) for row, thumbnail in zip(batch, thumbnails) if thumbnail]
         try:
-            url = row["url"]
-            article_id = row["id"]
-            thumbnail = fetch_thumbnail_url(url)
-            if thumbnail:
-                update_article_thumbnail(article_id, thumbnail)
-                updated += 1
+            updated += update_article_thumbnails(results)
         except Exception as e:
-            # エラー時はカウントのみ
-            errors += 1
-    return {"updated": updated, "errors": errors}
\ No newline at end of file
+            print(f"[ERROR] fetch_thumbnails failed: {e}")
+            errors += len(results)
+        if on_progress:
+            on_progress(i + len(batch), len(articles))
+    return {"updated": updated, "errors": errors}
+
+def fetch_and_update_thumbnails(
+    limit: int = 100,
+    on_progress: Optional[Callable[[int, int], None]] = None,
+    drain: bool = False,
+    time_budget_sec: Optional[float] = None
+) -> dict:
+    if drain:
+        # 未処理がなくなるか時間予算を過ぎるまで、limit件ずつ確保して処理する
+        return drain_backlog("thumbnails", _fetch_thumbnails, batch_size=limit, time_budget_sec=time_budget_sec, on_progress=on_progress)
+    # サムネイル未設定の記事をDBから取得
+    return _fetch_thumbnails(get_articles_without_thumbnail(limit), on_progress)
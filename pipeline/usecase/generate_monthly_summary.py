@@ -1,37 +1,72 @@
-from typing import List
-from repository.db import get_topic_by_id, get_articles_by_topics_id, update_monthly_summary
+from typing import Callable, List, Optional
+from repository.db import get_topic_by_id, get_articles_by_topics_id, update_monthly_summary, update_article_contents
 from service import summarizer # summarizerモジュールをインポート
-from service.rss import fetch_article_text
+from service.rss import scrape_articles
+from service.monthly_summarizer import summarize_monthly
 
-def generate_monthly_summary(topics_id: int, llm_provider: str = None) -> str: # llm_provider 引数を追加
+# 記事テキストの選び方
+# stored: 保存済みsummary → 保存済みcontent → （どちらもない記事のみ）URLから取得（既定）
+# fetch: 全記事の本文をURLから取り直す（従来方式。取得は並行実行）
+SOURCE_MODES = ("stored", "fetch")
+
+def _article_heading(art: dict) -> str:
+    return f"{art.get('title') or ''}（{art.get('source') or ''}）"
+
+def select_article_texts(articles_db: List[dict], source_mode: str = "stored") -> List[str]:
+    """
+    月次まとめに渡す記事テキストを選ぶ。ネットワーク取得は必要な記事だけを並行実行し、
+    取得できた本文はarticles.contentへ書き戻す
+    """
+    if source_mode not in SOURCE_MODES:
+        raise ValueError(f"Invalid source_mode: {source_mode}")
+    texts: List[Optional[str]] = [None] * len(articles_db)
+    to_fetch: List[int] = []
+    for i, art in enumerate(articles_db):
+        if source_mode == "stored" and art.get("summary"):
+            texts[i] = f"{_article_heading(art)}\n{art['summary']}"
+        elif source_mode == "stored" and art.get("content"):
+            texts[i] = f"{_article_heading(art)}\n{art['content']}"
+        elif art.get("url"):
+            to_fetch.append(i)
+        else: # URLもなければ保存済みの情報かタイトルのみ
+            texts[i] = art.get("summary") or art.get("content") or _article_heading(art)
+
+    if to_fetch:
+        print(f"[INFO] monthly summary: fetching {len(to_fetch)} of {len(articles_db)} articles")
+        pages = scrape_articles([articles_db[i]["url"] for i in to_fetch])
+        fetched_contents = []
+        for i, page in zip(to_fetch, pages):
+            art = articles_db[i]
+            if page.content: # 本文が取得できた場合
+                texts[i] = f"{_article_heading(art)}\n{page.content}"
+                fetched_contents.append((art["id"], page.content))
+            elif art.get("summary"): # 本文取得失敗時はsummaryを利用
+                texts[i] = f"{_article_heading(art)}\n{art['summary']}"
+            elif art.get("content"):
+                texts[i] = f"{_article_heading(art)}\n{art['content']}"
+            else: # summaryもなければタイトルとURL
+                texts[i] = f"{_article_heading(art)} {art['url']}"
+        update_article_contents(fetched_contents)
+    return [t for t in texts if t]
+
+def generate_monthly_summary(topics_id: int, llm_provider: str = None, source_mode: str = "stored", check_cancelled: Optional[Callable[[], None]] = None) -> str: # llm_provider 引数を追加
     """
     指定topics_idの全記事を取得し、LLMで月次まとめを生成し、DBに保存して返す
+
+    check_cancelledはmap/reduceの各段階で呼ばれ、例外を送出すると保存せずに中断する
     """
     topic = get_topic_by_id(topics_id)
     if not topic:
         raise ValueError(f"topics_id={topics_id} のTOPICSが見つかりません")
     articles_db = get_articles_by_topics_id(topics_id)
-    # 記事本文をまとめてリスト化
-    article_texts: List[str] = []
-    for art in articles_db:
-        article_url = art.get("url")
-        if article_url:
-            body = fetch_article_text(article_url)
-            if body: # 本文が取得できた場合のみ追加
-                article_texts.append(body)
-            elif art.get("summary"): # 本文取得失敗時はsummaryを利用
-                article_texts.append(art["summary"])
-            else: # summaryもなければタイトルとURL
-                article_texts.append(f"{art.get('title', '')} {article_url}")
-        elif art.get("summary"): # URLがない場合はsummaryを利用
-            article_texts.append(art["summary"])
-        else: # URLもsummaryもなければタイトルのみ
-             article_texts.append(f"{art.get('title', '')}")
+    # 記事テキストをまとめてリスト化（保存済みの要約・本文を優先）
+    article_texts = select_article_texts(articles_db, source_mode)
 
     if not article_texts:
         raise ValueError("記事が1件もありません")
     
     llm = summarizer.get_llm_service(provider=llm_provider) # llm_provider を渡す
-    monthly_summary_text = llm.generate_monthly_summary(article_texts)
+    # 記事数が多い場合はチャンク分割→並行要約→集約の階層型で生成する
+    monthly_summary_text = summarize_monthly(llm, article_texts, check_cancelled=check_cancelled)
     update_monthly_summary(topics_id, monthly_summary_text)
-    return monthly_summary_text
\ No newline at end of file
+    return monthly_summary_text
@@ -0,0 +1,150 @@
+# バックグラウンドジョブの種類と実行内容を定義するユースケース
+# ジョブはjobsテーブルに積まれ、interface/worker.py のワーカープロセスが取り出して実行する
+
+import threading
+import time
+from datetime import date
+from typing import Callable, Dict, List, Optional
+
+from repository.db import insert_job
+
+
+class JobCancelled(Exception):
+    """キャンセル要求を受けてジョブを中断したことを表す"""
+
+
+class JobContext:
+    """
+    実行中ジョブの進捗とキャンセル状態を保持する
+
+    ユースケースには report(done, total) を進捗コールバック、emit(event) をイベント通知先として渡す。
+    ワーカーのハートビートがキャンセル要求を検出すると、次の report で JobCancelled を送出する。
+    イベントはバッファされ、ワーカーが定期的にjob_eventsへまとめて書き込む
+    """
+
+    def __init__(self, job_id: int, params: Optional[dict] = None):
+        self.job_id = job_id
+        self.params = params or {}
+        self.progress = 0
+        self._cancelled = threading.Event()
+        self._events: List[dict] = []
+        self._events_lock = threading.Lock()
+
+    def report(self, done: int, total: int) -> None:
+        if total > 0:
+            # 100は完了時のみ（complete_jobで設定）
+            self.progress = min(99, int(done * 100 / total))
+        self.emit({"event": "progress", "ts": round(time.time(), 3), "done": done, "total": total})
+        self.raise_if_cancelled()
+
+    def emit(self, event: dict) -> None:
+        # クロールのイベントループや要約のワーカースレッドから呼ばれる
+        with self._events_lock:
+            self._events.append(event)
+
+    def drain_events(self) -> List[dict]:
+        with self._events_lock:
+            events, self._events = self._events, []
+        return events
+
+    def cancel(self) -> None:
+        self._cancelled.set()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancelled.is_set()
+
+    def raise_if_cancelled(self) -> None:
+        if self._cancelled.is_set():
+            raise JobCancelled(f"job {self.job_id} cancelled")
+
+
+def _run_crawl(ctx: JobContext) -> dict:
+    from usecase.crawl_articles import crawl_articles
+    params = ctx.params
+    start = date.fromisoformat(params["start_date"])
+    end = date.fromisoformat(params["end_date"]) if params.get("end_date") else start
+    return crawl_articles(
+        start, end, params.get("sources"), params.get("use_feed_cache", True),
+        on_event=ctx.emit, check_cancelled=ctx.raise_if_cancelled
+    )
+
+
+def _run_summarize(ctx: JobContext) -> dict:
+    from usecase.summarize_articles import summarize_articles
+    params = ctx.params
+    return summarize_articles(
+        limit=params.get("limit", 20),
+        concurrency=params.get("concurrency"),
+        llm_batch=params.get("llm_batch"),
+        on_progress=ctx.report,
+        on_event=ctx.emit,
+        drain=bool(params.get("drain", False)),
+        time_budget_sec=params.get("time_budget_sec"),
+    )
+
+
+def _run_tag(ctx: JobContext) -> dict:
+    from usecase.tag_articles import tag_articles
+    params = ctx.params
+    return tag_articles(
+        limit=params.get("limit", 20),
+        llm_batch=params.get("llm_batch"),
+        on_progress=ctx.report,
+        drain=bool(params.get("drain", False)),
+        time_budget_sec=params.get("time_budget_sec"),
+    )
+
+
+def _run_thumbnails(ctx: JobContext) -> dict:
+    from usecase.fetch_thumbnails import fetch_and_update_thumbnails
+    params = ctx.params
+    return fetch_and_update_thumbnails(
+        limit=params.get("limit", 100),
+        on_progress=ctx.report,
+        drain=bool(params.get("drain", False)),
+        time_budget_sec=params.get("time_budget_sec"),
+    )
+
+
+def _run_monthly_summary(ctx: JobContext) -> dict:
+    from usecase.generate_monthly_summary import generate_monthly_summary
+    params = ctx.params
+    summary = generate_monthly_summary(
+        int(params["topics_id"]),
+        llm_provider=params.get("llm_provider"),
+        source_mode=params.get("source_mode", "stored"),
+        check_cancelled=ctx.raise_if_cancelled,
+    )
+    return {"topics_id": int(params["topics_id"]), "monthly_summary": summary}
+
+
+# ジョブ種別 → 実行関数（重い依存はワーカー側で実行時にimportする）
+JOB_HANDLERS: Dict[str, Callable[[JobContext], dict]] = {
+    "crawl": _run_crawl,
+    "summarize": _run_summarize,
+    "tag": _run_tag,
+    "thumbnails": _run_thumbnails,
+    "monthly_summary": _run_monthly_summary,
+}
+
+# 必須パラメータ（投入時に検証し、ワーカーでの確実な失敗を避ける）
+_REQUIRED_PARAMS: Dict[str, tuple] = {
+    "crawl": ("start_date",),
+    "monthly_summary": ("topics_id",),
+}
+
+
+def enqueue_job(job_type: str, params: Optional[dict] = None, max_attempts: int = 3) -> int:
+    """
+    ジョブをpendingで登録してIDを返す（実行はワーカーが非同期に行う）
+
+    :raises ValueError: 未知のジョブ種別、または必須パラメータが不足している場合
+    """
+    if job_type not in JOB_HANDLERS:
+        raise ValueError(f"unknown job type: {job_type} (expected one of {sorted(JOB_HANDLERS)})")
+    params = params or {}
+    missing = [key for key in _REQUIRED_PARAMS.get(job_type, ()) if not params.get(key)]
+    if missing:
+        raise ValueError(f"missing params for {job_type}: {missing}")
+    return insert_job(job_type, status="pending", params=params, max_attempts=max(1, int(max_attempts)))
@@ -0,0 +1,55 @@
+# 記事を検索語・公開日・ソースで検索し、1ページ分と次ページのカーソルを返すユースケース
+
+from datetime import date, datetime, time, timedelta
+from typing import List, Optional
+
+from repository.db import search_article_rows
+from service.search import (
+    SEARCH_DEFAULT_LIMIT, SEARCH_MAX_LIMIT, SEARCH_RANK_WINDOW, SORTS,
+    bigrams, decode_cursor, encode_cursor, parse_terms,
+)
+
+def search_articles(
+    q: str,
+    sources: Optional[List[str]] = None,
+    date_from: Optional[date] = None,
+    date_to: Optional[date] = None,
+    sort: str = "relevance",
+    cursor: Optional[str] = None,
+    limit: Optional[int] = None,
+) -> dict:
+    """
+    空白区切りの検索語をすべて含む記事を返す（AND検索。大文字小文字・全角半角・記号の違いは無視する）
+
+    :param date_from: 公開日の下限（その日を含む）
+    :param date_to: 公開日の上限（その日を含む）
+    :param sort: relevance（タイトル・ラベル・要約・本文の順に重く採点）/ date（新しい順）
+    :param cursor: 前ページの next_cursor
+    :return: {"terms": 正規化した検索語, "items": [...], "next_cursor": 次ページのカーソル（最終ページならNone）}
+    :raises ValueError: 検索語が空、並び順・カーソルが不正な場合
+    """
+    if sort not in SORTS:
+        raise ValueError(f"unknown sort: {sort}")
+    terms = parse_terms(q)
+    if not terms:
+        raise ValueError("q must contain at least one search term")
+    limit = min(max(1, limit or SEARCH_DEFAULT_LIMIT), SEARCH_MAX_LIMIT)
+    after = decode_cursor(cursor, sort) if cursor else None
+    # 1件多く取得し、次ページの有無を判定する
+    rows = search_article_rows(
+        terms,
+        bigrams(terms),
+        sort=sort,
+        sources=sources,
+        date_from=datetime.combine(date_from, time.min) if date_from else None,
+        date_to=datetime.combine(date_to + timedelta(days=1), time.min) if date_to else None,
+        after=after,
+        limit=limit + 1,
+        window=SEARCH_RANK_WINDOW,
+    )
+    items = [
+        {key: row[key] for key in ("id", "title", "url", "source", "summary", "labels", "thumbnail_url", "published", "score") if key in row}
+        for row in rows[:limit]
+    ]
+    next_cursor = encode_cursor(sort, rows[limit - 1]) if len(rows) > limit else None
+    return {"terms": terms, "items": items, "next_cursor": next_cursor}
@@ -1,60 +1,169 @@
-import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime
-from repository.db import get_db_conn
+from typing import Callable, List, Optional, Tuple
+from repository.db import get_articles_without_summary, update_article_summaries
 from service.llm_interface import LLMInterface
 from service.summarizer import get_llm_service
-from service.rss import fetch_article_text
+from service.rss import scrape_article
+from service.events import EventSink, emit, elapsed_ms
+from usecase.drain_backlog import drain_backlog
 from entity.article import Article
 
-def summarize_articles(limit: int = 20) -> dict:
+SUMMARIZE_CONCURRENCY = int(os.environ.get("SUMMARIZE_CONCURRENCY", 4))
+SUMMARIZE_WRITE_BATCH = int(os.environ.get("SUMMARIZE_WRITE_BATCH", 20))
+SUMMARIZE_LLM_BATCH = int(os.environ.get("SUMMARIZE_LLM_BATCH", 5))
+
+def _prepare_row(row: dict) -> Tuple[dict, str]:
     """
-    summary/labels未設定の記事にAI要約・タグ付けを実行し、DBを更新する
+    1記事分の本文を用意し、DB書き戻し用の結果とLLM入力を返す（DB接続は保持しない）
+    """
+    article = Article(
+        title=row["title"],
+        url=row["url"],
+        source=row["source"],
+        published=row["created_at"] if isinstance(row["created_at"], datetime) else datetime.fromisoformat(str(row["created_at"])),
+        content=row.get("content") or ""
+    )
+    result = {"id": row["id"], "summary": None, "labels": None, "content": None, "thumbnail_url": None}
+
+    # 記事本文を取得（DBに保存されている場合はそれを使用、なければURLから取得）
+    content = article.content
+    if not content:
+        print(f"[INFO] Fetching article text from URL: {article.url}")
+        page = scrape_article(article.url)
+        content = page.content
+        # DBのcontentフィールドを更新
+        if content:
+            result["content"] = content
+        # 同じ取得結果にOGP画像があれば、サムネイル未設定の場合に限り保存
+        if page.thumbnail_url:
+            result["thumbnail_url"] = page.thumbnail_url
+
+    # 本文が取得できない場合はタイトルとURLを組み合わせて要約
+    if not content:
+        print(f"[WARN] Failed to get article content, using title and URL for summary: {article.url}")
+        input_for_llm = f"タイトル: {article.title}\nURL: {article.url}\n出典: {article.source}"
+    else:
+        input_for_llm = f"タイトル: {article.title}\n出典: {article.source}\nURL: {article.url}\n本文: {content}"
+    return result, input_for_llm
+
+def _summarize_rows(llm: LLMInterface, rows: List[dict]) -> List[dict]:
+    """
+    複数記事の本文を用意し、1回のバッチAPI呼び出しで要約・タグ付けする
+    """
+    prepared = [_prepare_row(row) for row in rows]
+    try:
+        generated = llm.generate_summaries_and_labels([text for _, text in prepared])
+    except Exception as e:
+        # 本文・サムネイルの取得結果だけは書き戻す
+        print(f"[ERROR] summarize failed: {e}")
+        for result, _ in prepared:
+            result["error"] = str(e)
+        return [result for result, _ in prepared]
+    results = []
+    for (result, _), (summary, labels) in zip(prepared, generated):
+        result["summary"] = summary
+        result["labels"] = labels
+        results.append(result)
+    return results
+
+def _summarize_batch(
+    llm: LLMInterface,
+    rows: List[dict],
+    concurrency: int,
+    write_batch: int,
+    llm_batch: int,
+    on_progress: Optional[Callable[[int, int], None]],
+    on_event: Optional[EventSink]
+) -> dict:
+    """
+    取得済みの記事を並行に要約し、write_batch件ごとに書き戻す
     """
     updated, errors = 0, 0
-    llm: LLMInterface = get_llm_service()
-    with get_db_conn() as conn:
-        with conn.cursor() as cur:
-            cur.execute(
-                "SELECT id, title, url, source, created_at, content FROM articles WHERE summary IS NULL OR summary = '' LIMIT %s",
-                (limit,)
-            )
-            rows = cur.fetchall()
-            for row in rows:
+    pending: List[dict] = []
+
+    def flush(all_rows: bool = False) -> None:
+        nonlocal pending
+        while pending and (all_rows or len(pending) >= write_batch):
+            update_article_summaries(pending[:write_batch])
+            emit(on_event, "saved", ids=[result["id"] for result in pending[:write_batch]])
+            pending = pending[write_batch:]
+
+    def timed_batch(batch: List[dict]) -> Tuple[List[dict], int]:
+        started = time.monotonic()
+        return _summarize_rows(llm, batch), elapsed_ms(started)
+
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        futures = [
+            executor.submit(timed_batch, rows[i:i + llm_batch])
+            for i in range(0, len(rows), llm_batch)
+        ]
+        done = 0
+        try:
+            for future in as_completed(futures):
                 try:
-                    article = Article(
-                        title=row["title"],
-                        url=row["url"],
-                        source=row["source"],
-                        published=row["created_at"] if isinstance(row["created_at"], datetime) else datetime.fromisoformat(str(row["created_at"])),
-                        content=row.get("content", "")
-                    )
-                    
-                    # 記事本文を取得（DBに保存されている場合はそれを使用、なければURLから取得）
-                    content = article.content
-                    if not content:
-                        print(f"[INFO] Fetching article text from URL: {article.url}")
-                        content = fetch_article_text(article.url)
-                        # DBのcontentフィールドを更新
-                        if content:
-                            cur.execute(
-                                "UPDATE articles SET content=%s WHERE id=%s",
-                                (content, row["id"])
-                            )
-                    
-                    # 本文が取得できない場合はタイトルとURLを組み合わせて要約
-                    if not content:
-                        print(f"[WARN] Failed to get article content, using title and URL for summary: {article.url}")
-                        input_for_llm = f"タイトル: {article.title}\nURL: {article.url}\n出典: {article.source}"
-                    else:
-                        input_for_llm = f"タイトル: {article.title}\n出典: {article.source}\nURL: {article.url}\n本文: {content}"
-                        
-                    summary, labels = llm.generate_summary_and_labels(input_for_llm)
-                    cur.execute(
-                        "UPDATE articles SET summary=%s, labels=%s WHERE id=%s",
-                        (summary, json.dumps(labels, ensure_ascii=False), row["id"])
-                    )
-                    updated += 1
+                    results, batch_ms = future.result()
                 except Exception as e:
                     print(f"[ERROR] summarize failed: {e}")
                     errors += 1
-        return {"updated": updated, "errors": errors}
\ No newline at end of file
+                    emit(on_event, "error", error=str(e))
+                    continue
+                for result in results:
+                    if result.get("error") or not result.get("summary"):
+                        errors += 1
+                        emit(on_event, "error", id=result["id"], error=result.get("error") or "empty summary", elapsed_ms=batch_ms)
+                    else:
+                        updated += 1
+                        emit(on_event, "summarized", id=result["id"], labels=result["labels"], elapsed_ms=batch_ms)
+                pending.extend(results)
+                flush()
+                done += len(results)
+                if on_progress:
+                    on_progress(done, len(rows))
+        except BaseException:
+            # 中断時は未着手のバッチを取り消し、完了分だけ書き戻す
+            for future in futures:
+                future.cancel()
+            flush(all_rows=True)
+            raise
+    flush(all_rows=True)
+    return {"updated": updated, "errors": errors}
+
+def summarize_articles(
+    limit: int = 20,
+    concurrency: Optional[int] = None,
+    write_batch: Optional[int] = None,
+    llm_batch: Optional[int] = None,
+    on_progress: Optional[Callable[[int, int], None]] = None,
+    on_event: Optional[EventSink] = None,
+    drain: bool = False,
+    time_budget_sec: Optional[float] = None
+) -> dict:
+    """
+    summary/labels未設定の記事にAI要約・タグ付けを実行し、DBを更新する
+
+    :param limit: 処理する最大件数（drain時は1回に確保する件数）
+    :param concurrency: 並行ワーカー数（既定: SUMMARIZE_CONCURRENCY）。LLMのRPM/TPM制限はプロバイダ単位で共有
+    :param write_batch: 何件ごとにDBへまとめて書き戻すか（既定: SUMMARIZE_WRITE_BATCH）
+    :param llm_batch: 1ワーカーが1回のバッチAPI呼び出しで扱う記事数（既定: SUMMARIZE_LLM_BATCH）。
+                      実際のプロンプトはさらにトークン予算で分割される
+    :param on_progress: バッチ完了ごとに(処理済み件数, 対象件数)で呼ばれる。例外を送出すると残りを中断する
+    :param on_event: 記事単位のイベント（summarized / error）と書き戻し（saved）の通知先
+    :param drain: 未処理記事がなくなるか time_budget_sec を過ぎるまで、確保しながら処理し続ける（usecase.drain_backlog）
+    """
+    concurrency = max(1, concurrency or SUMMARIZE_CONCURRENCY)
+    write_batch = max(1, write_batch or SUMMARIZE_WRITE_BATCH)
+    llm_batch = max(1, llm_batch or SUMMARIZE_LLM_BATCH)
+    llm: LLMInterface = get_llm_service()
+
+    def process(rows: List[dict], progress: Optional[Callable[[int, int], None]]) -> dict:
+        return _summarize_batch(llm, rows, concurrency, write_batch, llm_batch, progress, on_event)
+
+    if drain:
+        result = drain_backlog("summarize", process, batch_size=limit, time_budget_sec=time_budget_sec, on_progress=on_progress)
+    else:
+        # 対象の取得はここで完結させ、LLM呼び出し中はDBカーソル・接続を保持しない
+        result = process(get_articles_without_summary(limit), on_progress)
+    return {**result, "concurrency": concurrency}
@@ -1,32 +1,55 @@
 # summaryが設定済みでlabelsが未設定の記事に対してタグ付けを実行し、DBを更新するユースケース
 
-import json
-from repository.db import get_db_conn
-from service.summarizer import generate_summary_and_labels
-from datetime import datetime
+import os
+from typing import Callable, List, Optional
+from repository.db import get_articles_without_labels, update_article_labels
+from service.summarizer import get_llm_service
+from usecase.drain_backlog import drain_backlog
 
-def tag_articles(limit: int = 20) -> dict:
-    # summaryが設定済みでlabelsが未設定の記事をDBから取得
+TAG_LLM_BATCH = int(os.environ.get("TAG_LLM_BATCH", 10))
+
+def _tag_rows(llm, rows: List[dict], llm_batch: int, on_progress: Optional[Callable[[int, int], None]]) -> dict:
     updated, errors = 0, 0
-    with get_db_conn() as conn:
-        with conn.cursor() as cur:
-            cur.execute(
-                "SELECT id, summary FROM articles WHERE (labels IS NULL OR labels = '[]' OR labels = '') AND summary IS NOT NULL AND summary != '' LIMIT %s",
-                (limit,)
-            )
-            rows = cur.fetchall()
-            # OpenAI APIキーはbuild_llm_chain内部で取得
-            for row in rows:
-                try:
-                    summary = row["summary"]
-                    # summaryからタグを生成（要約＋タグ付けAIを再利用、summaryのみ渡す）
-                    _, labels = generate_summary_and_labels(summary)
-                    cur.execute(
-                        "UPDATE articles SET labels=%s WHERE id=%s",
-                        (json.dumps(labels), row["id"])
-                    )
-                    updated += 1
-                except Exception as e:
-                    print(f"[ERROR] tag_articles failed: {e}")
-                    errors += 1
-    return {"updated": updated, "errors": errors}
\ No newline at end of file
+    for i in range(0, len(rows), llm_batch):
+        batch = rows[i:i + llm_batch]
+        try:
+            # summaryからタグを生成（要約＋タグ付けAIのバッチAPIを再利用、summaryのみ渡す）
+            generated = llm.generate_summaries_and_labels([row["summary"] for row in batch])
+        except Exception as e:
+            print(f"[ERROR] tag_articles failed: {e}")
+            errors += len(batch)
+            if on_progress:
+                on_progress(i + len(batch), len(rows))
+            continue
+        results = []
+        for row, (_, labels) in zip(batch, generated):
+            if labels:
+                results.append((row["id"], labels))
+            else:
+                errors += 1
+        try:
+            update_article_labels(results)
+            updated += len(results)
+        except Exception as e:
+            print(f"[ERROR] tag_articles failed: {e}")
+            errors += len(results)
+        # バッチごとに進捗を通知（ジョブ実行時はここでキャンセルを受け付ける）
+        if on_progress:
+            on_progress(i + len(batch), len(rows))
+    return {"updated": updated, "errors": errors}
+
+def tag_articles(
+    limit: int = 20,
+    llm_batch: int = None,
+    on_progress: Optional[Callable[[int, int], None]] = None,
+    drain: bool = False,
+    time_budget_sec: Optional[float] = None
+) -> dict:
+    llm_batch = max(1, llm_batch or TAG_LLM_BATCH)
+    llm = get_llm_service()
+    if drain:
+        # 未処理がなくなるか時間予算を過ぎるまで、limit件ずつ確保して処理する
+        process = lambda rows, progress: _tag_rows(llm, rows, llm_batch, progress)
+        return drain_backlog("tag", process, batch_size=limit, time_budget_sec=time_budget_sec, on_progress=on_progress)
+    # summaryが設定済みでlabelsが未設定の記事をDBから取得（LLM呼び出し中は接続を保持しない）
+    return _tag_rows(llm, get_articles_without_labels(limit), llm_batch, on_progress)